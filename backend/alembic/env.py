@@ -1,8 +1,11 @@
 from app.models.base_class import BaseModel
-from app.models.user_models import User
+from app.models.user_models import User, UserStats
 from app.models.style_models import ImageStyle
 from app.models.badge_models import Badge, UserBadge
-from app.models.mystery_models import DailyMystery, UserMysterySession
+from app.models.mystery_models import DailyMystery, UserMysterySession, ScenarioNode
+from app.models.cache_models import CacheEntry
+from app.models.job_models import GenerationJob
+from app.models.ai_ledger_models import AICallLedgerEntry
 
 from app.core.config import settings
 
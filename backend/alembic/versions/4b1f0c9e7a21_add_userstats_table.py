@@ -0,0 +1,39 @@
+"""add_userstats_table
+
+Revision ID: 4b1f0c9e7a21
+Revises: dd40317f5f97
+Create Date: 2025-07-02 10:14:27.513204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1f0c9e7a21'
+down_revision: Union[str, Sequence[str], None] = 'dd40317f5f97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('userstats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('sessions_completed', sa.Integer(), nullable=False),
+    sa.Column('solved_count', sa.Integer(), nullable=False),
+    sa.Column('current_streak', sa.Integer(), nullable=False),
+    sa.Column('longest_streak', sa.Integer(), nullable=False),
+    sa.Column('fastest_solve_seconds', sa.Integer(), nullable=True),
+    sa.Column('last_solved_date', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('userstats')
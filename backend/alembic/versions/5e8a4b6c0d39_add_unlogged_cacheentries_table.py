@@ -0,0 +1,36 @@
+"""add_unlogged_cacheentries_table
+
+Revision ID: 5e8a4b6c0d39
+Revises: 9c3d7e2a5f18
+Create Date: 2025-07-09 16:22:48.730115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8a4b6c0d39'
+down_revision: Union[str, Sequence[str], None] = '9c3d7e2a5f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cacheentries',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.LargeBinary(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index(op.f('ix_cacheentries_expires_at'), 'cacheentries', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cacheentries_expires_at'), table_name='cacheentries')
+    op.drop_table('cacheentries')
@@ -0,0 +1,132 @@
+"""partition_usermysterysessions_by_month
+
+Revision ID: 9c3d7e2a5f18
+Revises: 4b1f0c9e7a21
+Create Date: 2025-07-04 09:41:12.084516
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3d7e2a5f18'
+down_revision: Union[str, Sequence[str], None] = '4b1f0c9e7a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(month_start: datetime.date, months: int) -> datetime.date:
+    month_index = month_start.month - 1 + months
+    return datetime.date(month_start.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def _create_month_partition(month_start: datetime.date) -> None:
+    month_end = _add_months(month_start, 1)
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS usermysterysessions_y{month_start:%Y}m{month_start:%m} "
+        f"PARTITION OF usermysterysessions "
+        f"FOR VALUES FROM ('{month_start.isoformat()} 00:00:00+00') TO ('{month_end.isoformat()} 00:00:00+00')"
+    )
+
+
+def _create_session_indexes() -> None:
+    op.create_index(op.f('ix_usermysterysessions_daily_mystery_id'), 'usermysterysessions', ['daily_mystery_id'], unique=False)
+    op.create_index(op.f('ix_usermysterysessions_id'), 'usermysterysessions', ['id'], unique=False)
+    op.create_index(op.f('ix_usermysterysessions_user_id'), 'usermysterysessions', ['user_id'], unique=False)
+
+
+def _drop_session_indexes() -> None:
+    op.drop_index(op.f('ix_usermysterysessions_user_id'), table_name='usermysterysessions')
+    op.drop_index(op.f('ix_usermysterysessions_id'), table_name='usermysterysessions')
+    op.drop_index(op.f('ix_usermysterysessions_daily_mystery_id'), table_name='usermysterysessions')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _drop_session_indexes()
+    op.rename_table('usermysterysessions', 'usermysterysessions_legacy')
+
+    op.create_table('usermysterysessions',
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('daily_mystery_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('is_solved', sa.Boolean(), nullable=False),
+    sa.Column('current_round', sa.Integer(), nullable=False),
+    sa.Column('path_taken', sa.JSON(), nullable=True),
+    sa.Column('detective_rank', sa.String(length=50), nullable=True),
+    sa.Column('final_video_url', sa.String(), nullable=True),
+    sa.Column('collected_clues', sa.JSON(), nullable=True),
+    sa.Column('notebook_text', sa.Text(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.ForeignKeyConstraint(['daily_mystery_id'], ['dailymysteries.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id', 'start_time'),
+    postgresql_partition_by='RANGE (start_time)'
+    )
+    _create_session_indexes()
+
+    oldest_start = op.get_bind().execute(
+        sa.text("SELECT min(start_time) FROM usermysterysessions_legacy")
+    ).scalar()
+    this_month = datetime.date.today().replace(day=1)
+    month = oldest_start.date().replace(day=1) if oldest_start else this_month
+    last_month = _add_months(this_month, MONTHS_AHEAD)
+    while month <= last_month:
+        _create_month_partition(month)
+        month = _add_months(month, 1)
+
+    op.execute(
+        "INSERT INTO usermysterysessions "
+        "(id, user_id, daily_mystery_id, start_time, end_time, is_solved, current_round, "
+        "path_taken, detective_rank, final_video_url, collected_clues, notebook_text) "
+        "SELECT id, user_id, daily_mystery_id, start_time, end_time, is_solved, current_round, "
+        "path_taken, detective_rank, final_video_url, collected_clues, notebook_text "
+        "FROM usermysterysessions_legacy"
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('usermysterysessions', 'id'), "
+        "COALESCE((SELECT max(id) FROM usermysterysessions), 0) + 1, false)"
+    )
+    op.drop_table('usermysterysessions_legacy')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop_session_indexes()
+    op.rename_table('usermysterysessions', 'usermysterysessions_partitioned')
+
+    op.create_table('usermysterysessions',
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('daily_mystery_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('is_solved', sa.Boolean(), nullable=False),
+    sa.Column('current_round', sa.Integer(), nullable=False),
+    sa.Column('path_taken', sa.JSON(), nullable=True),
+    sa.Column('detective_rank', sa.String(length=50), nullable=True),
+    sa.Column('final_video_url', sa.String(), nullable=True),
+    sa.Column('collected_clues', sa.JSON(), nullable=True),
+    sa.Column('notebook_text', sa.Text(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.ForeignKeyConstraint(['daily_mystery_id'], ['dailymysteries.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_session_indexes()
+
+    op.execute(
+        "INSERT INTO usermysterysessions SELECT * FROM usermysterysessions_partitioned"
+    )
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('usermysterysessions', 'id'), "
+        "COALESCE((SELECT max(id) FROM usermysterysessions), 0) + 1, false)"
+    )
+    # Dropping the partitioned parent drops all attached partitions with it.
+    op.drop_table('usermysterysessions_partitioned')
@@ -0,0 +1,48 @@
+"""add_aicallledgerentries_table
+
+Revision ID: a1c7e9b3d5f2
+Revises: f4b8d2e6a9c1
+Create Date: 2025-07-17 14:27:51.309487
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c7e9b3d5f2'
+down_revision: Union[str, Sequence[str], None] = 'f4b8d2e6a9c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('aicallledgerentries',
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('task_type', sa.String(length=40), nullable=False),
+    sa.Column('daily_mystery_id', sa.Integer(), nullable=True),
+    sa.Column('round_number', sa.Integer(), nullable=True),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+    sa.Column('output_tokens', sa.Integer(), nullable=True),
+    sa.Column('cached_tokens', sa.Integer(), nullable=True),
+    sa.Column('latency_ms', sa.Integer(), nullable=False),
+    sa.Column('outcome', sa.String(length=30), nullable=False),
+    sa.Column('is_retry', sa.Boolean(), nullable=False),
+    sa.Column('is_hedge', sa.Boolean(), nullable=False),
+    sa.Column('used_context_cache', sa.Boolean(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_aicallledgerentries_id'), 'aicallledgerentries', ['id'], unique=False)
+    op.create_index('ix_aicallledgerentries_created_at_brin', 'aicallledgerentries', ['created_at'], unique=False, postgresql_using='brin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_aicallledgerentries_created_at_brin', table_name='aicallledgerentries', postgresql_using='brin')
+    op.drop_index(op.f('ix_aicallledgerentries_id'), table_name='aicallledgerentries')
+    op.drop_table('aicallledgerentries')
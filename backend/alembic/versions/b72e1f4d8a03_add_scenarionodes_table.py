@@ -0,0 +1,46 @@
+"""add_scenarionodes_table
+
+Revision ID: b72e1f4d8a03
+Revises: 5e8a4b6c0d39
+Create Date: 2025-07-14 11:05:37.402291
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b72e1f4d8a03'
+down_revision: Union[str, Sequence[str], None] = '5e8a4b6c0d39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scenarionodes',
+    sa.Column('daily_mystery_id', sa.Integer(), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.Column('round_number', sa.Integer(), nullable=False),
+    sa.Column('turn_hash', sa.String(length=64), nullable=False),
+    sa.Column('choice_text', sa.Text(), nullable=False),
+    sa.Column('scenario_text', sa.Text(), nullable=False),
+    sa.Column('image_prompt', sa.Text(), nullable=True),
+    sa.Column('choices', sa.JSON(), nullable=False),
+    sa.Column('is_final_round', sa.Boolean(), nullable=False),
+    sa.Column('solution_explanation', sa.Text(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.ForeignKeyConstraint(['daily_mystery_id'], ['dailymysteries.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['parent_id'], ['scenarionodes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('daily_mystery_id', 'turn_hash', name='uq_scenarionodes_daily_mystery_id_turn_hash')
+    )
+    op.create_index(op.f('ix_scenarionodes_id'), 'scenarionodes', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_scenarionodes_id'), table_name='scenarionodes')
+    op.drop_table('scenarionodes')
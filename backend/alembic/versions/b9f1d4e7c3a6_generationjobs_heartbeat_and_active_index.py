@@ -0,0 +1,44 @@
+"""generationjobs heartbeat and one active job per date
+
+Revision ID: b9f1d4e7c3a6
+Revises: d8e3a6c2b9f4
+Create Date: 2025-07-21 14:05:33.802417
+
+Adds generationjobs.heartbeat_at and a partial unique index allowing one
+queued/running job per for_date. Active jobs left behind by earlier worker
+restarts are marked failed first, so the index can be built.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9f1d4e7c3a6'
+down_revision: Union[str, Sequence[str], None] = 'd8e3a6c2b9f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('generationjobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("""
+        UPDATE generationjobs
+        SET status = 'failed', error = 'Abandoned: no worker was running this job.', finished_at = now()
+        WHERE status IN ('queued', 'running')
+    """)
+    op.create_index(
+        'uq_generationjobs_active_for_date',
+        'generationjobs',
+        ['for_date'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_generationjobs_active_for_date', table_name='generationjobs')
+    op.drop_column('generationjobs', 'heartbeat_at')
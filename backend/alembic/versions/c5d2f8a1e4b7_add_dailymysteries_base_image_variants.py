@@ -0,0 +1,28 @@
+"""add dailymysteries.base_image_variants
+
+Revision ID: c5d2f8a1e4b7
+Revises: a1c7e9b3d5f2
+Create Date: 2025-07-18 10:12:40.518273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2f8a1e4b7'
+down_revision: Union[str, Sequence[str], None] = 'a1c7e9b3d5f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('dailymysteries', sa.Column('base_image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('dailymysteries', 'base_image_variants')
@@ -0,0 +1,72 @@
+"""add dailymysteries.search_vector
+
+Revision ID: d8e3a6c2b9f4
+Revises: c5d2f8a1e4b7
+Create Date: 2025-07-19 09:41:17.230586
+
+Adds the full-text search vector (see app/services/mystery_search_service.py)
+and backfills it BACKFILL_BATCH_SIZE ids at a time, each batch committed on
+its own so rows are never locked for the whole backfill. The GIN index is
+built CONCURRENTLY afterwards.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e3a6c2b9f4'
+down_revision: Union[str, Sequence[str], None] = 'c5d2f8a1e4b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 500
+
+# Same weights and text as search_vector_expression(). The json_typeof guards
+# skip dossiers/clues stored as JSON null.
+BACKFILL_SQL = sa.text("""
+    UPDATE dailymysteries AS m SET search_vector =
+        setweight(to_tsvector('english'::regconfig, m.theme), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce((
+            SELECT string_agg(coalesce(d->>'character_name', ''), ' ')
+            FROM json_array_elements(CASE WHEN json_typeof(m.character_dossiers) = 'array'
+                                          THEN m.character_dossiers END) AS d), '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce((
+            SELECT string_agg(c, ' ')
+            FROM json_array_elements_text(CASE WHEN json_typeof(m.critical_path_clues) = 'array'
+                                               THEN m.critical_path_clues END) AS c), '')), 'B') ||
+        setweight(to_tsvector('english'::regconfig, coalesce((
+            SELECT string_agg(coalesce(d->>'description', ''), ' ')
+            FROM json_array_elements(CASE WHEN json_typeof(m.character_dossiers) = 'array'
+                                          THEN m.character_dossiers END) AS d), '')), 'C') ||
+        setweight(to_tsvector('english'::regconfig, m.base_story_text), 'D')
+    WHERE m.id > :after_id AND m.id <= :up_to_id
+""")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('dailymysteries', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM dailymysteries")).scalar_one()
+        for after_id in range(0, max_id, BACKFILL_BATCH_SIZE):
+            bind.execute(BACKFILL_SQL, {"after_id": after_id, "up_to_id": after_id + BACKFILL_BATCH_SIZE})
+
+        op.create_index(
+            'ix_dailymysteries_search_vector',
+            'dailymysteries',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dailymysteries_search_vector', table_name='dailymysteries')
+    op.drop_column('dailymysteries', 'search_vector')
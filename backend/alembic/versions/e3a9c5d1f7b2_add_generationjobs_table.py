@@ -0,0 +1,48 @@
+"""add_generationjobs_table
+
+Revision ID: e3a9c5d1f7b2
+Revises: b72e1f4d8a03
+Create Date: 2025-07-15 09:41:12.118604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9c5d1f7b2'
+down_revision: Union[str, Sequence[str], None] = 'b72e1f4d8a03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('generationjobs',
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('for_date', sa.Date(), nullable=False),
+    sa.Column('force_regenerate', sa.Boolean(), nullable=False),
+    sa.Column('current_stage', sa.String(length=50), nullable=True),
+    sa.Column('stage_timings', sa.JSON(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('daily_mystery_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.ForeignKeyConstraint(['daily_mystery_id'], ['dailymysteries.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_generationjobs_id'), 'generationjobs', ['id'], unique=False)
+    op.create_index(op.f('ix_generationjobs_status'), 'generationjobs', ['status'], unique=False)
+    op.create_index(op.f('ix_generationjobs_for_date'), 'generationjobs', ['for_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_generationjobs_for_date'), table_name='generationjobs')
+    op.drop_index(op.f('ix_generationjobs_status'), table_name='generationjobs')
+    op.drop_index(op.f('ix_generationjobs_id'), table_name='generationjobs')
+    op.drop_table('generationjobs')
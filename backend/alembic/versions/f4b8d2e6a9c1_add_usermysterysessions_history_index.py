@@ -0,0 +1,39 @@
+"""add_usermysterysessions_history_index
+
+Revision ID: f4b8d2e6a9c1
+Revises: e3a9c5d1f7b2
+Create Date: 2025-07-16 10:12:05.664913
+
+Replaces the single-column user_id index with (user_id, start_time DESC,
+id DESC) for keyset-paginated history. usermysterysessions is partitioned,
+and Postgres cannot build an index on a partitioned parent CONCURRENTLY, so
+this takes a brief write lock per partition while each one is indexed.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d2e6a9c1'
+down_revision: Union[str, Sequence[str], None] = 'e3a9c5d1f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_usermysterysessions_user_id_start_time_id',
+        'usermysterysessions',
+        ['user_id', sa.text('start_time DESC'), sa.text('id DESC')],
+        unique=False,
+    )
+    op.drop_index(op.f('ix_usermysterysessions_user_id'), table_name='usermysterysessions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_usermysterysessions_user_id'), 'usermysterysessions', ['user_id'], unique=False)
+    op.drop_index('ix_usermysterysessions_user_id_start_time_id', table_name='usermysterysessions')
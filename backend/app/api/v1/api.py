@@ -1,7 +1,10 @@
 from fastapi import APIRouter
-from .endpoints import admin_mysteries, mysteries, gameplay
+from .endpoints import admin_mysteries, admin_runtime, mysteries, gameplay, gameplay_ws, users
 
 api_router = APIRouter()
 api_router.include_router(admin_mysteries.router, tags=["Admin - Mysteries"])
+api_router.include_router(admin_runtime.router, tags=["Admin - Runtime"])
 api_router.include_router(mysteries.router, tags=["Public - Mysteries"])
 api_router.include_router(gameplay.router, tags=["Public - Gameplay"])
+api_router.include_router(gameplay_ws.router, tags=["Public - Gameplay"])
+api_router.include_router(users.router, tags=["Public - Users"])
@@ -1,18 +1,27 @@
 import datetime
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app.core.db import get_async_db
-from app.services import ai_services
+from app.core.config import settings
+from app.core.db import AsyncSessionFactory, get_async_db
+from app.models.job_models import GenerationJob
 from app.models.mystery_models import DailyMystery
 from app.models.style_models import ImageStyle
+from app.schemas.job_schemas import GenerationJob as GenerationJobSchema
 from app.schemas.mystery_schemas import DailyMystery as DailyMysterySchema
+from app.schemas.mystery_schemas import DailyMysteryBulkGenerateRequest, DailyMysteryUpdate
 import logging
+import orjson
 
-from app.services.daily_mystery_service import generate_and_save_new_daily_mystery
+from app.services.daily_mystery_service import generate_daily_mysteries_for_range
+from app.services.generation_job_service import create_generation_job, start_generation_job
+from app.services.mystery_cache_service import invalidate_mystery
+from app.services.mystery_search_service import search_vector_expression
+from app.services.similarity_index import mystery_similarity_index
 
 logger = logging.getLogger(__name__)
 
@@ -27,46 +36,118 @@ async def get_image_style_by_name(db: AsyncSession, style_name: str) -> Optional
 
 @router.post(
     "/admin/daily-mysteries/generate",
-    summary="Generate and save a new daily mystery.",
-    response_model=DailyMysterySchema,
-    status_code=201,
+    summary="Queue generation of today's daily mystery; poll the returned job for the result.",
+    response_model=GenerationJobSchema,
+    status_code=202,
     tags=["Admin - Mysteries"]
 )
 async def admin_trigger_generate_daily_mystery(
+    response: Response,
     force_regenerate: bool = False,
     db: AsyncSession = Depends(get_async_db)
 ):
     today = datetime.date.today()
 
-    stmt_check = select(DailyMystery).options(selectinload(
-        DailyMystery.image_style)).where(DailyMystery.date == today)
-    result_check = await db.execute(stmt_check)
-    existing_mystery = result_check.scalars().first()
-
-    if existing_mystery and not force_regenerate:
+    result_check = await db.execute(
+        select(DailyMystery.id).where(DailyMystery.date == today))
+    if result_check.scalar_one_or_none() is not None and not force_regenerate:
         raise HTTPException(
             status_code=409,
             detail=f"A daily mystery for {today} already exists. Use GET /mysteries/today to fetch or set force_regenerate=true to overwrite."
         )
 
-    if existing_mystery and force_regenerate:
-        await db.delete(existing_mystery)
-        await db.flush()
-
-    try:
-        new_mystery = await generate_and_save_new_daily_mystery(db, for_date=today)
-        return new_mystery
-    except ValueError as ve:
-        logger.error(
-            f"Error during mystery generation service call: {ve}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(ve))
-    except (ai_services.CustomAIError, ConnectionError) as ai_ex:
-        logger.error(
-            f"AI service error during admin mystery generation: {ai_ex}", exc_info=True)
+    job, created = await create_generation_job(db, for_date=today, force_regenerate=force_regenerate)
+    # The background task reads the job in its own session, so it must be committed first.
+    await db.commit()
+    if created:
+        start_generation_job(job.id)
+    else:
+        logger.info(
+            f"Generation for {today} already in progress as job {job.id}; returning it.")
+
+    response.headers["Location"] = f"{settings.API_V1_STR}/admin/generation-jobs/{job.id}"
+    return job
+
+
+@router.get(
+    "/admin/generation-jobs/{job_id}",
+    summary="Status, per-stage timings and (once finished) the resulting mystery of a generation job.",
+    response_model=GenerationJobSchema,
+    tags=["Admin - Mysteries"]
+)
+async def admin_get_generation_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(GenerationJob)
+        .options(selectinload(GenerationJob.daily_mystery).selectinload(DailyMystery.image_style))
+        .where(GenerationJob.id == job_id))
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Generation job not found.")
+    return job
+
+
+@router.post(
+    "/admin/daily-mysteries/generate-range",
+    summary="Generate mysteries for every missing date in a range, streaming per-date progress as NDJSON.",
+    tags=["Admin - Mysteries"]
+)
+async def admin_generate_daily_mysteries_for_range(request_data: DailyMysteryBulkGenerateRequest):
+    if request_data.end_date < request_data.start_date:
         raise HTTPException(
-            status_code=503, detail=f"AI service error: {str(ai_ex)}")
-    except Exception as e:
-        logger.error(
-            f"Unexpected error during admin mystery generation: {e}", exc_info=True)
+            status_code=422, detail="end_date must be on or after start_date.")
+    day_count = (request_data.end_date - request_data.start_date).days + 1
+    if day_count > settings.BULK_GENERATION_MAX_DAYS:
         raise HTTPException(
-            status_code=500, detail="Unexpected error during mystery generation.")
+            status_code=422, detail=f"Range covers {day_count} days; the maximum is {settings.BULK_GENERATION_MAX_DAYS}.")
+
+    async def progress_stream():
+        # The stream outlives the request's dependencies, so it owns its session.
+        async with AsyncSessionFactory() as db:
+            try:
+                async for event in generate_daily_mysteries_for_range(
+                    db,
+                    start_date=request_data.start_date,
+                    end_date=request_data.end_date,
+                    parallelism=request_data.parallelism,
+                ):
+                    yield orjson.dumps(event) + b"\n"
+            except Exception as e:
+                logger.error(
+                    f"Bulk mystery generation aborted: {e}", exc_info=True)
+                await db.rollback()
+                yield orjson.dumps({"status": "aborted", "detail": f"{type(e).__name__}: {e}"}) + b"\n"
+
+    return StreamingResponse(progress_stream(), media_type="application/x-ndjson")
+
+
+@router.patch(
+    "/admin/daily-mysteries/{daily_mystery_id}",
+    summary="Edit a mystery's text fields (omitted or null fields are unchanged); its search vector and cached copies are refreshed.",
+    response_model=DailyMysterySchema,
+    tags=["Admin - Mysteries"]
+)
+async def admin_update_daily_mystery(
+    daily_mystery_id: int,
+    update_data: DailyMysteryUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    mystery = await db.get(DailyMystery, daily_mystery_id)
+    if not mystery:
+        raise HTTPException(status_code=404, detail="Daily mystery not found.")
+
+    for field, value in update_data.model_dump(exclude_none=True).items():
+        setattr(mystery, field, value)
+    mystery.search_vector = search_vector_expression(
+        mystery.theme, mystery.base_story_text, mystery.character_dossiers, mystery.critical_path_clues)
+    await db.commit()
+    await invalidate_mystery(mystery.id, mystery.date)
+    mystery_similarity_index.add(
+        mystery.id, mystery.date, mystery.theme, mystery.base_story_text, mystery.actual_solution_text)
+    logger.info("Updated DailyMystery ID %s: %s", mystery.id, sorted(update_data.model_fields_set))
+
+    result = await db.execute(
+        select(DailyMystery)
+        .options(selectinload(DailyMystery.image_style))
+        .where(DailyMystery.id == daily_mystery_id)
+        .execution_options(populate_existing=True))
+    return result.scalars().first()
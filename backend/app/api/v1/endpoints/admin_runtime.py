@@ -0,0 +1,56 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
+from anyio import to_thread
+from starlette.concurrency import run_in_threadpool
+
+from app.core.db import get_pool_stats, get_read_pool_stats
+from app.core.profiling import list_profiles, read_profile
+from app.api.v1.endpoints.gameplay_ws import open_channel_count
+from app.services.fair_scheduler import next_scenario_scheduler
+
+router = APIRouter()
+
+
+@router.get(
+    "/admin/runtime/stats",
+    summary="Connection pool and worker thread-pool saturation for this process.",
+    tags=["Admin - Runtime"]
+)
+async def admin_get_runtime_stats():
+    limiter = to_thread.current_default_thread_limiter()
+    return {
+        "db_pool": get_pool_stats(),
+        "db_read_pool": get_read_pool_stats(),
+        "thread_pool": {
+            "borrowed_tokens": limiter.borrowed_tokens,
+            "total_tokens": limiter.total_tokens,
+        },
+        "event_loop_tasks": len(asyncio.all_tasks()),
+        "next_scenario_scheduler": next_scenario_scheduler.stats(),
+        "gameplay_websockets": open_channel_count(),
+    }
+
+
+@router.get(
+    "/admin/profiles",
+    summary="Most recent on-demand request profiles, newest first.",
+    tags=["Admin - Runtime"]
+)
+async def admin_list_profiles(limit: int = Query(20, ge=1, le=200)):
+    return ORJSONResponse(await run_in_threadpool(list_profiles, limit))
+
+
+@router.get(
+    "/admin/profiles/{profile_id}",
+    summary="One request profile: a per-function summary, or folded stacks for flame graph tools.",
+    tags=["Admin - Runtime"]
+)
+async def admin_get_profile(profile_id: str, format: str = Query("summary", pattern="^(summary|folded)$")):
+    folded = format == "folded"
+    content = await run_in_threadpool(read_profile, profile_id, folded)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found.")
+    if folded:
+        return PlainTextResponse(content)
+    return Response(content, media_type="application/json")
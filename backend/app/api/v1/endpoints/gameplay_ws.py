@@ -0,0 +1,247 @@
+"""
+WebSocket gameplay channel: one connection plays one game of one mystery.
+
+    GET /mysteries/{daily_mystery_id}/play?session_id=<X-Session-Id value>   (WebSocket upgrade)
+
+Client messages (JSON):
+    {"type": "choice", "choice": "<text>"}
+    {"type": "resume", "path_so_far": [...], "last_presented_scenario_text": "...", "offered_choices": [...]}
+    {"type": "ping"}
+Server messages (JSON):
+    {"type": "session", "daily_mystery_id", "theme", "base_story_text", "choices"}
+    {"type": "turn_started", "round"}
+    {"type": "scenario_delta", "round", "text"}   scenario text while it is generated
+    {"type": "scenario", "round", "scenario_text", "choices", "is_final_round", "solution_explanation", "image_pending"}
+    {"type": "image_ready", "round", "url", "variants"} / {"type": "image_failed", "round"}
+    {"type": "resumed", "round"}
+    {"type": "error", "status", "detail"}
+    {"type": "pong"}
+
+The server keeps the game state (path, last scenario, offered choices), so a
+choice is all a turn needs; "resume" restores it after a reconnect. One turn
+runs at a time, and its image is pushed when ready without blocking the next turn.
+
+Outbound messages pass through a bounded queue drained by one sender task.
+When it is full, scenario_delta messages are dropped (the scenario message
+carries the full text), and any other message waits up to
+WS_SEND_TIMEOUT_SECONDS before the client is disconnected as too slow (1008).
+A message that cannot be encoded is logged and closes the channel with 1011.
+Past WS_MAX_CONNECTIONS_PER_WORKER open channels, new connections are closed
+with 1013 (try again later).
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+from fastapi import APIRouter, HTTPException, WebSocket
+from pydantic import ValidationError
+from starlette.websockets import WebSocketState
+import logging
+import orjson
+
+from app.core.config import settings
+from app.core.db import ReadSessionFactory
+from app.schemas.gameplay_schemas import GameplayResumeMessage, StoryTurn
+from app.services.fair_scheduler import ClientKey
+from app.services.gameplay_service import (get_client_key, prepare_turn, produce_scenario_image, resolve_scenario,
+                                           scenario_outcome, select_initial_choices)
+from app.services.mystery_cache_service import get_mystery_snapshot_by_id
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+MAX_CLIENT_MESSAGE_BYTES = 64 * 1024
+
+_open_channels = 0
+
+
+def open_channel_count() -> int:
+    return _open_channels
+
+
+class GameplayChannel:
+    def __init__(self, websocket: WebSocket, mystery: Dict[str, Any], client_key: ClientKey) -> None:
+        self.websocket = websocket
+        self.mystery = mystery
+        self.client_key = client_key
+        self.path_so_far: List[StoryTurn] = []
+        self.last_presented_scenario_text: Optional[str] = None
+        self.offered_choices: Optional[List[str]] = None
+        self.close_code = 1000
+        self.close_reason = ""
+        self.dropped_deltas = 0
+        self._outbound: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_OUTBOUND_QUEUE_SIZE)
+        self._receiver: Optional[asyncio.Task] = None
+        self._turn_task: Optional[asyncio.Task] = None
+        self._image_tasks: Set[asyncio.Task] = set()
+
+    async def send(self, message: Dict[str, Any]) -> bool:
+        """Queues a message, waiting for room. Returns False (and ends the channel) if the client is too slow."""
+        try:
+            await asyncio.wait_for(self._outbound.put(message), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Closing gameplay channel for %s: client is not reading messages.", self.client_key.id)
+            self.close_code, self.close_reason = 1008, "Client is not reading messages."
+            if self._receiver is not None:
+                self._receiver.cancel()
+            return False
+
+    def send_droppable(self, message: Dict[str, Any]) -> None:
+        try:
+            self._outbound.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped_deltas += 1
+
+    async def _send_loop(self) -> None:
+        while True:
+            message = await self._outbound.get()
+            try:
+                data = orjson.dumps(message).decode()
+            except orjson.JSONEncodeError as e:
+                logger.error("Could not encode a '%s' message for %s: %s", message.get("type"), self.client_key.id, e)
+                self.close_code, self.close_reason = 1011, "Could not encode a server message."
+                return
+            await self.websocket.send_text(data)
+
+    async def _receive_loop(self) -> None:
+        while True:
+            try:
+                message = await asyncio.wait_for(self.websocket.receive(), timeout=settings.WS_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.close_code, self.close_reason = 1000, "Idle timeout."
+                return
+            if message["type"] == "websocket.disconnect":
+                return
+            raw = message.get("text") if message.get("text") is not None else message.get("bytes")
+            if raw is None or len(raw) > MAX_CLIENT_MESSAGE_BYTES:
+                await self.send({"type": "error", "status": 413, "detail": "Message too large."})
+                continue
+            try:
+                payload = orjson.loads(raw)
+                kind = payload.get("type")
+            except (orjson.JSONDecodeError, AttributeError):
+                await self.send({"type": "error", "status": 400, "detail": "Messages must be JSON objects with a type."})
+                continue
+
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "choice":
+                await self._start_turn(payload.get("choice"))
+            elif kind == "resume":
+                await self._resume(payload)
+            else:
+                await self.send({"type": "error", "status": 400, "detail": f"Unknown message type '{kind}'."})
+
+    def _turn_in_progress(self) -> bool:
+        return self._turn_task is not None and not self._turn_task.done()
+
+    async def _start_turn(self, choice_text: Any) -> None:
+        if self._turn_in_progress():
+            await self.send({"type": "error", "status": 409, "detail": "A turn is already in progress."})
+            return
+        if not isinstance(choice_text, str) or not choice_text.strip():
+            await self.send({"type": "error", "status": 400, "detail": "A choice message needs a non-empty 'choice'."})
+            return
+        self._turn_task = asyncio.create_task(self._play_turn(choice_text))
+
+    async def _resume(self, payload: Dict[str, Any]) -> None:
+        if self._turn_in_progress():
+            await self.send({"type": "error", "status": 409, "detail": "A turn is already in progress."})
+            return
+        try:
+            resume = GameplayResumeMessage.model_validate(payload)
+        except ValidationError as e:
+            await self.send({"type": "error", "status": 400, "detail": f"Invalid resume message: {e.error_count()} errors."})
+            return
+        self.path_so_far = list(resume.path_so_far)
+        self.last_presented_scenario_text = resume.last_presented_scenario_text
+        self.offered_choices = resume.offered_choices
+        await self.send({"type": "resumed", "round": len(self.path_so_far)})
+
+    async def _play_turn(self, choice_text: str) -> None:
+        current_round = len(self.path_so_far) + 1
+
+        async def on_scenario_text(text: str) -> None:
+            self.send_droppable({"type": "scenario_delta", "round": current_round, "text": text})
+
+        try:
+            async with ReadSessionFactory() as db:
+                turn = await prepare_turn(
+                    db, self.mystery["id"], self.path_so_far, choice_text,
+                    self.last_presented_scenario_text, self.offered_choices)
+                await self.send({"type": "turn_started", "round": turn.current_round})
+                ai_response = await resolve_scenario(db, turn, self.client_key, on_scenario_text)
+        except HTTPException as e:
+            await self.send({"type": "error", "status": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:
+            logger.error("Gameplay turn failed for %s: %s", self.client_key.id, e, exc_info=True)
+            await self.send({"type": "error", "status": 500, "detail": "Unexpected error while playing the turn."})
+            return
+
+        outcome = scenario_outcome(turn, ai_response)
+        self.path_so_far.append(StoryTurn(scenario_text=turn.previous_scenario_text, chosen_action=turn.choice.text))
+        self.last_presented_scenario_text = outcome["scenario_text"]
+        self.offered_choices = outcome["choices"]
+
+        image_prompt = outcome.pop("image_prompt")
+        await self.send({"type": "scenario", "round": turn.current_round, **outcome, "image_pending": bool(image_prompt)})
+        if image_prompt:
+            task = asyncio.create_task(self._push_image(turn.current_round, image_prompt))
+            self._image_tasks.add(task)
+            task.add_done_callback(self._image_tasks.discard)
+
+    async def _push_image(self, current_round: int, image_prompt: str) -> None:
+        try:
+            url, variants = await produce_scenario_image(self.mystery["id"], current_round, image_prompt)
+        except Exception as e:
+            logger.warning("Scenario image for round %s of mystery %s failed: %s", current_round, self.mystery["id"], e)
+            await self.send({"type": "image_failed", "round": current_round})
+            return
+        await self.send({"type": "image_ready", "round": current_round, "url": url, "variants": variants})
+
+    async def run(self, client_id: Optional[str]) -> None:
+        sender = asyncio.create_task(self._send_loop())
+        self._receiver = asyncio.create_task(self._receive_loop())
+        try:
+            await self.send({
+                "type": "session",
+                "daily_mystery_id": self.mystery["id"],
+                "theme": self.mystery["theme"],
+                "base_story_text": self.mystery["base_story_text"],
+                "choices": select_initial_choices(self.mystery["id"], self.mystery["initial_choices_pool"], client_id),
+            })
+            # Ends when the client leaves, idles out or is too slow, or when a send fails.
+            await asyncio.wait({sender, self._receiver}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (self._receiver, sender, self._turn_task, *self._image_tasks):
+                if task is not None:
+                    task.cancel()
+            if self.dropped_deltas:
+                logger.info("Gameplay channel for %s dropped %s scenario deltas.", self.client_key.id, self.dropped_deltas)
+            if self.websocket.application_state == WebSocketState.CONNECTED:
+                try:
+                    await self.websocket.close(code=self.close_code, reason=self.close_reason)
+                except RuntimeError:
+                    pass  # the client disconnected first
+
+
+@router.websocket("/mysteries/{daily_mystery_id}/play")
+async def gameplay_websocket(websocket: WebSocket, daily_mystery_id: int):
+    global _open_channels
+    if _open_channels >= settings.WS_MAX_CONNECTIONS_PER_WORKER:
+        await websocket.accept()
+        await websocket.close(code=1013, reason="Too many connections on this worker; retry shortly.")
+        return
+
+    _open_channels += 1
+    try:
+        async with ReadSessionFactory() as db:
+            mystery = await get_mystery_snapshot_by_id(db, daily_mystery_id)
+        if mystery is None:
+            await websocket.close(code=1008, reason="Daily mystery not found.")
+            return
+        await websocket.accept()
+        client_id = websocket.headers.get("x-session-id") or websocket.query_params.get("session_id")
+        await GameplayChannel(websocket, mystery, get_client_key(websocket)).run(client_id)
+    finally:
+        _open_channels -= 1
@@ -1,40 +1,94 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from typing import Any, Dict, List, Optional
 import datetime
-import random
 import logging
+import orjson
 
-from app.core.db import get_async_db
+from app.core.config import settings
+from app.core.db import get_async_read_db
+from app.core.http_cache import conditional_json_response
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.mystery_models import DailyMystery
-from app.schemas.mystery_schemas import DailyMysteryDisplayForUser
+from app.schemas.mystery_schemas import DailyMysteryArchivePage, DailyMysteryDisplayForUser, DailyMysterySearchPage
+from app.schemas.serializers import trusted_display_payload
 from app.services.daily_mystery_service import generate_and_save_new_daily_mystery
+from app.services.gameplay_service import select_initial_choices
+from app.services.image_processing import select_variant_url
+from app.services.mystery_search_service import search_mysteries
+from app.services.mystery_cache_service import get_today_mystery_snapshot, mystery_snapshot
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+CLIENT_ID_HEADER = "X-Session-Id"
+
+
+DEFAULT_IMAGE_FORMAT = "webp"  # decoded by every current browser and mobile platform
+
+
+def select_base_image_urls(
+    mystery: Dict[str, Any], image_format: Optional[str], image_width: Optional[int]
+) -> List[str]:
+    """
+    One URL per base image: the variant fitting `image_width` in the first of the
+    client's `image_format` list (comma-separated, most preferred first) that was
+    generated. Without a usable list, WebP is served.
+    """
+    requested = [fmt.strip().lower() for fmt in (image_format or "").split(",")]
+    accepted_formats = [fmt for fmt in requested if fmt in settings.IMAGE_VARIANT_FORMATS]
+    if not accepted_formats and DEFAULT_IMAGE_FORMAT in settings.IMAGE_VARIANT_FORMATS:
+        accepted_formats = [DEFAULT_IMAGE_FORMAT]
+    all_variants = mystery.get("base_image_variants") or []
+    urls = []
+    for i, url in enumerate(mystery["base_image_urls"] or []):
+        variants = all_variants[i] if i < len(all_variants) else None
+        urls.append(select_variant_url(url, variants, accepted_formats, image_width))
+    return urls
+
+
+def _today_cache_control() -> str:
+    now = datetime.datetime.now()
+    next_midnight = datetime.datetime.combine(
+        now.date() + datetime.timedelta(days=1), datetime.time.min)
+    seconds_until_rollover = int((next_midnight - now).total_seconds())
+    max_age = max(0, min(settings.TODAY_CACHE_MAX_AGE_SECONDS, seconds_until_rollover))
+    return f"public, max-age={max_age}, must-revalidate"
+
 
 @router.get(
     "/mysteries/today",
     response_model=DailyMysteryDisplayForUser,
+    response_class=ORJSONResponse,
     summary="Get today's mystery. Generates one if not found.",
-    tags=["Mysteries"]
+    tags=["Mysteries"],
+    responses={304: {"description": "Not modified (If-None-Match matched the current ETag)."}}
 )
-async def get_todays_mystery_for_user(db: AsyncSession = Depends(get_async_db)):
+async def get_todays_mystery_for_user(
+    request: Request,
+    client_id: Optional[str] = Header(None, alias=CLIENT_ID_HEADER),
+    image_width: Optional[int] = Query(
+        None, ge=1, le=4096,
+        description="Rendered image width in device pixels; the smallest variant at least this wide is served."),
+    image_format: Optional[str] = Query(
+        None, max_length=50,
+        description="Image formats the client decodes, most preferred first, e.g. 'avif,webp'. Defaults to webp."),
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
     today = datetime.date.today()
-    stmt = select(DailyMystery).options(selectinload(
-        DailyMystery.image_style)).where(DailyMystery.date == today)
-    result = await db.execute(stmt)
-    mystery = result.scalars().first()
+    mystery = await get_today_mystery_snapshot(db, today)
 
     if not mystery:
         logger.info(
             f"No mystery found for {today}. Attempting to generate one on-the-fly.")
         try:
-            mystery = await generate_and_save_new_daily_mystery(db, for_date=today)
+            # Not cached here: the row is only committed after the response is built.
+            mystery = mystery_snapshot(await generate_and_save_new_daily_mystery(db, for_date=today))
             logger.info(
-                f"Successfully generated new mystery (ID: {mystery.id}) on-the-fly for {today}.")
+                f"Successfully generated new mystery (ID: {mystery['id']}) on-the-fly for {today}.")
         except Exception as e:
             logger.error(
                 f"Failed to generate mystery on-the-fly for {today}: {e}", exc_info=True)
@@ -49,21 +103,133 @@ async def get_todays_mystery_for_user(db: AsyncSession = Depends(get_async_db)):
         raise HTTPException(
             status_code=500, detail="Internal server error retrieving today's mystery.")
 
-    if not mystery.initial_choices_pool or len(mystery.initial_choices_pool) < 3:
+    if not mystery["initial_choices_pool"] or len(mystery["initial_choices_pool"]) < 3:
         logger.error(
-            f"Mystery ID {mystery.id} has insufficient choices in initial_choices_pool.")
+            f"Mystery ID {mystery['id']} has insufficient choices in initial_choices_pool.")
         raise HTTPException(
             status_code=500, detail="Today's mystery has an invalid configuration (choices).")
 
-    selected_choices = random.sample(
-        mystery.initial_choices_pool, min(3, len(mystery.initial_choices_pool)))
+    selected_choices = select_initial_choices(
+        mystery["id"], mystery["initial_choices_pool"], client_id)
 
-    return DailyMysteryDisplayForUser(
-        daily_mystery_id=mystery.id,
-        theme=mystery.theme,
-        base_story_text=mystery.base_story_text,
-        base_image_urls=[str(url) for url in mystery.base_image_urls] if mystery.base_image_urls else [
-        ],
-        character_dossiers=mystery.character_dossiers,
-        initial_choices=selected_choices
+    base_image_urls = select_base_image_urls(mystery, image_format, image_width)
+
+    if settings.TRUSTED_SERIALIZATION:
+        body = orjson.dumps(trusted_display_payload(mystery, selected_choices, base_image_urls))
+    else:
+        body = DailyMysteryDisplayForUser(
+            daily_mystery_id=mystery["id"],
+            theme=mystery["theme"],
+            base_story_text=mystery["base_story_text"],
+            base_image_urls=base_image_urls,
+            character_dossiers=mystery["character_dossiers"],
+            initial_choices=selected_choices
+        ).model_dump_json().encode("utf-8")
+
+    return conditional_json_response(
+        request, body, cache_control=_today_cache_control(), vary=CLIENT_ID_HEADER)
+
+
+def decode_archive_cursor(cursor: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(decode_cursor(cursor)["d"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+
+@router.get(
+    "/mysteries/archive",
+    response_model=DailyMysteryArchivePage,
+    response_class=ORJSONResponse,
+    summary="Browse past mysteries, newest first.",
+    tags=["Mysteries"]
+)
+async def get_mystery_archive(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor."),
+    limit: int = Query(settings.ARCHIVE_PAGE_SIZE_DEFAULT, ge=1, le=settings.ARCHIVE_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
+    # Keyset on the unique date index: every page is one index range scan,
+    # however deep. Today's and pre-generated future mysteries are never listed.
+    before_date = datetime.date.today()
+    if cursor:
+        before_date = min(before_date, decode_archive_cursor(cursor))
+
+    # Only the list columns. The thumbnail is picked in SQL: the first image's smallest
+    # variant (base_image_variants #>> '{0,0,url}'), else its original URL.
+    stmt = (
+        select(
+            DailyMystery.id,
+            DailyMystery.date,
+            DailyMystery.theme,
+            func.coalesce(
+                DailyMystery.base_image_variants[(0, 0, "url")].as_string(),
+                DailyMystery.base_image_urls[0].as_string(),
+            ).label("thumbnail_image_url"),
+        )
+        .where(DailyMystery.date < before_date)
+        .order_by(DailyMystery.date.desc())
+        .limit(limit + 1)
     )
+    rows = (await db.execute(stmt)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    payload = {
+        "items": [
+            {
+                "daily_mystery_id": row.id,
+                "date": row.date,
+                "theme": row.theme,
+                "thumbnail_image_url": row.thumbnail_image_url,
+            }
+            for row in rows
+        ],
+        "next_cursor": encode_cursor({"d": rows[-1].date.isoformat()}) if has_more else None,
+    }
+    return ORJSONResponse(
+        payload, headers={"Cache-Control": f"public, max-age={settings.ARCHIVE_CACHE_MAX_AGE_SECONDS}"})
+
+
+def decode_search_cursor(cursor: str) -> Dict[str, Any]:
+    values = decode_cursor(cursor)
+    if not isinstance(values.get("r"), (int, float)) or not isinstance(values.get("i"), int):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    return {"rank": values["r"], "id": values["i"]}
+
+
+@router.get(
+    "/mysteries/search",
+    response_model=DailyMysterySearchPage,
+    response_class=ORJSONResponse,
+    summary="Full-text search of past mysteries by theme, character, clue or story text, best match first.",
+    tags=["Mysteries"]
+)
+async def search_mystery_archive(
+    q: str = Query(..., min_length=1, max_length=200,
+                   description='Search terms; supports "quoted phrases", OR and -exclusions.'),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor."),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE_DEFAULT, ge=1, le=settings.SEARCH_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
+    # Same visibility as the archive: today's and future mysteries are never listed.
+    after = decode_search_cursor(cursor) if cursor else None
+    rows = await search_mysteries(db, q, datetime.date.today(), limit, after)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    payload = {
+        "items": [
+            {
+                "daily_mystery_id": row.id,
+                "date": row.date,
+                "theme": row.theme,
+                "thumbnail_image_url": row.thumbnail_image_url,
+                "rank": row.rank,
+            }
+            for row in rows
+        ],
+        "next_cursor": encode_cursor({"r": rows[-1].rank, "i": rows[-1].id}) if has_more else None,
+    }
+    return ORJSONResponse(
+        payload, headers={"Cache-Control": f"public, max-age={settings.ARCHIVE_CACHE_MAX_AGE_SECONDS}"})
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Optional
+import datetime
+import logging
+
+from app.core.config import settings
+from app.core.db import get_async_read_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.mystery_models import DailyMystery, UserMysterySession
+from app.models.user_models import User
+from app.schemas.mystery_schemas import UserMysteryHistoryPage
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+def _decode_history_cursor(cursor: str):
+    values = decode_cursor(cursor)
+    try:
+        return datetime.datetime.fromisoformat(values["t"]), int(values["i"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+
+@router.get(
+    "/users/{user_id}/history",
+    response_model=UserMysteryHistoryPage,
+    response_class=ORJSONResponse,
+    summary="A user's past games, newest first.",
+    tags=["Users"]
+)
+async def get_user_history(
+    user_id: int,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor."),
+    limit: int = Query(settings.HISTORY_PAGE_SIZE_DEFAULT, ge=1, le=settings.HISTORY_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_read_db)
+) -> Response:
+    if cursor is None and await db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    # Walks ix_usermysterysessions_user_id_start_time_id in order, so there is no sort step.
+    stmt = (
+        select(
+            UserMysterySession.id,
+            UserMysterySession.daily_mystery_id,
+            UserMysterySession.start_time,
+            UserMysterySession.end_time,
+            UserMysterySession.is_solved,
+            UserMysterySession.current_round,
+            UserMysterySession.detective_rank,
+            DailyMystery.date,
+            DailyMystery.theme,
+        )
+        .join(DailyMystery, DailyMystery.id == UserMysterySession.daily_mystery_id)
+        .where(UserMysterySession.user_id == user_id)
+        .order_by(UserMysterySession.start_time.desc(), UserMysterySession.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        last_start_time, last_id = _decode_history_cursor(cursor)
+        # Pruning ignores row comparisons; the redundant plain bound lets Postgres skip
+        # newer monthly partitions on later pages.
+        stmt = stmt.where(
+            UserMysterySession.start_time <= last_start_time,
+            tuple_(UserMysterySession.start_time, UserMysterySession.id) < tuple_(last_start_time, last_id))
+
+    rows = (await db.execute(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    payload = {
+        "items": [
+            {
+                "session_id": row.id,
+                "daily_mystery_id": row.daily_mystery_id,
+                "mystery_date": row.date,
+                "theme": row.theme,
+                "start_time": row.start_time,
+                "end_time": row.end_time,
+                "is_solved": row.is_solved,
+                "current_round": row.current_round,
+                "detective_rank": row.detective_rank,
+            }
+            for row in rows
+        ],
+        "next_cursor": encode_cursor(
+            {"t": rows[-1].start_time.isoformat(), "i": rows[-1].id}) if has_more else None,
+    }
+    return ORJSONResponse(payload, headers={"Cache-Control": "private, no-cache"})
@@ -0,0 +1,258 @@
+"""
+Two-tier cache shared by the API endpoints.
+
+  local  - per-process LRU with per-entry expiry (fast, but each worker has its own).
+  shared - UNLOGGED Postgres table reached through async_engine, so every worker
+           sees the others' warm entries without new infrastructure.
+
+Reads go local -> shared (and backfill local on a shared hit, expiring no later
+than the shared entry). Writes and
+deletes go to both tiers; with CACHE_NOTIFY_ENABLED they also NOTIFY the other
+workers so they evict their local copy instead of serving it until expiry.
+"""
+import asyncio
+import datetime
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from cachetools import LRUCache
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import logging
+
+from app.core.config import settings
+from app.core.db import async_engine
+from app.models.cache_models import CacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def get_with_ttl(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        """The value and its remaining lifetime in seconds (None when the backend does not track it)."""
+        value = await self.get(key)
+        return (value, None) if value is not None else None
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        raw = await self.get(key)
+        return orjson.loads(raw) if raw is not None else None
+
+    async def set_json(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+        await self.set(key, orjson.dumps(value), ttl_seconds)
+
+
+class LocalLRUCache(CacheBackend):
+    def __init__(self, maxsize: int, default_ttl_seconds: int):
+        self.default_ttl_seconds = default_ttl_seconds
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, key: str) -> None:
+        self.evict(key)
+
+    def evict(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class PostgresCache(CacheBackend):
+    # Roughly one write in this many also purges expired rows.
+    PURGE_EVERY_N_WRITES = 200
+
+    def __init__(self, engine, default_ttl_seconds: int):
+        self.engine = engine
+        self.default_ttl_seconds = default_ttl_seconds
+
+    async def get(self, key: str) -> Optional[bytes]:
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(CacheEntry.value).where(
+                    CacheEntry.key == key, CacheEntry.expires_at > func.now())
+            )
+            return result.scalar_one_or_none()
+
+    async def get_with_ttl(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        # Remaining lifetime is computed by Postgres, so worker clock skew does not matter.
+        async with self.engine.connect() as conn:
+            result = await conn.execute(
+                select(CacheEntry.value, func.extract("epoch", CacheEntry.expires_at - func.now())).where(
+                    CacheEntry.key == key, CacheEntry.expires_at > func.now())
+            )
+            row = result.first()
+        return (row[0], float(row[1])) if row is not None else None
+
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        ttl = ttl_seconds if ttl_seconds is not None else self.default_ttl_seconds
+        expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl)
+        stmt = pg_insert(CacheEntry).values(key=key, value=value, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CacheEntry.key],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at},
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(stmt)
+            if random.randrange(self.PURGE_EVERY_N_WRITES) == 0:
+                await conn.execute(delete(CacheEntry).where(CacheEntry.expires_at <= func.now()))
+
+    async def delete(self, key: str) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(CacheEntry).where(CacheEntry.key == key))
+
+
+class TieredCache(CacheBackend):
+    def __init__(
+        self,
+        local: LocalLRUCache,
+        shared: Optional[CacheBackend] = None,
+        notify_channel: Optional[str] = None,
+    ):
+        self.local = local
+        self.shared = shared
+        self.notify_channel = notify_channel
+        self._listener_conn = None
+        self._loader_locks: Dict[str, asyncio.Lock] = {}
+        # Tags our own NOTIFY payloads so this worker does not evict what it just wrote.
+        self._worker_token = uuid.uuid4().hex[:12]
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.local.get(key)
+        if value is not None or self.shared is None:
+            return value
+        try:
+            entry = await self.shared.get_with_ttl(key)
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for '{key}': {e}")
+            return None
+        if entry is None:
+            return None
+        value, remaining_seconds = entry
+        # The local copy must not outlive the shared entry it came from.
+        ttl = self.local.default_ttl_seconds
+        if remaining_seconds is not None:
+            ttl = min(ttl, remaining_seconds)
+        await self.local.set(key, value, ttl)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl_seconds: Optional[int] = None) -> None:
+        await self.local.set(key, value, ttl_seconds)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.set(key, value, ttl_seconds)
+            await self._notify(key)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for '{key}': {e}")
+
+    async def delete(self, key: str) -> None:
+        await self.local.delete(key)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.delete(key)
+            await self._notify(key)
+        except Exception as e:
+            logger.warning(f"Shared cache delete failed for '{key}': {e}")
+
+    async def get_or_set_json(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[int] = None,
+    ) -> Any:
+        """
+        Returns the cached JSON value, or calls `loader` and caches its result.
+        Concurrent misses for the same key in this process share one loader call.
+        A loader result of None is returned but not cached.
+        """
+        cached = await self.get_json(key)
+        if cached is not None:
+            return cached
+        lock = self._loader_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = await self.get_json(key)
+            if cached is not None:
+                return cached
+            try:
+                value = await loader()
+                if value is not None:
+                    await self.set_json(key, value, ttl_seconds)
+                return value
+            finally:
+                self._loader_locks.pop(key, None)
+
+    async def _notify(self, key: str) -> None:
+        if not self.notify_channel:
+            return
+        async with async_engine.begin() as conn:
+            await conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                               {"channel": self.notify_channel, "payload": f"{self._worker_token}:{key}"})
+
+    def _on_invalidation(self, connection, pid, channel, payload: str) -> None:
+        sender, _, key = payload.partition(":")
+        if sender != self._worker_token:
+            self.local.evict(key)
+
+    async def start_invalidation_listener(self) -> None:
+        """Holds one dedicated connection that LISTENs for other workers' invalidations."""
+        if not self.notify_channel or self.shared is None or self._listener_conn is not None:
+            return
+        try:
+            self._listener_conn = await async_engine.connect()
+            raw_connection = await self._listener_conn.get_raw_connection()
+            await raw_connection.driver_connection.add_listener(self.notify_channel, self._on_invalidation)
+            logger.info(f"Cache invalidation listener started on channel '{self.notify_channel}'.")
+        except Exception as e:
+            logger.warning(f"Could not start cache invalidation listener: {e}")
+            if self._listener_conn is not None:
+                await self._listener_conn.close()
+            self._listener_conn = None
+
+    async def stop_invalidation_listener(self) -> None:
+        if self._listener_conn is None:
+            return
+        try:
+            raw_connection = await self._listener_conn.get_raw_connection()
+            await raw_connection.driver_connection.remove_listener(self.notify_channel, self._on_invalidation)
+        finally:
+            await self._listener_conn.close()
+            self._listener_conn = None
+
+
+def build_cache() -> TieredCache:
+    local = LocalLRUCache(
+        maxsize=settings.CACHE_LOCAL_MAXSIZE, default_ttl_seconds=settings.CACHE_DEFAULT_TTL_SECONDS)
+    shared = PostgresCache(
+        async_engine, default_ttl_seconds=settings.CACHE_DEFAULT_TTL_SECONDS) if settings.CACHE_SHARED_ENABLED else None
+    notify_channel = settings.CACHE_NOTIFY_CHANNEL if settings.CACHE_NOTIFY_ENABLED else None
+    return TieredCache(local, shared, notify_channel)
+
+
+cache = build_cache()
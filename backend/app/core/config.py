@@ -1,18 +1,52 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "PlotTwist API"
     API_V1_STR: str = "/api/v1"
-    SQLALCHEMY_ECHO: bool = True
+    SQLALCHEMY_ECHO: bool = True  # logs every statement at INFO (see configure_logging)
+    # Logging (see app/core/logging_config.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json | text
+    # Tracing (see app/core/tracing.py)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.05
+    TRACING_EXPORTER: str = "logging"  # logging | file | memory
+    TRACING_FILE_PATH: str = "traces/spans.jsonl"
+    TRACING_MAX_STATEMENT_LENGTH: int = 500
+    # On-demand request profiling (see app/core/profiling.py); disabled unless a secret is set
+    PROFILING_SECRET: Optional[str] = None
+    PROFILING_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILING_MAX_SECONDS: float = 120.0
+    PROFILE_DIR: str = "profiles"
+    PROFILING_MAX_STORED: int = 50
+    # Serialize DB-sourced payloads without re-validating them (see app/schemas/serializers.py)
+    TRUSTED_SERIALIZATION: bool = True
 
     # Database
     DATABASE_URL: str
+    # Optional read replica for read-mostly endpoints (see app/core/db.py); may equal DATABASE_URL locally
+    DATABASE_READ_URL: Optional[str] = None
 
     # API Keys
     DALLE_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
+    # Points the Gemini client at another endpoint, e.g. benchmarks/fake_gemini_server.py
+    GEMINI_BASE_URL: Optional[str] = None
+    # AI record/replay cache: passthrough | record | replay (see app/services/ai_replay_store.py)
+    AI_REPLAY_MODE: str = "passthrough"
+    AI_REPLAY_DB_PATH: str = "ai_replay_cache.sqlite3"
+    # Provider-side context caching of the per-mystery next-scenario prompt prefix
+    AI_CONTEXT_CACHE_ENABLED: bool = False
+    AI_CONTEXT_CACHE_TTL_SECONDS: int = 3600
+    AI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS: int = 300
+    AI_CONTEXT_CACHE_RETRY_AFTER_FAILURE_SECONDS: int = 600
+    # Append-only AI call ledger, written in batches (see app/services/ai_ledger.py)
+    AI_LEDGER_ENABLED: bool = True
+    AI_LEDGER_FLUSH_INTERVAL_SECONDS: float = 5.0
+    AI_LEDGER_BATCH_SIZE: int = 200
+    AI_LEDGER_MAX_BUFFER: int = 10000
 
     # Cloud Storage
     AWS_ACCESS_KEY_ID: Optional[str] = None
@@ -20,8 +54,86 @@ class Settings(BaseSettings):
     AWS_S3_BUCKET_NAME: Optional[str] = None
     AWS_S3_REGION_NAME: Optional[str] = None
 
+    # Base image generation and variants (see app/services/image_processing.py)
+    GENERATE_BASE_IMAGES: bool = False
+    IMAGE_VARIANT_WIDTHS: List[int] = [320, 768, 1280]
+    IMAGE_VARIANT_FORMATS: List[str] = ["webp", "avif"]  # in order of preference when serving
+    IMAGE_VARIANT_QUALITY: int = 75
+    IMAGE_PROCESS_WORKERS: int = 2
+    GENERATE_SCENARIO_IMAGES: bool = False  # otherwise scenarios get mock image URLs
+
+    # Startup warm-up (see app/core/warmup.py)
+    WARMUP_ENABLED: bool = True
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_STEP_TIMEOUT_SECONDS: float = 15.0
+
     # Gameplay
     MAX_ROUNDS: int = 5
+    TODAY_CACHE_MAX_AGE_SECONDS: int = 300
+    ARCHIVE_PAGE_SIZE_DEFAULT: int = 20
+    ARCHIVE_PAGE_SIZE_MAX: int = 100
+    ARCHIVE_CACHE_MAX_AGE_SECONDS: int = 300
+    HISTORY_PAGE_SIZE_DEFAULT: int = 20
+    HISTORY_PAGE_SIZE_MAX: int = 100
+    SEARCH_PAGE_SIZE_DEFAULT: int = 20
+    SEARCH_PAGE_SIZE_MAX: int = 50
+
+    # WebSocket gameplay (see app/api/v1/endpoints/gameplay_ws.py)
+    WS_MAX_CONNECTIONS_PER_WORKER: int = 1000
+    WS_OUTBOUND_QUEUE_SIZE: int = 64
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+    WS_IDLE_TIMEOUT_SECONDS: float = 600.0
+
+    # Fair scheduling of next-scenario AI calls (per client = X-Session-Id or IP)
+    AI_FAIR_MAX_CONCURRENCY: int = 16
+    AI_FAIR_PER_CLIENT_IN_FLIGHT: int = 1
+    AI_FAIR_PER_CLIENT_QUEUED: int = 2
+    AI_FAIR_PER_IP_PENDING: int = 8  # in flight plus queued, across all session ids from one IP
+
+    # Caching (see app/core/cache.py)
+    CACHE_LOCAL_MAXSIZE: int = 1024
+    CACHE_DEFAULT_TTL_SECONDS: int = 300
+    CACHE_SHARED_ENABLED: bool = True
+    CACHE_NOTIFY_ENABLED: bool = True
+    CACHE_NOTIFY_CHANNEL: str = "plottwist_cache_invalidate"
+    CACHE_MYSTERY_TTL_SECONDS: int = 3600
+    CACHE_STYLE_TTL_SECONDS: int = 86400
+    CACHE_SCENARIO_TTL_SECONDS: int = 86400
+
+    # Choice canonicalization (see app/services/choice_normalizer.py)
+    CHOICE_MATCH_THRESHOLD: float = 0.75
+    CHOICE_MATCH_MIN_MARGIN: float = 0.05
+
+    # Precomputed scenario trees (see app/services/scenario_tree_service.py)
+    SCENARIO_TREE_ENABLED: bool = False
+    SCENARIO_TREE_CONCURRENCY: int = 8
+    SCENARIO_TREE_MAX_DEPTH: Optional[int] = None  # defaults to MAX_ROUNDS
+
+    # Admin generation jobs (see app/services/generation_job_service.py)
+    GENERATION_JOB_STALE_SECONDS: int = 900  # active jobs without a heartbeat this long are abandoned
+
+    # Bulk mystery generation
+    BULK_GENERATION_PARALLELISM: int = 4
+    BULK_GENERATION_INSERT_BATCH_SIZE: int = 10
+    BULK_GENERATION_MAX_DAYS: int = 62
+
+    # Near-duplicate detection of generated mysteries (see app/services/similarity_index.py)
+    SIMILARITY_CHECK_ENABLED: bool = True
+    SIMILARITY_LOOKBACK_DAYS: int = 365
+    SIMILARITY_THEME_THRESHOLD: float = 0.45  # estimated Jaccard of theme character 4-grams
+    SIMILARITY_STORY_THRESHOLD: float = 0.3  # estimated Jaccard of story + solution word 3-grams
+    SIMILARITY_MAX_THEME_ATTEMPTS: int = 3
+    SIMILARITY_FULL_RELOAD_SECONDS: int = 3600  # picks up other workers' edits and deletions
+
+    # Badges
+    BADGE_RULES_CACHE_TTL_SECONDS: int = 300
+    BADGE_BACKFILL_BATCH_SIZE: int = 500
+
+    # Session partitioning
+    SESSION_PARTITION_MONTHS_AHEAD: int = 3
+    SESSION_PARTITION_RETAIN_MONTHS: int = 12
+    SESSION_PARTITION_ARCHIVE_MODE: str = "detach"  # detach | compact | drop
+    SESSION_PARTITION_ARCHIVE_SCHEMA: str = "archive"
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -1,9 +1,10 @@
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Optional
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.sql import Select
 from app.core.config import settings
-from typing import AsyncGenerator
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,11 +14,19 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 async_engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=settings.SQLALCHEMY_ECHO,  # TODO False in prod
+    echo=False,  # SQLALCHEMY_ECHO is applied by configure_logging, through the log queue
     pool_pre_ping=True,
     pool_recycle=3600
 )
 
+# Read replica for read-mostly endpoints; without DATABASE_READ_URL reads share the primary.
+async_read_engine = create_async_engine(
+    settings.DATABASE_READ_URL,
+    echo=False,
+    pool_pre_ping=True,
+    pool_recycle=3600
+) if settings.DATABASE_READ_URL else async_engine
+
 AsyncSessionFactory = async_sessionmaker(
     bind=async_engine,
     autoflush=False,
@@ -25,21 +34,88 @@ AsyncSessionFactory = async_sessionmaker(
     expire_on_commit=False
 )
 
+_USES_PRIMARY = "uses_primary"
+
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to async_read_engine and everything else (flushes,
+    INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE, raw SQL) to async_engine.
+    After the first statement on the primary the session stays there, so a
+    request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.info.get(_USES_PRIMARY) and (
+                self._flushing or not isinstance(clause, Select) or clause._for_update_arg is not None):
+            self.info[_USES_PRIMARY] = True
+        return (async_engine if self.info.get(_USES_PRIMARY) else async_read_engine).sync_engine
+
+
+def stick_to_primary(session: AsyncSession) -> None:
+    """Routes the rest of a read session's statements to the primary, e.g. to confirm a row the replica lacks."""
+    session.info[_USES_PRIMARY] = True
+
+
+ReadSessionFactory = async_sessionmaker(
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    autocommit=False,
+    expire_on_commit=False
+)
+
+
+def _engine_pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    stats = {"status": pool.status()}
+    for metric in ("size", "checkedin", "checkedout", "overflow"):
+        metric_fn = getattr(pool, metric, None)
+        if callable(metric_fn):
+            stats[metric] = metric_fn()
+    return stats
+
+
+def get_pool_stats() -> dict:
+    """Connection pool occupancy for async_engine, used by load tests and diagnostics."""
+    return _engine_pool_stats(async_engine)
+
+
+def get_read_pool_stats() -> Optional[dict]:
+    """Pool occupancy for async_read_engine; None when reads share the primary."""
+    if async_read_engine is async_engine:
+        return None
+    return _engine_pool_stats(async_read_engine)
+
 
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """
     FastAPI dependency to get an async database session.
     Manages the session lifecycle and transaction.
     """
-    async with AsyncSessionFactory() as session:
-        logger.debug(f"DB Session {id(session)} created.")
+    async with _session_scope(AsyncSessionFactory) as session:
+        yield session
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Like get_async_db, but reads go to the read replica until the first write
+    (see RoutingSession). For read-mostly endpoints.
+    """
+    async with _session_scope(ReadSessionFactory) as session:
+        yield session
+
+
+@asynccontextmanager
+async def _session_scope(factory: async_sessionmaker) -> AsyncIterator[AsyncSession]:
+    async with factory() as session:
+        logger.debug("DB Session %s created.", id(session))
         try:
             yield session
             await session.commit()
-            logger.debug(f"DB Session {id(session)} committed.")
+            logger.debug("DB Session %s committed.", id(session))
         except Exception as e:
-            logger.error(f"DB Session {id(session)} rolling back due to: {e}")
+            logger.error("DB Session %s rolling back due to: %s", id(session), e)
             await session.rollback()
             raise
         finally:
-            logger.debug(f"DB Session {id(session)} closed.")
+            logger.debug("DB Session %s closed.", id(session))
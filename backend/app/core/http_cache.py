@@ -0,0 +1,45 @@
+import hashlib
+from typing import Dict, Optional
+from fastapi import Request, Response
+
+
+def make_strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def if_none_match_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    RFC 9110 If-None-Match uses weak comparison, so a W/ prefix on the
+    client's validator still matches our strong ETag.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_json_response(
+    request: Request,
+    body: bytes,
+    cache_control: str,
+    vary: Optional[str] = None,
+) -> Response:
+    """
+    Returns the JSON body with ETag/Cache-Control headers, or an empty 304
+    when the client's If-None-Match already matches.
+    """
+    etag = make_strong_etag(body)
+    headers: Dict[str, str] = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+
+    if if_none_match_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
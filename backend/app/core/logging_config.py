@@ -0,0 +1,147 @@
+"""
+Non-blocking, structured application logging.
+
+Log calls on the event loop only capture the record (plus the current
+request/session ids from contextvars), merge its arguments into the message
+and put it on an in-process queue. A QueueListener thread does the JSON
+encoding and stream I/O. Use lazy %-style arguments on hot paths so disabled levels cost nothing:
+
+    logger.debug("Generated round %s for mystery %s", current_round, mystery_id)
+
+RequestContextMiddleware sets the ids for each HTTP request. The request id is
+taken from X-Request-Id or generated, and is echoed back on the response. The
+session id comes from X-Session-Id.
+"""
+import contextvars
+import datetime
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+from typing import Any, Dict, Optional
+
+import orjson
+
+from app.core.config import settings
+from app.core.tracing import current_trace_id
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+session_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Stamps records with the request context before enqueueing them.
+    The stock prepare() still merges msg % args (and any traceback) into the
+    message and drops args/exc_info, so the listener thread never touches
+    mutable arguments the caller may change afterwards. Disabled levels are
+    filtered before this runs; JSON encoding and I/O stay on the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        record.trace_id = current_trace_id()
+        return super().prepare(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        session_id = getattr(record, "session_id", None)
+        if session_id:
+            payload["session_id"] = session_id
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            payload["trace_id"] = trace_id
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload).decode()
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        return super().format(record)
+
+
+def configure_logging() -> None:
+    """Routes the root logger through the queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(_TextFormatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    # Process/multiprocessing lookups are paid per record and never used in our output.
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_ContextQueueHandler(log_queue))
+    root.setLevel(settings.LOG_LEVEL.upper())
+    # Engines are created with echo=False: echo=True would attach SQLAlchemy's own
+    # stdout handler, writing every statement on the event loop and then again via the queue.
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO if settings.SQLALCHEMY_ECHO else logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware, so it adds no per-request task or body buffering."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or ())
+        request_id = (headers.get(b"x-request-id") or b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        session_id = (headers.get(b"x-session-id") or b"").decode("latin-1")[:64] or None
+        request_token = request_id_var.set(request_id)
+        session_token = session_id_var.set(session_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(request_token)
+            session_id_var.reset(session_token)
@@ -0,0 +1,22 @@
+"""Opaque keyset-pagination cursors: base64url-encoded JSON, never parsed by clients."""
+import base64
+import binascii
+from typing import Any, Dict
+
+import orjson
+from fastapi import HTTPException
+
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Raises a 400 for anything that is not a cursor we issued."""
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+    return values
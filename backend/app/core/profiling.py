@@ -0,0 +1,323 @@
+"""
+On-demand profiling of single API requests.
+
+An admin mints a short-lived token bound to one path (scripts/profile_token.py)
+and sends it as X-Profile-Token, or as the profile_token query parameter. For
+that request, a sampler thread records every PROFILING_SAMPLE_INTERVAL_MS where
+the request's task is:
+  running  - executing on the event loop (the async chain plus the sync frames below it)
+  awaiting - suspended in an await (the async chain down to the await it is parked on)
+so one profile shows both loop time and time spent waiting on the database,
+Gemini or storage. Tasks the request starts (scenario-tree builds, generation
+jobs) are followed as well, until they finish or PROFILING_MAX_SECONDS passes.
+
+Profiles are written to PROFILE_DIR as a JSON summary plus folded stacks, which
+flamegraph.pl and speedscope read directly, and listed under /admin/profiles.
+Without PROFILING_SECRET the middleware is not installed. With it, a request
+without a token costs one header scan.
+"""
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qs
+import logging
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{9}-[0-9a-f]{8}$")
+TOP_FUNCTIONS = 40
+
+# Keeps references to profiles still waiting on their tasks so they are not garbage collected.
+_finishing_profiles: Set[asyncio.Task] = set()
+
+_active_profile: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "active_profile", default=None)
+
+
+def _sign(expires: int, path: str) -> str:
+    return hmac.new(settings.PROFILING_SECRET.encode(), f"{expires}:{path}".encode(), hashlib.sha256).hexdigest()
+
+
+def make_profile_token(path: str, ttl_seconds: int = 300) -> str:
+    expires = int(time.time()) + ttl_seconds
+    return f"{expires}.{_sign(expires, path)}"
+
+
+def verify_profile_token(token: str, path: str) -> bool:
+    if not settings.PROFILING_SECRET:
+        return False
+    expires_str, _, signature = token.partition(".")
+    if not expires_str.isdigit() or int(expires_str) < time.time():
+        return False
+    return hmac.compare_digest(signature, _sign(int(expires_str), path))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    short_name = "/".join(filename.replace("\\", "/").rsplit("/", 2)[-2:])
+    return f"{code.co_qualname} ({short_name}:{code.co_firstlineno})"
+
+
+def _task_stack(task: asyncio.Task, loop_frame) -> Optional[List[str]]:
+    """Outermost-first frame labels for one task, ending in its [running] or [awaiting] state."""
+    coro = task.get_coro()
+    frames = []
+    running_frame = None
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        if getattr(coro, "cr_running", False) or getattr(coro, "gi_running", False):
+            running_frame = frame
+        awaited = getattr(coro, "cr_await", None) if hasattr(coro, "cr_await") else getattr(coro, "gi_yieldfrom", None)
+        if awaited is None or not (hasattr(awaited, "cr_frame") or hasattr(awaited, "gi_frame")):
+            break
+        coro = awaited
+    if not frames:
+        return None
+
+    if running_frame is None:
+        return [_frame_label(frame) for frame in frames] + ["[awaiting]"]
+
+    # The loop thread is inside this task: add the plain function frames below the running coroutine.
+    sync_frames = []
+    frame = loop_frame
+    while frame is not None and frame is not running_frame:
+        sync_frames.append(frame)
+        frame = frame.f_back
+    if frame is None:
+        sync_frames = []
+    frames = frames[:frames.index(running_frame) + 1] + list(reversed(sync_frames))
+    return [_frame_label(frame) for frame in frames] + ["[running]"]
+
+
+class ProfileSession:
+    def __init__(self, method: str, path: str) -> None:
+        now = time.time()
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(now))}{int(now % 1 * 1000):03d}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.interval_seconds = settings.PROFILING_SAMPLE_INTERVAL_MS / 1000
+        self.status_code: Optional[int] = None
+        self.request_seconds: Optional[float] = None
+        self.tasks: List[asyncio.Task] = []
+        self.stacks: Counter = Counter()
+        self.sample_count = 0
+        self._loop_thread_id = threading.get_ident()
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.profile_id}", daemon=True)
+
+    def add_task(self, task: asyncio.Task) -> None:
+        self.tasks.append(task)
+
+    def start(self, request_task: asyncio.Task) -> None:
+        self.tasks.append(request_task)
+        self._thread.start()
+
+    def _run(self) -> None:
+        deadline = self._started + settings.PROFILING_MAX_SECONDS
+        while not self._stop.wait(self.interval_seconds) and time.monotonic() < deadline:
+            self._sample()
+
+    def _sample(self) -> None:
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+        self.sample_count += 1
+        for index, task in enumerate(list(self.tasks)):
+            if task.done():
+                continue
+            try:
+                stack = _task_stack(task, loop_frame)
+            except (AttributeError, ValueError):
+                # The task moved on between reads; drop this sample for it.
+                continue
+            if stack:
+                root = "request" if index == 0 else f"task:{task.get_name()}"
+                self.stacks[";".join([root] + stack)] += 1
+
+    async def finish(self) -> None:
+        """Waits for the tasks the request started, then stops sampling and writes the profile."""
+        deadline = self._started + settings.PROFILING_MAX_SECONDS
+        while True:
+            pending = [task for task in self.tasks[1:] if not task.done()]
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            await asyncio.wait(pending, timeout=remaining)
+        self._stop.set()
+        await run_in_threadpool(self._thread.join)
+        try:
+            await run_in_threadpool(self._write)
+            logger.info("Wrote request profile %s for %s %s.", self.profile_id, self.method, self.path)
+        except OSError as e:
+            logger.warning("Failed to write request profile %s: %s", self.profile_id, e)
+
+    def summary(self) -> Dict[str, Any]:
+        interval_ms = self.interval_seconds * 1000
+        running: Counter = Counter()
+        awaiting: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            target = running if frames[-1] == "[running]" else awaiting
+            for label in set(frames[1:-1]):
+                target[label] += count
+        labels = sorted(set(running) | set(awaiting), key=lambda label: running[label] + awaiting[label], reverse=True)
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "request_seconds": self.request_seconds,
+            "profiled_seconds": round(time.monotonic() - self._started, 3),
+            "sample_interval_ms": interval_ms,
+            "samples": self.sample_count,
+            "tasks": len(self.tasks),
+            # Inclusive estimates: samples in which the function was on the stack, times the interval.
+            "functions": [
+                {
+                    "function": label,
+                    "running_ms": round(running[label] * interval_ms, 1),
+                    "awaiting_ms": round(awaiting[label] * interval_ms, 1),
+                }
+                for label in labels[:TOP_FUNCTIONS]
+            ],
+        }
+
+    def _write(self) -> None:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        base = os.path.join(settings.PROFILE_DIR, self.profile_id)
+        with open(f"{base}.folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(f"{base}.json", "wb") as f:
+            f.write(orjson.dumps(self.summary()))
+        _prune_profiles()
+
+
+def _prune_profiles() -> None:
+    summaries = sorted(
+        (name for name in os.listdir(settings.PROFILE_DIR) if name.endswith(".json")), reverse=True)
+    for name in summaries[settings.PROFILING_MAX_STORED:]:
+        profile_id = name[:-len(".json")]
+        for suffix in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(settings.PROFILE_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit: int) -> List[Dict[str, Any]]:
+    """Newest first: profile ids start with their timestamp, so file names sort by age."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    names = sorted((name for name in os.listdir(settings.PROFILE_DIR) if name.endswith(".json")), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        with open(os.path.join(settings.PROFILE_DIR, name), "rb") as f:
+            summary = orjson.loads(f.read())
+        summary.pop("functions", None)
+        profiles.append(summary)
+    return profiles
+
+
+def read_profile(profile_id: str, folded: bool = False) -> Optional[bytes]:
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, profile_id + (".folded" if folded else ".json"))
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    """Registers tasks created inside a profiled request with its session."""
+    previous_factory = loop.get_task_factory()
+    if getattr(previous_factory, "_profiling", False):
+        return
+
+    def task_factory(loop, coro, **kwargs):
+        if previous_factory is not None:
+            task = previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        session = _active_profile.get()
+        if session is not None:
+            session.add_task(task)
+        return task
+
+    task_factory._profiling = True
+    loop.set_task_factory(task_factory)
+
+
+def _profile_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers") or ():
+        if name == b"x-profile-token":
+            return value.decode("latin-1")
+    query_string = scope.get("query_string") or b""
+    if b"profile_token=" in query_string:
+        values = parse_qs(query_string.decode("latin-1")).get("profile_token")
+        if values:
+            return values[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware; only requests under API_V1_STR carrying a valid token are profiled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(settings.API_V1_STR):
+            await self.app(scope, receive, send)
+            return
+        token = _profile_token(scope)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+        if not verify_profile_token(token, scope["path"]):
+            logger.warning("Ignoring invalid or expired profile token for %s.", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        _install_task_factory(loop)
+        session = ProfileSession(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                session.status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session.profile_id.encode("latin-1"))]
+            await send(message)
+
+        context_token = _active_profile.set(session)
+        session.start(asyncio.current_task())
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            session.request_seconds = round(time.perf_counter() - started, 3)
+            _active_profile.reset(context_token)
+            # Created after the reset, so the finisher is not itself followed by the profile.
+            finish_task = loop.create_task(session.finish())
+            _finishing_profiles.add(finish_task)
+            finish_task.add_done_callback(_finishing_profiles.discard)
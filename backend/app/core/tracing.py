@@ -0,0 +1,431 @@
+"""
+Lightweight request tracing, modelled on OpenTelemetry.
+
+Spans form a tree per request: the HTTP route (TracingMiddleware), each SQL
+statement on async_engine (cursor event listeners), each Gemini call and the
+image/storage calls (@traced). The current span lives in a contextvar, so
+children attach to the right parent across awaits.
+
+Sampling is decided once at the root (head-based): TRACING_SAMPLE_RATIO of
+new traces are recorded, or the sampled flag of an incoming W3C `traceparent`
+header is honoured. Spans of an unsampled trace are no-ops, so the cost of an
+unsampled request is a contextvar lookup per instrumented call.
+
+Finished spans go to a pluggable SpanExporter. Exports are batched on a
+background thread, except for the in-memory exporter, which receives spans
+synchronously so tests can assert on them right away.
+  memory  - InMemorySpanExporter, for tests
+  file    - one JSON object per line in TRACING_FILE_PATH
+  logging - one log record per span on the "app.tracing" logger
+"""
+import contextvars
+import functools
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "status", "status_message", "_tracer")
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes else {}
+        self.status = "ok"
+        self.status_message: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self._tracer._on_end(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "status": self.status,
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+        }
+
+
+class NonRecordingSpan:
+    """Stands in for spans of unsampled traces; keeps the trace id so children stay unsampled."""
+    recording = False
+
+    def __init__(self, trace_id: str = "0" * 32, span_id: str = "0" * 16):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+_INVALID_SPAN = NonRecordingSpan()
+_current_span: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    """The active span, or a no-op span when nothing is being recorded."""
+    return _current_span.get() or _INVALID_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None and span.recording else None
+
+
+class TraceIdRatioSampler:
+    def __init__(self, ratio: float):
+        self.ratio = max(0.0, min(1.0, ratio))
+        self._bound = int(self.ratio * (1 << 64))
+
+    def should_sample(self, trace_id: str) -> bool:
+        # Derived from the trace id, so every service sampling at the same ratio agrees.
+        return int(trace_id[:16], 16) < self._bound
+
+
+class SpanExporter:
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class InMemorySpanExporter(SpanExporter):
+    def __init__(self, max_spans: int = 10000):
+        self._spans: Deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonFileSpanExporter(SpanExporter):
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab")
+
+    def export(self, spans: List[Span]) -> None:
+        self._file.write(b"".join(orjson.dumps(span.to_dict()) + b"\n" for span in spans))
+        self._file.flush()
+
+    def shutdown(self) -> None:
+        self._file.close()
+
+
+class LoggingSpanExporter(SpanExporter):
+    def __init__(self, logger_name: str = "app.tracing"):
+        self._logger = logging.getLogger(logger_name)
+
+    def export(self, spans: List[Span]) -> None:
+        for span in spans:
+            self._logger.info("span %s", orjson.dumps(span.to_dict()).decode())
+
+
+class BatchSpanProcessor:
+    """Hands finished spans to the exporter from a daemon thread, in batches."""
+
+    def __init__(self, exporter: SpanExporter, max_batch_size: int = 512, flush_interval_seconds: float = 2.0):
+        self.exporter = exporter
+        self.max_batch_size = max_batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception as e:
+                    logger.warning("Span export failed, dropping %s spans: %s", len(batch), e)
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self.exporter.shutdown()
+
+
+class SimpleSpanProcessor:
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    def on_end(self, span: Span) -> None:
+        self.exporter.export([span])
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+
+class _SpanScope:
+    """Context manager that makes a span current and ends it on exit."""
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span):
+        self.span = span
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.span.record_exception(exc)
+        self.span.end()
+        _current_span.reset(self._token)
+        return False
+
+
+class Tracer:
+    def __init__(self, sampler: TraceIdRatioSampler, processor=None):
+        self.sampler = sampler
+        self.processor = processor
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[Tuple[str, str, bool]] = None):
+        """
+        Starts a span under the current one (or under `parent`, a remote
+        (trace_id, span_id, sampled) triple) without making it current.
+        Callers must end() it.
+        """
+        if self.processor is None:
+            return _INVALID_SPAN
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            active = _current_span.get()
+            if active is not None:
+                if not active.recording:
+                    return active
+                trace_id, parent_id, sampled = active.trace_id, active.span_id, True
+            else:
+                trace_id = f"{random.getrandbits(128):032x}"
+                parent_id, sampled = None, self.sampler.should_sample(trace_id)
+        if not sampled:
+            return NonRecordingSpan(trace_id)
+        return Span(self, name, trace_id, parent_id, attributes)
+
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+             parent: Optional[Tuple[str, str, bool]] = None) -> _SpanScope:
+        """`with tracer.span("name") as span:` starts a child span and makes it current."""
+        return _SpanScope(self.start_span(name, attributes, parent))
+
+    def _on_end(self, span: Span) -> None:
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    def shutdown(self) -> None:
+        if self.processor is not None:
+            self.processor.shutdown()
+
+
+def build_tracer() -> Tracer:
+    sampler = TraceIdRatioSampler(settings.TRACING_SAMPLE_RATIO)
+    if not settings.TRACING_ENABLED:
+        return Tracer(sampler)
+    if settings.TRACING_EXPORTER == "memory":
+        return Tracer(sampler, SimpleSpanProcessor(InMemorySpanExporter()))
+    if settings.TRACING_EXPORTER == "file":
+        exporter: SpanExporter = JsonFileSpanExporter(settings.TRACING_FILE_PATH)
+    else:
+        exporter = LoggingSpanExporter()
+    return Tracer(sampler, BatchSpanProcessor(exporter))
+
+
+tracer = build_tracer()
+
+
+def traced(name: str, attributes: Optional[Dict[str, Any]] = None) -> Callable:
+    """Wraps an async function in a span; use current_span() inside to add attributes."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await fn(*args, **kwargs)
+            with tracer.span(name, attributes):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_traceparent(header_value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """W3C traceparent: 00-<32 hex trace id>-<16 hex parent id>-<2 hex flags>."""
+    if not header_value:
+        return None
+    parts = header_value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 0x01)
+
+
+class TracingMiddleware:
+    """Root span per HTTP request, named after the matched route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or ())
+        remote_parent = parse_traceparent((headers.get(b"traceparent") or b"").decode("latin-1"))
+        span = tracer.start_span(f"HTTP {scope['method']}", {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        }, parent=remote_parent)
+        if not span.recording:
+            token = _current_span.set(span)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current_span.reset(token)
+            return
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-trace-id", span.trace_id.encode("ascii"))]
+            await send(message)
+
+        with _SpanScope(span):
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route = scope.get("route")
+                route_path = getattr(route, "path", None)
+                if route_path:
+                    span.name = f"HTTP {scope['method']} {route_path}"
+                    span.set_attribute("http.route", route_path)
+
+
+def instrument_sqlalchemy(engine) -> None:
+    """
+    One span per statement executed on `engine` (pass async_engine.sync_engine).
+    SQLAlchemy's asyncio greenlets inherit the caller's contextvars, so these
+    spans nest under the request that issued the query. Each span lives on its
+    statement's execution context, not the pooled connection, so a cancelled
+    statement cannot leave a span behind for the next one to end.
+    """
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is None or _current_span.get() is None or not current_span().recording:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else None
+        span = tracer.start_span(f"db {operation}" if operation else "db", {
+            "db.system": "postgresql",
+            "db.operation": operation,
+            "db.statement": statement[:settings.TRACING_MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany or None,
+        })
+        context._trace_span = span
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            context._trace_span = None
+            if cursor is not None and getattr(cursor, "rowcount", -1) >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    def handle_error(exception_context):
+        context = exception_context.execution_context
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            context._trace_span = None
+            span.record_exception(exception_context.original_exception)
+            span.end()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
@@ -0,0 +1,141 @@
+"""
+Startup warm-up for a fresh worker.
+
+Runs in the background from the app lifespan so /health/live answers at once,
+while /health/ready reports 503 until warm-up has finished. Steps:
+  db_connections - opens WARMUP_DB_CONNECTIONS connections on async_engine (and on
+                   async_read_engine when it is separate) so the pools start full
+  session_partitions - creates usermysterysessions partitions up to SESSION_PARTITION_MONTHS_AHEAD,
+                   so session inserts do not depend on scripts/maintain_session_partitions.py alone
+  image_styles   - loads every ImageStyle into the cache
+  today_mystery  - loads today's mystery snapshot into the cache
+  gemini_client  - one cheap model lookup so the client's HTTP connection is open
+
+A failed or timed-out step is logged and reported but does not keep the
+worker unready; it would serve the same traffic cold either way.
+"""
+import asyncio
+import datetime
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.future import select
+from starlette.concurrency import run_in_threadpool
+import logging
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.db import AsyncSessionFactory, async_engine, async_read_engine
+from app.models.style_models import ImageStyle
+from app.services import ai_services
+from app.services.ai_constants import DEFAULT_GEMINI_MODEL_NAME_STRING
+from app.services.mystery_cache_service import get_today_mystery_snapshot, image_style_key
+from app.services.session_partition_service import ensure_session_partitions
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    def __init__(self) -> None:
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def as_dict(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {"ready": self.ready, "warmup_seconds": duration, "steps": self.steps}
+
+
+warmup_state = WarmupState()
+
+
+async def _open_db_connections() -> str:
+    engines = [async_engine] if async_read_engine is async_engine else [async_engine, async_read_engine]
+    counts = await asyncio.gather(*(_open_engine_connections(engine) for engine in engines))
+    return " + ".join(f"{count} connections" for count in counts)
+
+
+async def _open_engine_connections(engine) -> int:
+    # Hold them all at once; opened one after another the pool would just reuse a single connection.
+    target = min(settings.WARMUP_DB_CONNECTIONS, engine.pool.size())
+    results = await asyncio.gather(
+        *(engine.connect().start() for _ in range(target)), return_exceptions=True)
+    connections = [result for result in results if not isinstance(result, BaseException)]
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in connections))
+    finally:
+        for conn in connections:
+            await conn.close()
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        raise failures[0]
+    return target
+
+
+async def _ensure_session_partitions() -> str:
+    created = await ensure_session_partitions()
+    return f"created {', '.join(created)}" if created else "up to date"
+
+
+async def _preload_image_styles() -> str:
+    async with AsyncSessionFactory() as db:
+        styles = (await db.execute(select(ImageStyle))).scalars().all()
+    for style in styles:
+        await cache.set_json(
+            image_style_key(style.name),
+            {"id": style.id, "name": style.name, "dalle_prompt_modifier": style.dalle_prompt_modifier},
+            ttl_seconds=settings.CACHE_STYLE_TTL_SECONDS,
+        )
+    return f"{len(styles)} styles"
+
+
+async def _preload_today_mystery() -> str:
+    async with AsyncSessionFactory() as db:
+        snapshot = await get_today_mystery_snapshot(db, datetime.date.today())
+    return f"mystery {snapshot['id']}" if snapshot else "no mystery for today yet"
+
+
+async def _warm_gemini_client() -> str:
+    if settings.AI_REPLAY_MODE == "replay":
+        return "skipped (replay mode)"
+    if ai_services.master_gemini_client is None:
+        return "skipped (no client)"
+    await run_in_threadpool(ai_services.master_gemini_client.models.get, model=DEFAULT_GEMINI_MODEL_NAME_STRING)
+    return "connected"
+
+
+WARMUP_STEPS = (
+    ("db_connections", _open_db_connections),
+    ("session_partitions", _ensure_session_partitions),
+    ("image_styles", _preload_image_styles),
+    ("today_mystery", _preload_today_mystery),
+    ("gemini_client", _warm_gemini_client),
+)
+
+
+async def run_warmup() -> None:
+    warmup_state.started_at = time.monotonic()
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(step(), timeout=settings.WARMUP_STEP_TIMEOUT_SECONDS)
+            ok = True
+        except Exception as e:
+            detail = f"{type(e).__name__}: {e}"
+            ok = False
+            logger.warning(f"Warm-up step '{name}' failed: {detail}")
+        warmup_state.steps[name] = {
+            "ok": ok, "seconds": round(time.perf_counter() - started, 3), "detail": detail}
+    warmup_state.finished_at = time.monotonic()
+    warmup_state.ready = True
+    logger.info(f"Warm-up finished in {warmup_state.finished_at - warmup_state.started_at:.2f}s.")
+
+
+def start_warmup() -> Optional[asyncio.Task]:
+    if not settings.WARMUP_ENABLED:
+        warmup_state.ready = True
+        return None
+    return asyncio.get_running_loop().create_task(run_warmup())
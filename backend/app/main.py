@@ -1,15 +1,74 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.core.logging_config import RequestContextMiddleware, configure_logging, shutdown_logging
+
+# Before the app modules are imported, so their import-time log records are captured too.
+configure_logging()
+
+from app.core.cache import cache
+from app.core.db import async_engine, async_read_engine
+from app.core.profiling import ProfilingMiddleware
+from app.core.tracing import TracingMiddleware, instrument_sqlalchemy, tracer
+from app.core.warmup import start_warmup, warmup_state
+from app.services.ai_ledger import ai_call_ledger
+from app.services.generation_job_service import stop_generation_jobs
+from app.services.image_processing import shutdown_image_processing
 from app.api.v1.api import api_router as api_v1_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await cache.start_invalidation_listener()
+    # Runs in the background so the worker accepts /health/live while warming up.
+    warmup_task = start_warmup()
+    yield
+    # Uvicorn has already stopped accepting connections when this runs, so this
+    # does not drain load balancers; give the orchestrator a grace delay before
+    # SIGTERM (e.g. a preStop sleep longer than its readiness probe period) for
+    # that. It only makes probes answered during graceful shutdown report 503.
+    warmup_state.ready = False
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await stop_generation_jobs()
+    await cache.stop_invalidation_listener()
+    await ai_call_ledger.stop()
+    shutdown_image_processing()
+    tracer.shutdown()
+    shutdown_logging()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
+if tracer.enabled:
+    app.add_middleware(TracingMiddleware)
+    instrument_sqlalchemy(async_engine.sync_engine)
+    if async_read_engine is not async_engine:
+        instrument_sqlalchemy(async_read_engine.sync_engine)
+if settings.PROFILING_SECRET:
+    app.add_middleware(ProfilingMiddleware)
+# Added last so it is outermost: request ids are set before the root span starts.
+app.add_middleware(RequestContextMiddleware)
+
 app.include_router(api_v1_router, prefix=settings.API_V1_STR)
 
 
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": f"Welcome to {settings.PROJECT_NAME}!"}
+
+
+@app.get("/health/live", tags=["Health"])
+async def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["Health"])
+async def health_ready():
+    """503 until startup warm-up has finished, and for probes still answered during graceful shutdown."""
+    return JSONResponse(warmup_state.as_dict(), status_code=200 if warmup_state.ready else 503)
@@ -1,4 +1,4 @@
-from .user_models import User, UserProvider
+from .user_models import User, UserProvider, UserStats
 from .style_models import ImageStyle
 from .badge_models import Badge  # Badge is referenced by UserBadge
 
@@ -8,3 +8,8 @@ from .badge_models import UserBadge  # UserBadge references User and Badge
 
 from .mystery_models import DailyMystery
 from .mystery_models import UserMysterySession
+from .mystery_models import ScenarioNode
+
+from .cache_models import CacheEntry
+from .job_models import GenerationJob
+from .ai_ledger_models import AICallLedgerEntry
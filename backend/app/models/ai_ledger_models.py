@@ -0,0 +1,36 @@
+from sqlalchemy import Integer, String, Boolean, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from typing import Optional
+from datetime import datetime
+
+from app.models.base_class import IdMixinBase
+
+
+class AICallLedgerEntry(IdMixinBase):
+    """
+    Append-only record of every Gemini call made through ai_services
+    (written in batches by app/services/ai_ledger.py).
+    Rows arrive in created_at order, so a BRIN index covers time-range
+    reports at a fraction of a btree's size.
+    """
+    __table_args__ = (
+        Index("ix_aicallledgerentries_created_at_brin", "created_at", postgresql_using="brin"),
+    )
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    task_type: Mapped[str] = mapped_column(String(40), nullable=False)
+    # Not a foreign key: the ledger must outlive regenerated or deleted mysteries.
+    daily_mystery_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    round_number: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+
+    prompt_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    output_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    cached_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    latency_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    # ok | replay | blocked | invalid_response | error
+    outcome: Mapped[str] = mapped_column(String(30), nullable=False)
+
+    is_retry: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    is_hedge: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    used_context_cache: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
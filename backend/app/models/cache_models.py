@@ -0,0 +1,18 @@
+from sqlalchemy import String, LargeBinary, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+
+from app.models.base_class import BaseModel
+
+
+class CacheEntry(BaseModel):
+    """
+    Shared cache tier for all API workers (see app/core/cache.py).
+    UNLOGGED: no WAL writes, contents are disposable and truncated after a crash.
+    """
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    value: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, index=True)
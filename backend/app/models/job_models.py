@@ -0,0 +1,46 @@
+from sqlalchemy import Integer, String, Text, Date, Boolean, DateTime, ForeignKey, func, JSON, Index
+from sqlalchemy.orm import relationship, Mapped, mapped_column
+from typing import Any, Dict, Optional
+from datetime import date, datetime
+
+from app.models.base_class import IdMixinBase
+
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+class GenerationJob(IdMixinBase):
+    """
+    One admin-triggered mystery generation, run in the background
+    (see app/services/generation_job_service.py).
+    status: queued -> running -> succeeded | failed
+    At most one job per date is active (queued or running); see the partial unique index below.
+    """
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued", index=True)
+    for_date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    force_regenerate: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    current_stage: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
+    # Stage name -> seconds, in the order the stages ran.
+    stage_timings: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False, default=dict)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    daily_mystery_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("dailymysteries.id", ondelete="SET NULL"), nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True)
+    # Touched at every stage boundary; an active job without a recent heartbeat is abandoned.
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), nullable=True)
+
+    daily_mystery = relationship("DailyMystery")
+
+
+Index(
+    "uq_generationjobs_active_for_date",
+    GenerationJob.for_date,
+    unique=True,
+    postgresql_where=GenerationJob.status.in_(ACTIVE_JOB_STATUSES),
+)
@@ -1,5 +1,6 @@
 from sqlalchemy import (Integer, String, Text, Date,
-                        Boolean, DateTime, ForeignKey, func, JSON)
+                        Boolean, DateTime, ForeignKey, func, JSON, Index, UniqueConstraint)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
 from app.models.base_class import IdMixinBase
@@ -24,21 +25,42 @@ class DailyMystery(IdMixinBase):
 
     base_image_urls: Mapped[Optional[List[str]]
                             ] = mapped_column(JSON, nullable=True)
+    # Per base image: [{"width", "format", "url"}, ...], smallest first (see image_processing).
+    base_image_variants: Mapped[Optional[List[List[Dict[str, Any]]]]
+                                ] = mapped_column(JSON, nullable=True)
     initial_choices_pool: Mapped[List[str]
                                  ] = mapped_column(JSON, nullable=False)
+    # Weighted full-text vector, written with the row (see mystery_search_service).
+    # Deferred: only search queries read it.
+    search_vector: Mapped[Optional[Any]] = mapped_column(
+        TSVECTOR, nullable=True, deferred=True)
 
     user_sessions = relationship(
         "UserMysterySession", back_populates="daily_mystery", cascade="all, delete-orphan")
+    scenario_nodes = relationship(
+        "ScenarioNode", back_populates="daily_mystery", cascade="all, delete-orphan", passive_deletes=True)
+
+
+Index(
+    "ix_dailymysteries_search_vector",
+    DailyMystery.search_vector,
+    postgresql_using="gin",
+)
 
 
 class UserMysterySession(IdMixinBase):
+    # Range-partitioned by month on start_time (see session_partition_service).
+    # Postgres requires the partition key in the primary key, hence (id, start_time).
+    __table_args__ = {"postgresql_partition_by": "RANGE (start_time)"}
+
+    # Indexed by ix_usermysterysessions_user_id_start_time_id below.
     user_id: Mapped[Optional[int]] = mapped_column(
-        Integer, ForeignKey("users.id"), nullable=True, index=True)
+        Integer, ForeignKey("users.id"), nullable=True)
     daily_mystery_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("dailymysteries.id"), nullable=False, index=True)
 
     start_time: Mapped[DateTimeType] = mapped_column(
-        DateTime(timezone=True), server_default=func.now())
+        DateTime(timezone=True), server_default=func.now(), primary_key=True)
     end_time: Mapped[Optional[DateTimeType]] = mapped_column(
         DateTime(timezone=True), nullable=True)
     is_solved: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -58,3 +80,43 @@ class UserMysterySession(IdMixinBase):
     user = relationship("User", back_populates="mystery_sessions")
     daily_mystery = relationship(
         "DailyMystery", back_populates="user_sessions")
+
+
+# Serves a user's history newest-first with (start_time, id) keyset paging;
+# its leading user_id column also covers plain lookups by user.
+Index(
+    "ix_usermysterysessions_user_id_start_time_id",
+    UserMysterySession.user_id,
+    UserMysterySession.start_time.desc(),
+    UserMysterySession.id.desc(),
+)
+
+
+class ScenarioNode(IdMixinBase):
+    """
+    One precomputed turn of a mystery's decision tree (see scenario_tree_service).
+    `turn_hash` identifies the turn by (round, previous scenario text, choice),
+    which is exactly what gameplay knows when a player submits a choice.
+    """
+    __table_args__ = (
+        UniqueConstraint("daily_mystery_id", "turn_hash",
+                         name="uq_scenarionodes_daily_mystery_id_turn_hash"),
+    )
+
+    daily_mystery_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("dailymysteries.id", ondelete="CASCADE"), nullable=False)
+    parent_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("scenarionodes.id", ondelete="CASCADE"), nullable=True)
+    round_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    turn_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+
+    choice_text: Mapped[str] = mapped_column(Text, nullable=False)
+    scenario_text: Mapped[str] = mapped_column(Text, nullable=False)
+    image_prompt: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    choices: Mapped[List[str]] = mapped_column(JSON, nullable=False)
+    is_final_round: Mapped[bool] = mapped_column(Boolean, default=False)
+    solution_explanation: Mapped[Optional[str]] = mapped_column(
+        Text, nullable=True)
+
+    daily_mystery = relationship(
+        "DailyMystery", back_populates="scenario_nodes")
@@ -1,10 +1,10 @@
-from sqlalchemy import (Boolean, Integer, String, DateTime, func,
+from sqlalchemy import (Boolean, Integer, String, Date, DateTime, func,
                         Enum as SQLAlchemyEnum, ForeignKey)
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
-from app.models.base_class import IdMixinBase
+from app.models.base_class import BaseModel, IdMixinBase
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 import enum
 
 
@@ -38,3 +38,28 @@ class User(IdMixinBase):
         "UserBadge", back_populates="user", cascade="all, delete-orphan")
     mystery_sessions = relationship(
         "UserMysterySession", back_populates="user", cascade="all, delete-orphan")
+    stats = relationship(
+        "UserStats", back_populates="user", uselist=False, cascade="all, delete-orphan")
+
+
+class UserStats(BaseModel):
+    """
+    Incrementally maintained per-user gameplay statistics.
+    Badge criteria are evaluated against this row instead of re-scanning sessions.
+    """
+    user_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id"), primary_key=True)
+
+    sessions_completed: Mapped[int] = mapped_column(Integer, default=0)
+    solved_count: Mapped[int] = mapped_column(Integer, default=0)
+    current_streak: Mapped[int] = mapped_column(Integer, default=0)
+    longest_streak: Mapped[int] = mapped_column(Integer, default=0)
+    fastest_solve_seconds: Mapped[Optional[int]] = mapped_column(
+        Integer, nullable=True)
+    last_solved_date: Mapped[Optional[date]] = mapped_column(
+        Date, nullable=True)
+
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
+
+    user = relationship("User", back_populates="stats")
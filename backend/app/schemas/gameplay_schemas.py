@@ -23,6 +23,17 @@ class NextScenarioRequest(BaseModel):
         None,
         description="The text of the scenario from which the current_user_choice was made. If path_so_far is empty, this should be the base_story_text."
     )
+    offered_choices: Optional[List[str]] = Field(
+        None,
+        description="The next_choices shown with last_presented_scenario_text. Lets the server match a typed choice to the offered one. Defaults to the mystery's initial choices in the first round."
+    )
+
+
+class GameplayResumeMessage(BaseModel):
+    """Restores a game on a new WebSocket gameplay channel; same fields as NextScenarioRequest minus the choice."""
+    path_so_far: List[StoryTurn] = Field(default_factory=list)
+    last_presented_scenario_text: Optional[str] = None
+    offered_choices: Optional[List[str]] = None
 
 
 class NextScenarioResponse(BaseModel):
@@ -0,0 +1,18 @@
+from typing import Any, Dict, Optional
+from datetime import date, datetime
+from app.schemas.base_schema import BaseSchema, IDModelMixin
+from app.schemas.mystery_schemas import DailyMystery as DailyMysterySchema
+
+
+class GenerationJob(BaseSchema, IDModelMixin):
+    status: str
+    for_date: date
+    force_regenerate: bool
+    current_stage: Optional[str] = None
+    stage_timings: Dict[str, Any]
+    error: Optional[str] = None
+    daily_mystery_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    daily_mystery: Optional[DailyMysterySchema] = None
@@ -12,6 +12,12 @@ class CharacterDossierItem(BaseSchema):
     potential_secrets_or_motives: Optional[str] = None
 
 
+class ImageVariant(BaseSchema):
+    width: int
+    format: str
+    url: HttpUrl
+
+
 class DailyMysteryBase(BaseSchema):
     date: date
     theme: str
@@ -21,6 +27,7 @@ class DailyMysteryBase(BaseSchema):
     critical_path_clues: Optional[List[str]] = None
     image_style_id: int
     base_image_urls: Optional[List[HttpUrl]] = None
+    base_image_variants: Optional[List[List[ImageVariant]]] = None
     initial_choices_pool: List[str]
 
 
@@ -28,18 +35,55 @@ class DailyMysteryDisplayForUser(BaseSchema):
     daily_mystery_id: int
     theme: str = Field(..., description="The theme/title of today's mystery.")
     base_story_text: str
-    base_image_urls: Optional[List[HttpUrl]] = None
+    base_image_urls: Optional[List[HttpUrl]] = Field(
+        None, description="One URL per base image: the smallest variant fitting image_width in a format the client accepts.")
     character_dossiers: Optional[List[CharacterDossierItem]] = None
     initial_choices: List[str] = Field(
         ..., description="Three randomly selected initial actions for the player.")
 
 
+class DailyMysteryArchiveItem(BaseSchema):
+    daily_mystery_id: int
+    date: date
+    theme: str
+    thumbnail_image_url: Optional[str] = Field(
+        None, description="The mystery's first base image (its smallest variant, when it has variants), if any.")
+
+
+class DailyMysteryArchivePage(BaseSchema):
+    items: List[DailyMysteryArchiveItem]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` to fetch the next (older) page; null on the last page.")
+
+
+class DailyMysterySearchItem(DailyMysteryArchiveItem):
+    rank: float = Field(..., description="Relevance to the query; higher is better.")
+
+
+class DailyMysterySearchPage(BaseSchema):
+    items: List[DailyMysterySearchItem]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` with the same `q` to fetch the next page; null on the last page.")
+
+
 class DailyMysteryCreate(DailyMysteryBase):
     pass
 
 
+class DailyMysteryBulkGenerateRequest(BaseSchema):
+    start_date: date
+    end_date: date
+    parallelism: Optional[int] = Field(
+        None, ge=1, le=16, description="Concurrent AI generations. Defaults to BULK_GENERATION_PARALLELISM.")
+
+
 class DailyMysteryUpdate(BaseSchema):
-    theme: Optional[str] = None
+    theme: Optional[Annotated[str, StringConstraints(min_length=1, max_length=100)]] = None
+    base_story_text: Optional[str] = None
+    actual_solution_text: Optional[str] = None
+    character_dossiers: Optional[List[CharacterDossierItem]] = None
+    critical_path_clues: Optional[List[str]] = None
+    initial_choices_pool: Optional[List[str]] = None
 
 
 class DailyMystery(DailyMysteryBase, IDModelMixin):
@@ -66,6 +110,24 @@ class UserMysterySessionUpdate(BaseSchema):
     end_time: Optional[datetime] = None
 
 
+class UserMysteryHistoryItem(BaseSchema):
+    session_id: int
+    daily_mystery_id: int
+    mystery_date: date
+    theme: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    is_solved: bool
+    current_round: int
+    detective_rank: Optional[str] = None
+
+
+class UserMysteryHistoryPage(BaseSchema):
+    items: List[UserMysteryHistoryItem]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as `cursor` to fetch the next (older) page; null on the last page.")
+
+
 class UserMysterySession(UserMysterySessionBase, IDModelMixin):
     start_time: datetime
     end_time: Optional[datetime] = None
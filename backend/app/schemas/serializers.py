@@ -0,0 +1,66 @@
+"""
+Trusted-data serializers for payloads built from our own database rows.
+
+The data was validated when it was written (AI output goes through
+CharacterDossierItem and the mystery schemas at generation time), so the hot
+read paths skip Pydantic re-validation and emit plain JSON-native dicts that
+ORJSONResponse can dump directly. The dict shapes mirror the response_model
+declared on each route, which keeps the OpenAPI docs accurate.
+"""
+from typing import Any, Dict, List, Optional
+
+from app.models.mystery_models import DailyMystery
+
+
+def _dossiers_payload(dossiers: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    if dossiers is None:
+        return None
+    return [
+        {
+            "character_name": dossier.get("character_name"),
+            "description": dossier.get("description"),
+            "potential_secrets_or_motives": dossier.get("potential_secrets_or_motives"),
+        }
+        for dossier in dossiers
+    ]
+
+
+def trusted_display_payload(
+    snapshot: Dict[str, Any], initial_choices: List[str], base_image_urls: List[str]
+) -> Dict[str, Any]:
+    """
+    Same shape as DailyMysteryDisplayForUser.
+    `snapshot` is a cached mystery snapshot (see mystery_cache_service.mystery_snapshot);
+    `base_image_urls` are the image URLs chosen for this client.
+    """
+    return {
+        "daily_mystery_id": snapshot["id"],
+        "theme": snapshot["theme"],
+        "base_story_text": snapshot["base_story_text"],
+        "base_image_urls": base_image_urls,
+        "character_dossiers": _dossiers_payload(snapshot["character_dossiers"]),
+        "initial_choices": initial_choices,
+    }
+
+
+def trusted_daily_mystery_payload(mystery: DailyMystery) -> Dict[str, Any]:
+    """Same shape as the admin DailyMystery schema, including the nested ImageStyle."""
+    image_style = mystery.image_style
+    return {
+        "id": mystery.id,
+        "date": mystery.date,
+        "theme": mystery.theme,
+        "base_story_text": mystery.base_story_text,
+        "actual_solution_text": mystery.actual_solution_text,
+        "character_dossiers": _dossiers_payload(mystery.character_dossiers),
+        "critical_path_clues": mystery.critical_path_clues,
+        "image_style_id": mystery.image_style_id,
+        "base_image_urls": mystery.base_image_urls,
+        "base_image_variants": mystery.base_image_variants,
+        "initial_choices_pool": mystery.initial_choices_pool,
+        "image_style": {
+            "id": image_style.id,
+            "name": image_style.name,
+            "dalle_prompt_modifier": image_style.dalle_prompt_modifier,
+        },
+    }
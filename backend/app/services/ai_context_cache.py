@@ -0,0 +1,138 @@
+"""
+Per-mystery Gemini context caches for next-scenario calls.
+
+Every turn of a mystery shares the same large prefix (system instruction,
+base story, hidden solution). When enabled, that prefix is uploaded once per
+DailyMystery as provider-side cached content; turns then send only the small
+per-turn suffix and reference the cache by name. Handles are refreshed before
+their TTL runs out and deleted at day rollover.
+
+If the provider refuses to create a cache (e.g. the prefix is below the
+model's minimum cacheable size) the mystery falls back to inline prompts and
+creation is not retried until AI_CONTEXT_CACHE_RETRY_AFTER_FAILURE_SECONDS pass.
+"""
+import asyncio
+import datetime
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from starlette.concurrency import run_in_threadpool
+import logging
+
+from google.genai import types as genai_types
+
+from app.core.config import settings
+from app.services.ai_constants import DEFAULT_GEMINI_MODEL_NAME_STRING
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ContextCacheEntry:
+    for_date: datetime.date
+    name: Optional[str] = None
+    expires_at: float = 0.0
+    retry_after: float = 0.0
+
+
+_entries: Dict[int, _ContextCacheEntry] = {}
+_locks: Dict[int, asyncio.Lock] = {}
+
+
+def _ttl_string() -> str:
+    return f"{settings.AI_CONTEXT_CACHE_TTL_SECONDS}s"
+
+
+async def _delete_remote_cache(client, name: str) -> None:
+    try:
+        await run_in_threadpool(client.caches.delete, name=name)
+    except Exception as e:
+        logger.warning(f"Failed to delete Gemini context cache {name}: {e}")
+
+
+async def drop_stale_context_caches(client, today: Optional[datetime.date] = None) -> None:
+    """Deletes caches that belong to a previous day's mystery."""
+    today = today or datetime.date.today()
+    stale_ids = [mystery_id for mystery_id, entry in _entries.items() if entry.for_date < today]
+    for mystery_id in stale_ids:
+        entry = _entries.pop(mystery_id)
+        _locks.pop(mystery_id, None)
+        if entry.name:
+            await _delete_remote_cache(client, entry.name)
+            logger.info(f"Dropped Gemini context cache for mystery {mystery_id} at day rollover.")
+
+
+async def invalidate_context_cache(client, daily_mystery_id: int) -> None:
+    entry = _entries.pop(daily_mystery_id, None)
+    if entry and entry.name:
+        await _delete_remote_cache(client, entry.name)
+
+
+async def get_context_cache_name(
+    client,
+    daily_mystery_id: int,
+    for_date: datetime.date,
+    prefix_text: str,
+    system_instruction_text: Optional[str],
+) -> Optional[str]:
+    """
+    Returns the cached-content name holding this mystery's prompt prefix,
+    creating or refreshing it as needed, or None if callers should send the
+    full prompt inline.
+    """
+    if not settings.AI_CONTEXT_CACHE_ENABLED or client is None:
+        return None
+
+    await drop_stale_context_caches(client)
+
+    lock = _locks.setdefault(daily_mystery_id, asyncio.Lock())
+    async with lock:
+        now = time.time()
+        entry = _entries.get(daily_mystery_id)
+        if entry is None:
+            entry = _entries[daily_mystery_id] = _ContextCacheEntry(for_date=for_date)
+
+        if entry.name is None and now < entry.retry_after:
+            return None
+
+        if entry.name and entry.expires_at - now > settings.AI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+            return entry.name
+
+        if entry.name:
+            try:
+                await run_in_threadpool(
+                    client.caches.update,
+                    name=entry.name,
+                    config=genai_types.UpdateCachedContentConfig(ttl=_ttl_string()),
+                )
+                entry.expires_at = now + settings.AI_CONTEXT_CACHE_TTL_SECONDS
+                logger.debug(f"Refreshed Gemini context cache for mystery {daily_mystery_id}.")
+                return entry.name
+            except Exception as e:
+                logger.warning(
+                    f"Failed to refresh Gemini context cache for mystery {daily_mystery_id}, recreating: {e}")
+                entry.name = None
+
+        create_config_args = {
+            "contents": [genai_types.Content(parts=[genai_types.Part(text=prefix_text)], role="user")],
+            "ttl": _ttl_string(),
+            "display_name": f"plottwist-mystery-{daily_mystery_id}",
+        }
+        if system_instruction_text:
+            create_config_args["system_instruction"] = system_instruction_text
+        try:
+            cached_content = await run_in_threadpool(
+                client.caches.create,
+                model=DEFAULT_GEMINI_MODEL_NAME_STRING,
+                config=genai_types.CreateCachedContentConfig(**create_config_args),
+            )
+        except Exception as e:
+            entry.retry_after = now + settings.AI_CONTEXT_CACHE_RETRY_AFTER_FAILURE_SECONDS
+            logger.warning(
+                f"Could not create Gemini context cache for mystery {daily_mystery_id}; using inline prompts: {e}")
+            return None
+
+        entry.name = cached_content.name
+        entry.expires_at = now + settings.AI_CONTEXT_CACHE_TTL_SECONDS
+        logger.info(f"Created Gemini context cache {entry.name} for mystery {daily_mystery_id}.")
+        return entry.name
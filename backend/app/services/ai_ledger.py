@@ -0,0 +1,89 @@
+"""
+Batched writer for the AI call ledger (AICallLedgerEntry).
+
+record() only appends to an in-memory buffer, so the Gemini call path never
+waits on the database. A background task, started lazily on the first record,
+inserts the buffer every AI_LEDGER_FLUSH_INTERVAL_SECONDS or as soon as
+AI_LEDGER_BATCH_SIZE entries are waiting. The buffer is capped at
+AI_LEDGER_MAX_BUFFER; past that entries are dropped and counted rather than
+growing memory while the database is unavailable. The app lifespan calls
+stop() so buffered entries are written on shutdown.
+"""
+import asyncio
+import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+import logging
+
+from app.core.config import settings
+from app.core.db import AsyncSessionFactory
+from app.models.ai_ledger_models import AICallLedgerEntry
+
+logger = logging.getLogger(__name__)
+
+
+class AICallLedger:
+    def __init__(self) -> None:
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.dropped = 0
+
+    def record(self, call_record: Dict[str, Any]) -> None:
+        """Buffers one call. Must be called from the event loop."""
+        if not settings.AI_LEDGER_ENABLED:
+            return
+        if len(self._buffer) >= settings.AI_LEDGER_MAX_BUFFER:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("AI ledger buffer full; %s entries dropped so far.", self.dropped)
+            return
+        self._buffer.append({**call_record, "created_at": datetime.datetime.now(datetime.timezone.utc)})
+        self._ensure_flush_task()
+        if len(self._buffer) >= settings.AI_LEDGER_BATCH_SIZE:
+            self._wakeup.set()
+
+    def _ensure_flush_task(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._flush_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.AI_LEDGER_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Writes everything buffered so far, one batch per transaction. Returns the number written."""
+        written = 0
+        while self._buffer:
+            batch = self._buffer[:settings.AI_LEDGER_BATCH_SIZE]
+            del self._buffer[:len(batch)]
+            try:
+                async with AsyncSessionFactory() as db:
+                    await db.execute(insert(AICallLedgerEntry), batch)
+                    await db.commit()
+                written += len(batch)
+            except Exception as e:
+                # Not re-buffered: a persistent failure would otherwise retry the same rows forever.
+                self.dropped += len(batch)
+                logger.warning("Failed to write %s AI ledger entries: %s - %s", len(batch), type(e).__name__, e)
+        return written
+
+    async def stop(self) -> None:
+        """Stops the flush task after it has written whatever is still buffered."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._stopping = True
+            self._wakeup.set()
+            await self._flush_task
+        self._flush_task = None
+        await self.flush()
+
+
+ai_call_ledger = AICallLedger()
@@ -0,0 +1,82 @@
+"""
+Record/replay store for Gemini responses, keyed by a hash of everything that
+determines the output: model, system instruction, prompt and generation config.
+
+Modes (settings.AI_REPLAY_MODE):
+  passthrough - always call the model, never touch the store (default).
+  record      - serve stored responses; on a miss call the model and store the result.
+  replay      - serve stored responses only; a miss is an error, the model is never called.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+REPLAY_MODES = ("passthrough", "record", "replay")
+
+
+def make_replay_key(
+    model_name: str,
+    system_instruction_text: Optional[str],
+    prompt_text: str,
+    generation_config: Dict[str, Any],
+) -> str:
+    material = json.dumps(
+        {
+            "model": model_name,
+            "system_instruction": system_instruction_text,
+            "prompt": prompt_text,
+            "config": generation_config,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AIReplayStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_responses ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, "
+                "generated_text TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _get_sync(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT generated_text FROM ai_responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _put_sync(self, key: str, model_name: str, generated_text: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_responses (key, model, generated_text, created_at) VALUES (?, ?, ?, ?)",
+                (key, model_name, generated_text, time.time()),
+            )
+            conn.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        return await run_in_threadpool(self._get_sync, key)
+
+    async def put(self, key: str, model_name: str, generated_text: str) -> None:
+        await run_in_threadpool(self._put_sync, key, model_name, generated_text)
+
+
+ai_replay_store = AIReplayStore(settings.AI_REPLAY_DB_PATH)
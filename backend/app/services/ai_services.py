@@ -1,6 +1,8 @@
+import datetime
 import json
 import logging
-from typing import Dict, Any, Optional
+import time
+from typing import Awaitable, Callable, Dict, Any, Optional, Tuple
 from fastapi import HTTPException
 from starlette.concurrency import run_in_threadpool
 
@@ -8,76 +10,255 @@ from google import genai
 from google.genai import types as genai_types
 
 from app.core.config import settings
+from app.core.tracing import current_span, traced
 from app.schemas.mystery_schemas import CharacterDossierItem
 from app.services.ai_constants import *
+from app.services.ai_ledger import ai_call_ledger
+from app.services.ai_context_cache import get_context_cache_name, invalidate_context_cache
+from app.services.ai_replay_store import ai_replay_store, make_replay_key
+from app.services.json_stream import JsonStringFieldExtractor
 
 
 master_gemini_client: Optional[genai.Client] = None
 logger = logging.getLogger(__name__)
 
 
-if settings.GEMINI_API_KEY:
+if settings.GEMINI_BASE_URL:
+    try:
+        master_gemini_client = genai.Client(
+            api_key=settings.GEMINI_API_KEY or "local-fake-key",
+            http_options=genai_types.HttpOptions(base_url=settings.GEMINI_BASE_URL)
+        )
+        logger.info(
+            "Master Gemini Client initialized against custom endpoint %s.", settings.GEMINI_BASE_URL)
+    except Exception as e:
+        logger.error(
+            "Failed to initialize Master Gemini Client for %s: %s - %s", settings.GEMINI_BASE_URL, type(e).__name__, e)
+        master_gemini_client = None
+elif settings.GEMINI_API_KEY:
     try:
         master_gemini_client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        print("INFO: Master Gemini Client initialized successfully with API key.")
+        logger.info("Master Gemini Client initialized successfully with API key.")
     except Exception as e:
-        print(
-            f"ERROR: Failed to initialize Master Gemini Client: {type(e).__name__} - {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(
+            "Failed to initialize Master Gemini Client: %s - %s", type(e).__name__, e)
         master_gemini_client = None
 else:
-    print("WARNING: GEMINI_API_KEY not found. Gemini services will fail.")
+    logger.warning("GEMINI_API_KEY not found. Gemini services will fail.")
 
 
+def _parse_generated_text(generated_text: str, is_json_output_expected: bool) -> Dict[str, Any]:
+    if is_json_output_expected:
+        clean_text = generated_text.strip()
+        if clean_text.lower().startswith("```json"):
+            json_str = clean_text[7:-3].strip()
+        elif clean_text.startswith("{") and clean_text.endswith("}"):
+            json_str = clean_text
+        else:
+            logger.error(
+                "Expected JSON from Gemini, but got: %s...", generated_text[:300])
+            raise ValueError(
+                "Gemini did not return a response starting with ```json or {")
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError as e:
+            logger.error(
+                "Failed to parse JSON from Gemini response: %s. Raw text was: %s", e, generated_text)
+            raise ValueError(
+                f"Failed to parse JSON from Gemini: {e}. Raw text: {generated_text}")
+    else:
+        return {"raw_text": generated_text}
+
+
+def _record_response_usage(response, call_record: Dict[str, Any]) -> None:
+    """Copies token usage onto the ledger record and, when sampled, the current span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        call_record["prompt_tokens"] = getattr(usage, "prompt_token_count", None)
+        call_record["output_tokens"] = getattr(usage, "candidates_token_count", None)
+        call_record["cached_tokens"] = getattr(usage, "cached_content_token_count", None)
+    span = current_span()
+    if not span.recording:
+        return
+    if usage is not None:
+        span.set_attributes({
+            "gen_ai.usage.input_tokens": call_record["prompt_tokens"],
+            "gen_ai.usage.output_tokens": call_record["output_tokens"],
+            "gen_ai.usage.cached_tokens": call_record["cached_tokens"],
+        })
+    candidates = getattr(response, "candidates", None)
+    if candidates and getattr(candidates[0], "finish_reason", None) is not None:
+        finish_reason = candidates[0].finish_reason
+        span.set_attribute("gen_ai.response.finish_reason", getattr(finish_reason, "name", str(finish_reason)))
+    feedback = getattr(response, "prompt_feedback", None)
+    if feedback is not None and feedback.block_reason:
+        span.set_attribute("gen_ai.response.block_reason",
+                           getattr(feedback.block_reason, "name", str(feedback.block_reason)))
+
+
+async def _stream_generate_content(
+    call_kwargs: Dict[str, Any], on_text_chunk: Callable[[str], Awaitable[None]]
+) -> Tuple[Any, str]:
+    """
+    Streams through the async client, passing each text chunk on. Returns the
+    last chunk (which carries usage metadata and any block reason) and the full text.
+    """
+    text_parts = []
+    last_chunk = None
+    async for chunk in await master_gemini_client.aio.models.generate_content_stream(**call_kwargs):
+        last_chunk = chunk
+        if chunk.prompt_feedback and chunk.prompt_feedback.block_reason:
+            break
+        chunk_text = chunk.text
+        if chunk_text:
+            text_parts.append(chunk_text)
+            await on_text_chunk(chunk_text)
+    return last_chunk, "".join(text_parts)
+
+
+@traced("gemini.generate_content")
 async def _call_gemini_model_with_config(
     prompt_text: str,
     system_instruction_text: Optional[str] = None,
     temperature: float = 0.7,
     max_output_tokens: int = 2048,
-    is_json_output_expected: bool = False
+    is_json_output_expected: bool = False,
+    prompt_prefix_text: Optional[str] = None,
+    cached_content_name: Optional[str] = None,
+    task_type: str = "unspecified",
+    daily_mystery_id: Optional[int] = None,
+    round_number: Optional[int] = None,
+    is_retry: bool = False,
+    on_text_chunk: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    When `cached_content_name` is given, `prompt_prefix_text` and the system
+    instruction are already held in that provider-side cache and only
+    `prompt_text` is sent. Otherwise the prefix is sent inline ahead of it.
+
+    With `on_text_chunk` the response is streamed and each raw text chunk is
+    passed to it as it arrives (a replayed response arrives as one chunk); the
+    parsed result is returned either way.
+
+    `task_type`, `daily_mystery_id`, `round_number` and `is_retry` only describe
+    the call for the AI call ledger; every call, failed or not, is recorded there.
+    """
+    call_record: Dict[str, Any] = {
+        "task_type": task_type,
+        "daily_mystery_id": daily_mystery_id,
+        "round_number": round_number,
+        "model": DEFAULT_GEMINI_MODEL_NAME_STRING,
+        "prompt_tokens": None,
+        "output_tokens": None,
+        "cached_tokens": None,
+        "outcome": "error",
+        "is_retry": is_retry,
+        "is_hedge": False,
+        "used_context_cache": bool(cached_content_name),
+    }
+    started = time.perf_counter()
+    try:
+        return await _generate_with_gemini(
+            call_record, prompt_text, system_instruction_text, temperature, max_output_tokens,
+            is_json_output_expected, prompt_prefix_text, cached_content_name, on_text_chunk)
+    finally:
+        call_record["latency_ms"] = int((time.perf_counter() - started) * 1000)
+        ai_call_ledger.record(call_record)
+
+
+async def _generate_with_gemini(
+    call_record: Dict[str, Any],
+    prompt_text: str,
+    system_instruction_text: Optional[str],
+    temperature: float,
+    max_output_tokens: int,
+    is_json_output_expected: bool,
+    prompt_prefix_text: Optional[str],
+    cached_content_name: Optional[str],
+    on_text_chunk: Optional[Callable[[str], Awaitable[None]]]
 ) -> Dict[str, Any]:
+    """Body of _call_gemini_model_with_config; sets call_record's outcome and token counts."""
+    full_prompt_text = f"{prompt_prefix_text}\n{prompt_text}" if prompt_prefix_text else prompt_text
+    trace_span = current_span()
+    trace_span.set_attributes({
+        "gen_ai.system": "gemini",
+        "gen_ai.request.model": DEFAULT_GEMINI_MODEL_NAME_STRING,
+        "gen_ai.request.max_tokens": max_output_tokens,
+        "ai.context_cache": bool(cached_content_name),
+        "ai.stream": on_text_chunk is not None,
+    })
+
+    generation_params = {
+        "temperature": 0.8,
+        "max_output_tokens": max_output_tokens,
+        "top_p": 0.85,
+        "top_k": 40,
+        "safety_threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    }
+
+    replay_key = None
+    if settings.AI_REPLAY_MODE != "passthrough":
+        replay_key = make_replay_key(
+            DEFAULT_GEMINI_MODEL_NAME_STRING, system_instruction_text, full_prompt_text, generation_params)
+        recorded_text = await ai_replay_store.get(replay_key)
+        trace_span.set_attribute("ai.replay_hit", recorded_text is not None)
+        if recorded_text is not None:
+            logger.debug("Serving recorded Gemini response %s.", replay_key[:12])
+            call_record["outcome"] = "replay"
+            if on_text_chunk is not None:
+                await on_text_chunk(recorded_text)
+            return _parse_generated_text(recorded_text, is_json_output_expected)
+        if settings.AI_REPLAY_MODE == "replay":
+            logger.error("No recorded Gemini response for key %s in replay-only mode.", replay_key[:12])
+            raise ConnectionError(
+                "No recorded Gemini response for this prompt (AI_REPLAY_MODE=replay).")
 
     if not master_gemini_client:
-        print("ERROR: Master Gemini Client not initialized.")
+        logger.error("Master Gemini Client not initialized.")
         raise ConnectionError("Master Gemini Client not initialized.")
 
-    print(
-        f"DEBUG: Calling client.models.generate_content for model '{DEFAULT_GEMINI_MODEL_NAME_STRING}'. Temp: {temperature}")
+    logger.debug(
+        "Calling client.models.generate_content for model '%s'. Temp: %s", DEFAULT_GEMINI_MODEL_NAME_STRING, temperature)
 
     try:
         current_contents = [genai_types.Content(
-            parts=[genai_types.Part(text=prompt_text)], role="user"
+            parts=[genai_types.Part(
+                text=prompt_text if cached_content_name else full_prompt_text)],
+            role="user"
         )]
 
+        safety_threshold = getattr(
+            genai_types.HarmBlockThreshold, generation_params["safety_threshold"])
         safety_settings_list = [
             genai_types.SafetySetting(
                 category=genai_types.HarmCategory.HARM_CATEGORY_HARASSMENT,
-                threshold=genai_types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE
+                threshold=safety_threshold
             ),
             genai_types.SafetySetting(
                 category=genai_types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-                threshold=genai_types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE
+                threshold=safety_threshold
             ),
             genai_types.SafetySetting(
                 category=genai_types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                threshold=genai_types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE
+                threshold=safety_threshold
             ),
             genai_types.SafetySetting(
                 category=genai_types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-                threshold=genai_types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE
+                threshold=safety_threshold
             ),
         ]
 
         config_constructor_args = {
-            "temperature": 0.8,
-            "max_output_tokens": max_output_tokens,
+            "temperature": generation_params["temperature"],
+            "max_output_tokens": generation_params["max_output_tokens"],
             "safety_settings": safety_settings_list,
-            "top_p": 0.85,
-            "top_k": 40
+            "top_p": generation_params["top_p"],
+            "top_k": generation_params["top_k"]
         }
 
-        if system_instruction_text:
+        if cached_content_name:
+            config_constructor_args["cached_content"] = cached_content_name
+        elif system_instruction_text:
             config_constructor_args["system_instruction"] = system_instruction_text
 
         generation_config_obj = genai_types.GenerateContentConfig(
@@ -89,68 +270,64 @@ async def _call_gemini_model_with_config(
             "config": generation_config_obj,
         }
 
-        response = await run_in_threadpool(
-            master_gemini_client.models.generate_content,
-            **call_kwargs
-        )
+        streamed_text = None
+        if on_text_chunk is None:
+            response = await run_in_threadpool(
+                master_gemini_client.models.generate_content,
+                **call_kwargs
+            )
+        else:
+            response, streamed_text = await _stream_generate_content(call_kwargs, on_text_chunk)
+        _record_response_usage(response, call_record)
 
         if hasattr(response, 'prompt_feedback') and response.prompt_feedback and response.prompt_feedback.block_reason:
             block_reason_val = response.prompt_feedback.block_reason
             block_reason_str = block_reason_val.name if hasattr(
                 block_reason_val, 'name') else str(block_reason_val)
-            print(
-                f"ERROR: Gemini API call blocked. Reason: {block_reason_str}.")
+            logger.error(
+                "Gemini API call blocked. Reason: %s.", block_reason_str)
+            call_record["outcome"] = "blocked"
             raise ValueError(
                 f"Gemini content generation blocked: {block_reason_str}")
 
         generated_text = ""
-        if hasattr(response, 'text') and response.text:
+        if streamed_text is not None:
+            generated_text = streamed_text
+        elif hasattr(response, 'text') and response.text:
             generated_text = response.text
         elif response.candidates and response.candidates[0].content and response.candidates[0].content.parts:
             for part in response.candidates[0].content.parts:
                 if hasattr(part, 'text'):
                     generated_text += part.text
 
+        call_record["outcome"] = "invalid_response"
         if not generated_text:
-            print(
-                f"ERROR: Gemini response did not contain usable text. Response: {response}")
+            logger.error(
+                "Gemini response did not contain usable text. Response: %s", response)
             raise ValueError("Gemini response was empty or malformed.")
 
-        if is_json_output_expected:
-            clean_text = generated_text.strip()
-            if clean_text.lower().startswith("```json"):
-                json_str = clean_text[7:-3].strip()
-            elif clean_text.startswith("{") and clean_text.endswith("}"):
-                json_str = clean_text
-            else:
-                print(
-                    f"ERROR: Expected JSON from Gemini, but got: {generated_text[:300]}...")
-                raise ValueError(
-                    "Gemini did not return a response starting with ```json or {")
+        parsed = _parse_generated_text(generated_text, is_json_output_expected)
+        call_record["outcome"] = "ok"
+        # Only record responses that parsed, so replays never serve a known-bad payload.
+        if replay_key is not None:
             try:
-                return json.loads(json_str)
-            except json.JSONDecodeError as e:
-                print(
-                    f"ERROR: Failed to parse JSON from Gemini response: {e}. Raw text was: {generated_text}")
-                raise ValueError(
-                    f"Failed to parse JSON from Gemini: {e}. Raw text: {generated_text}")
-        else:
-            return {"raw_text": generated_text}
+                await ai_replay_store.put(replay_key, DEFAULT_GEMINI_MODEL_NAME_STRING, generated_text)
+            except Exception as e:
+                logger.warning("Failed to record Gemini response %s: %s", replay_key[:12], e)
+        return parsed
 
     except ValueError as ve:
-        print(f"ValueError during Gemini call: {ve}")
+        logger.warning("ValueError during Gemini call: %s", ve)
         raise
     except Exception as e:
-        print(
-            f"ERROR: An unexpected error occurred calling Gemini SDK: {type(e).__name__} - {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(
+            "An unexpected error occurred calling Gemini SDK: %s - %s", type(e).__name__, e)
         raise ConnectionError(f"Failed to communicate with Gemini API: {e}")
 
 
 async def generate_daily_mystery_content(theme: str, image_style_modifier: str) -> Dict[str, Any]:
-    print(
-        f"AI Service: Generating daily mystery content using google-genai SDK for theme '{theme}', style '{image_style_modifier}'")
+    logger.info(
+        "Generating daily mystery content for theme '%s', style '%s'", theme, image_style_modifier)
 
     current_prompt = DAILY_MYSTERY_PROMPT_TEMPLATE.format(
         theme=theme,
@@ -162,15 +339,16 @@ async def generate_daily_mystery_content(theme: str, image_style_modifier: str)
             system_instruction_text=SYSTEM_INSTRUCTION_JSON_OUTPUT,
             temperature=0.8,
             max_output_tokens=4096,
-            is_json_output_expected=True
+            is_json_output_expected=True,
+            task_type="daily_content"
         )
 
         expected_keys = ["base_story_text", "actual_solution_text", "initial_choices_pool",
                          "character_dossiers", "critical_path_clues", "base_image_prompts"]
         for key in expected_keys:
             if key not in response_json:
-                print(
-                    f"ERROR: Gemini response for daily content missing key '{key}'. Full JSON: {json.dumps(response_json, indent=2)}")
+                logger.error(
+                    "Gemini response for daily content missing key '%s'. Full JSON: %s", key, response_json)
                 raise ValueError(
                     f"Gemini response missing expected key: {key} in daily content.")
 
@@ -182,13 +360,13 @@ async def generate_daily_mystery_content(theme: str, image_style_modifier: str)
                     parsed_dossiers.append(
                         validated_dossier.model_dump())
                 except Exception as e:
-                    print(
-                        f"Warning: Could not parse/validate a character dossier: {dossier_data}. Error: {e}")
+                    logger.warning(
+                        "Could not parse/validate a character dossier: %s. Error: %s", dossier_data, e)
 
         response_json["character_dossiers"] = parsed_dossiers
         return response_json
     except Exception as e:
-        print(f"ERROR in generate_daily_mystery_content: {e}")
+        logger.error("Error in generate_daily_mystery_content: %s", e)
         raise HTTPException(
             status_code=503, detail=f"AI service currently unavailable for daily content: {type(e).__name__}")
 
@@ -196,8 +374,8 @@ async def generate_daily_mystery_content(theme: str, image_style_modifier: str)
 async def generate_theme_and_art_style_for_mystery_type(
     mystery_type: str
 ) -> Dict[str, str]:
-    print(
-        f"AI Service: Generating theme and art style for Mystery Type: '{mystery_type}'")
+    logger.info(
+        "Generating theme and art style for Mystery Type: '%s'", mystery_type)
 
     art_style_list_string = "\n".join(
         [f"- {name}" for name in AVAILABLE_ART_STYLE_NAMES])
@@ -213,14 +391,15 @@ async def generate_theme_and_art_style_for_mystery_type(
             system_instruction_text=SYSTEM_INSTRUCTION_JSON_OUTPUT,
             temperature=0.8,
             max_output_tokens=256,
-            is_json_output_expected=True
+            is_json_output_expected=True,
+            task_type="theme_and_style"
         )
 
         if not isinstance(response_json, dict) or \
            "theme_title" not in response_json or \
            "selected_art_style" not in response_json:
-            print(
-                f"ERROR: AI response for theme/style missing keys. Got: {response_json}")
+            logger.error(
+                "AI response for theme/style missing keys. Got: %s", response_json)
             raise ValueError(
                 "AI response missing 'theme_title' or 'selected_art_style'.")
 
@@ -228,13 +407,13 @@ async def generate_theme_and_art_style_for_mystery_type(
         selected_art_style = response_json["selected_art_style"]
 
         if not isinstance(theme_title, str) or not theme_title.strip():
-            print(
-                f"ERROR: AI returned an invalid or empty theme_title. Got: {theme_title}")
+            logger.error(
+                "AI returned an invalid or empty theme_title. Got: %s", theme_title)
             raise ValueError("AI returned an invalid theme_title.")
 
         if selected_art_style not in AVAILABLE_ART_STYLE_NAMES:
-            print(
-                f"ERROR: AI selected an art style ('{selected_art_style}') not in the allowed list. Defaulting.")
+            logger.error(
+                "AI selected an art style ('%s') not in the allowed list.", selected_art_style)
             raise ValueError(
                 f"AI selected an invalid art style: '{selected_art_style}'. It must be from the provided list.")
 
@@ -244,16 +423,14 @@ async def generate_theme_and_art_style_for_mystery_type(
         }
 
     except ValueError as ve:
-        print(f"ValueError during theme/style generation: {ve}")
+        logger.warning("ValueError during theme/style generation: %s", ve)
         raise
     except ConnectionError as ce:
-        print(f"ConnectionError during theme/style generation: {ce}")
+        logger.warning("ConnectionError during theme/style generation: %s", ce)
         raise
     except Exception as e:
-        print(
-            f"ERROR in generate_theme_and_art_style (Unexpected): {type(e).__name__} - {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(
+            "Unexpected error in generate_theme_and_art_style: %s - %s", type(e).__name__, e)
         raise ConnectionError(
             f"Unexpected error during AI theme/style generation: {type(e).__name__}")
 
@@ -265,20 +442,33 @@ async def generate_next_scenario_content(
     current_scenario_text: Optional[str],
     image_style_modifier: str,
     current_round: int,
-    history_summary: Optional[str] = None
+    history_summary: Optional[str] = None,
+    daily_mystery_id: Optional[int] = None,
+    mystery_date: Optional[datetime.date] = None,
+    ledger_task_type: Optional[str] = None,
+    on_scenario_text: Optional[Callable[[str], Awaitable[None]]] = None
 ) -> Dict[str, Any]:
+    """
+    `ledger_task_type` overrides the next_scenario/final_scenario task type recorded in the AI call ledger.
+    With `on_scenario_text` the response is streamed and each newly generated
+    piece of its scenario_text is passed to it before the full result is returned.
+    """
     logger.debug(
-        f"AI Service: Generating next scenario. Round: {current_round}. Choice: '{user_choice}'. History provided: {bool(history_summary)}"
-    )
+        "Generating next scenario. Round: %s. Choice: '%s'. History provided: %s",
+        current_round, user_choice, bool(history_summary))
 
-    prompt_context_parts = [
+    # Stable per-mystery prefix: identical for every turn, so it can live in a context cache.
+    prompt_prefix_text = "\n".join([
         f"Mystery Base: \"{base_story_summary}\"",
         f"Actual Hidden Solution: \"{actual_solution}\" (This is the true answer. DO NOT REVEAL IT to the player. Use it to guide the story, clues, and red herrings based on the player's choices. Ensure the narrative is consistent with this solution.)",
-    ]
+    ])
+
+    prompt_context_parts = []
     if history_summary:
         prompt_context_parts.append(
             f"\nPlayer's Journey So Far:\n{history_summary}")
 
+    task_type = ledger_task_type or ("final_scenario" if current_round >= settings.MAX_ROUNDS else "next_scenario")
     if current_round >= settings.MAX_ROUNDS:
         prompt_context_parts.append(
             f"\nPlayer has completed {settings.MAX_ROUNDS} rounds. The game concludes now.")
@@ -303,17 +493,70 @@ async def generate_next_scenario_content(
             MAX_ROUNDS=settings.MAX_ROUNDS
         )
 
-    full_prompt_text = "\n".join(
+    prompt_suffix_text = "\n".join(
         prompt_context_parts) + "\n\n" + task_instruction
 
-    try:
-        response_json = await _call_gemini_model_with_config(
-            prompt_text=full_prompt_text,
+    cached_content_name = None
+    if daily_mystery_id is not None and settings.AI_REPLAY_MODE != "replay":
+        cached_content_name = await get_context_cache_name(
+            master_gemini_client,
+            daily_mystery_id=daily_mystery_id,
+            for_date=mystery_date or datetime.date.today(),
+            prefix_text=prompt_prefix_text,
             system_instruction_text=SYSTEM_INSTRUCTION_JSON_OUTPUT,
-            temperature=0.8,
-            max_output_tokens=2048,
-            is_json_output_expected=True
         )
+
+    def scenario_text_stream() -> Tuple[JsonStringFieldExtractor, Optional[Callable[[str], Awaitable[None]]]]:
+        """A fresh extractor and chunk callback per call: a retry's output starts a new JSON document."""
+        extractor = JsonStringFieldExtractor("scenario_text")
+        if on_scenario_text is None:
+            return extractor, None
+
+        async def on_text_chunk(chunk: str) -> None:
+            scenario_text = extractor.feed(chunk)
+            if scenario_text:
+                await on_scenario_text(scenario_text)
+        return extractor, on_text_chunk
+
+    scenario_text_extractor, on_text_chunk = scenario_text_stream()
+
+    try:
+        try:
+            response_json = await _call_gemini_model_with_config(
+                prompt_text=prompt_suffix_text,
+                system_instruction_text=SYSTEM_INSTRUCTION_JSON_OUTPUT,
+                temperature=0.8,
+                max_output_tokens=2048,
+                is_json_output_expected=True,
+                prompt_prefix_text=prompt_prefix_text,
+                cached_content_name=cached_content_name,
+                task_type=task_type,
+                daily_mystery_id=daily_mystery_id,
+                round_number=current_round,
+                on_text_chunk=on_text_chunk
+            )
+        except ConnectionError:
+            # A retry would stream the scenario from the start again, so only retry before any was sent.
+            if not cached_content_name or scenario_text_extractor.emitted:
+                raise
+            # The cache may have expired or been evicted provider-side; retry inline once.
+            logger.warning(
+                "Next-scenario call with context cache failed for mystery %s; retrying inline.", daily_mystery_id)
+            await invalidate_context_cache(master_gemini_client, daily_mystery_id)
+            scenario_text_extractor, on_text_chunk = scenario_text_stream()
+            response_json = await _call_gemini_model_with_config(
+                prompt_text=prompt_suffix_text,
+                system_instruction_text=SYSTEM_INSTRUCTION_JSON_OUTPUT,
+                temperature=0.8,
+                max_output_tokens=2048,
+                is_json_output_expected=True,
+                prompt_prefix_text=prompt_prefix_text,
+                task_type=task_type,
+                daily_mystery_id=daily_mystery_id,
+                round_number=current_round,
+                is_retry=True,
+                on_text_chunk=on_text_chunk
+            )
         if not isinstance(response_json.get("is_final_round"), bool):
             raise ValueError(
                 "AI response for 'is_final_round' was not a boolean.")
@@ -324,7 +567,8 @@ async def generate_next_scenario_content(
             raise ValueError("AI response for 'choices' was not a list.")
         if response_json.get("is_final_round") is False and len(response_json.get("choices", [])) != 3:
             logger.warning(
-                f"AI returned {len(response_json.get('choices', []))} choices instead of 3 for a non-final round. Trying to adapt or will raise error.")
+                "AI returned %s choices instead of 3 for a non-final round. Trying to adapt or will raise error.",
+                len(response_json.get("choices", [])))
             if len(response_json.get("choices", [])) != 3:
                 raise ValueError(
                     "AI did not return exactly 3 choices for a non-final round.")
@@ -332,7 +576,7 @@ async def generate_next_scenario_content(
         return response_json
     except Exception as e:
         logger.error(
-            f"ERROR in generate_next_scenario_content: {e}", exc_info=True)
+            "Error in generate_next_scenario_content: %s", e, exc_info=True)
         if isinstance(e, HTTPException):
             raise
         raise HTTPException(
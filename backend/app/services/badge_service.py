@@ -0,0 +1,352 @@
+import datetime
+import hashlib
+import json
+import time
+import operator
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+import logging
+
+from app.core.config import settings
+from app.models.badge_models import Badge, UserBadge
+from app.models.mystery_models import DailyMystery, UserMysterySession
+from app.models.user_models import UserStats
+
+logger = logging.getLogger(__name__)
+
+
+STAT_METRICS = frozenset({
+    "sessions_completed",
+    "solved_count",
+    "current_streak",
+    "longest_streak",
+    "fastest_solve_seconds",
+})
+
+_COMPARISON_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class BadgeCriteriaError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class CompiledBadgeRule:
+    badge_id: int
+    fingerprint: str
+    metrics: FrozenSet[str]
+    predicate: Callable[[UserStats], bool]
+
+
+def _compile_node(node: Any) -> Tuple[Callable[[UserStats], bool], FrozenSet[str]]:
+    """
+    Compiles one criteria node. Supported shapes:
+      {"metric": "solved_count", "op": ">=", "value": 10}
+      {"all": [<node>, ...]}, {"any": [<node>, ...]}, {"not": <node>}
+    """
+    if not isinstance(node, dict):
+        raise BadgeCriteriaError(f"Criteria node must be an object, got: {node!r}")
+
+    if "all" in node or "any" in node:
+        combinator = "all" if "all" in node else "any"
+        children = node[combinator]
+        if not isinstance(children, list) or not children:
+            raise BadgeCriteriaError(
+                f"'{combinator}' must be a non-empty list of criteria.")
+        compiled = [_compile_node(child) for child in children]
+        predicates = tuple(p for p, _ in compiled)
+        metrics = frozenset().union(*(m for _, m in compiled))
+        if combinator == "all":
+            return (lambda stats: all(p(stats) for p in predicates)), metrics
+        return (lambda stats: any(p(stats) for p in predicates)), metrics
+
+    if "not" in node:
+        inner, metrics = _compile_node(node["not"])
+        return (lambda stats: not inner(stats)), metrics
+
+    metric = node.get("metric")
+    if metric not in STAT_METRICS:
+        raise BadgeCriteriaError(
+            f"Unknown badge metric '{metric}'. Expected one of: {sorted(STAT_METRICS)}")
+    op_symbol = node.get("op", ">=")
+    compare = _COMPARISON_OPERATORS.get(op_symbol)
+    if compare is None:
+        raise BadgeCriteriaError(f"Unknown comparison operator '{op_symbol}'.")
+    if "value" not in node:
+        raise BadgeCriteriaError(f"Criteria on '{metric}' is missing 'value'.")
+    target = node["value"]
+
+    def predicate(stats: UserStats) -> bool:
+        current = getattr(stats, metric)
+        # Metrics such as fastest_solve_seconds stay NULL until the first solve.
+        return current is not None and compare(current, target)
+
+    return predicate, frozenset({metric})
+
+
+def _criteria_fingerprint(criteria: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(criteria, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def compile_badge_rule(badge_id: int, criteria: Dict[str, Any]) -> CompiledBadgeRule:
+    predicate, metrics = _compile_node(criteria)
+    return CompiledBadgeRule(
+        badge_id=badge_id,
+        fingerprint=_criteria_fingerprint(criteria),
+        metrics=metrics,
+        predicate=predicate,
+    )
+
+
+_compiled_rules: Dict[int, CompiledBadgeRule] = {}
+_rules_loaded_at: Optional[float] = None
+
+
+async def get_badge_rules(db: AsyncSession, force_reload: bool = False) -> List[CompiledBadgeRule]:
+    """
+    Returns compiled rules for every badge with criteria.
+    Badges change rarely, so the compiled set is kept per process and only
+    recompiled when a badge's criteria fingerprint changes.
+    """
+    global _rules_loaded_at
+    now = time.monotonic()
+    if (not force_reload and _rules_loaded_at is not None
+            and now - _rules_loaded_at < settings.BADGE_RULES_CACHE_TTL_SECONDS):
+        return list(_compiled_rules.values())
+
+    result = await db.execute(
+        select(Badge.id, Badge.name, Badge.criteria).where(Badge.criteria.is_not(None)))
+
+    fresh_rules: Dict[int, CompiledBadgeRule] = {}
+    for badge_id, badge_name, criteria in result.all():
+        cached = _compiled_rules.get(badge_id)
+        if cached and cached.fingerprint == _criteria_fingerprint(criteria):
+            fresh_rules[badge_id] = cached
+            continue
+        try:
+            fresh_rules[badge_id] = compile_badge_rule(badge_id, criteria)
+        except BadgeCriteriaError as e:
+            logger.error(f"Skipping badge '{badge_name}' (ID {badge_id}): invalid criteria: {e}")
+
+    _compiled_rules.clear()
+    _compiled_rules.update(fresh_rules)
+    _rules_loaded_at = now
+    return list(fresh_rules.values())
+
+
+def _new_user_stats(user_id: int) -> UserStats:
+    return UserStats(
+        user_id=user_id,
+        sessions_completed=0,
+        solved_count=0,
+        current_streak=0,
+        longest_streak=0,
+        fastest_solve_seconds=None,
+        last_solved_date=None,
+    )
+
+
+def fold_session_into_stats(
+    stats: UserStats,
+    is_solved: bool,
+    mystery_date: datetime.date,
+    start_time: Optional[datetime.datetime],
+    end_time: Optional[datetime.datetime],
+) -> Set[str]:
+    """
+    Applies one completed session to the running statistics.
+    Returns the names of the metrics whose value changed.
+    Streaks only move forward: solving a mystery dated on or before
+    last_solved_date (e.g. from the archive) counts as a solve but leaves
+    current_streak and last_solved_date alone.
+    """
+    changed: Set[str] = {"sessions_completed"}
+    stats.sessions_completed += 1
+
+    if not is_solved:
+        return changed
+
+    stats.solved_count += 1
+    changed.add("solved_count")
+
+    if stats.last_solved_date is None or mystery_date > stats.last_solved_date:
+        if stats.last_solved_date is not None and stats.last_solved_date == mystery_date - datetime.timedelta(days=1):
+            stats.current_streak += 1
+        else:
+            stats.current_streak = 1
+        stats.last_solved_date = mystery_date
+        changed.add("current_streak")
+        if stats.current_streak > stats.longest_streak:
+            stats.longest_streak = stats.current_streak
+            changed.add("longest_streak")
+
+    if start_time and end_time:
+        duration = int((end_time - start_time).total_seconds())
+        if stats.fastest_solve_seconds is None or duration < stats.fastest_solve_seconds:
+            stats.fastest_solve_seconds = duration
+            changed.add("fastest_solve_seconds")
+
+    return changed
+
+
+async def _award_badges(
+    db: AsyncSession,
+    rules: Iterable[CompiledBadgeRule],
+    stats_by_user: Dict[int, UserStats],
+    changed_by_user: Dict[int, Set[str]],
+) -> List[Tuple[int, int]]:
+    """
+    Evaluates only the rules touched by each user's changed metrics and inserts
+    every newly earned UserBadge in a single statement.
+    """
+    rules = list(rules)
+    candidate_pairs: Set[Tuple[int, int]] = set()
+    for user_id, changed in changed_by_user.items():
+        stats = stats_by_user[user_id]
+        for rule in rules:
+            if rule.metrics & changed and rule.predicate(stats):
+                candidate_pairs.add((user_id, rule.badge_id))
+
+    if not candidate_pairs:
+        return []
+
+    existing = await db.execute(
+        select(UserBadge.user_id, UserBadge.badge_id).where(
+            UserBadge.user_id.in_({user_id for user_id, _ in candidate_pairs}),
+            UserBadge.badge_id.in_({badge_id for _, badge_id in candidate_pairs}),
+        )
+    )
+    new_pairs = sorted(candidate_pairs - {tuple(row) for row in existing.all()})
+    if not new_pairs:
+        return []
+
+    stmt = pg_insert(UserBadge).values(
+        [{"user_id": user_id, "badge_id": badge_id} for user_id, badge_id in new_pairs]
+    ).on_conflict_do_nothing(index_elements=["user_id", "badge_id"])
+    await db.execute(stmt)
+    return new_pairs
+
+
+async def record_completed_session(db: AsyncSession, session: UserMysterySession) -> List[int]:
+    """
+    Updates the user's incremental statistics for a just-completed session and
+    awards any badges whose criteria depend on a metric that changed.
+    Returns the IDs of newly awarded badges.
+
+    Meant to be called, in the same transaction, wherever a session is marked
+    complete (end_time set). The API does not persist session completion yet,
+    so for now statistics are only built by scripts/backfill_badges.py.
+    """
+    if session.user_id is None:
+        return []
+
+    mystery_date = (await db.execute(
+        select(DailyMystery.date).where(DailyMystery.id == session.daily_mystery_id)
+    )).scalar_one()
+
+    stats = (await db.execute(
+        select(UserStats).where(UserStats.user_id == session.user_id).with_for_update()
+    )).scalars().first()
+    if stats is None:
+        stats = _new_user_stats(session.user_id)
+        db.add(stats)
+
+    changed = fold_session_into_stats(
+        stats,
+        is_solved=session.is_solved,
+        mystery_date=mystery_date,
+        start_time=session.start_time,
+        end_time=session.end_time,
+    )
+    await db.flush()
+
+    rules = await get_badge_rules(db)
+    awarded = await _award_badges(
+        db, rules, {session.user_id: stats}, {session.user_id: changed})
+
+    if awarded:
+        logger.info(
+            f"User {session.user_id} earned badges {[badge_id for _, badge_id in awarded]} from session {session.id}.")
+    return [badge_id for _, badge_id in awarded]
+
+
+async def backfill_user_stats_and_badges(
+    db: AsyncSession,
+    batch_size: Optional[int] = None,
+    after_user_id: int = 0,
+) -> int:
+    """
+    Rebuilds UserStats from historical sessions and awards any earned badges.
+    Users are processed in keyset-paginated batches (one commit per batch) so
+    memory use and transaction length stay bounded.
+    Returns the number of users processed.
+    """
+    batch_size = batch_size or settings.BADGE_BACKFILL_BATCH_SIZE
+    rules = await get_badge_rules(db, force_reload=True)
+    processed = 0
+
+    while True:
+        user_ids = (await db.execute(
+            select(UserMysterySession.user_id)
+            .where(UserMysterySession.user_id.is_not(None),
+                   UserMysterySession.user_id > after_user_id,
+                   UserMysterySession.end_time.is_not(None))
+            .group_by(UserMysterySession.user_id)
+            .order_by(UserMysterySession.user_id)
+            .limit(batch_size)
+        )).scalars().all()
+        if not user_ids:
+            break
+
+        sessions = await db.execute(
+            select(UserMysterySession.user_id, UserMysterySession.is_solved,
+                   UserMysterySession.start_time, UserMysterySession.end_time,
+                   DailyMystery.date)
+            .join(DailyMystery, DailyMystery.id == UserMysterySession.daily_mystery_id)
+            .where(UserMysterySession.user_id.in_(user_ids),
+                   UserMysterySession.end_time.is_not(None))
+            .order_by(UserMysterySession.user_id, DailyMystery.date, UserMysterySession.id)
+        )
+
+        existing_stats = {
+            stats.user_id: stats for stats in (await db.execute(
+                select(UserStats).where(UserStats.user_id.in_(user_ids))
+            )).scalars().all()
+        }
+        stats_by_user: Dict[int, UserStats] = {}
+        for user_id in user_ids:
+            stats = existing_stats.get(user_id)
+            if stats is None:
+                stats = _new_user_stats(user_id)
+                db.add(stats)
+            else:
+                reset = _new_user_stats(user_id)
+                for metric in (*STAT_METRICS, "last_solved_date"):
+                    setattr(stats, metric, getattr(reset, metric))
+            stats_by_user[user_id] = stats
+
+        for user_id, is_solved, start_time, end_time, mystery_date in sessions.tuples():
+            fold_session_into_stats(
+                stats_by_user[user_id], is_solved, mystery_date, start_time, end_time)
+
+        await db.flush()
+        awarded = await _award_badges(
+            db, rules, stats_by_user, {user_id: set(STAT_METRICS) for user_id in user_ids})
+        await db.commit()
+
+        processed += len(user_ids)
+        after_user_id = user_ids[-1]
+        logger.info(
+            f"Badge backfill: processed {processed} users so far (last user ID {after_user_id}), awarded {len(awarded)} badges in this batch.")
+
+    return processed
@@ -0,0 +1,76 @@
+"""
+Maps a player's free-text choice onto the choice they were actually offered.
+
+Choices arrive as free strings, so "Search the study." and "search the study"
+would otherwise be different cache keys and different AI calls. Choices are
+normalized (Unicode NFKC, casefold, punctuation dropped, whitespace collapsed)
+and compared against the offered choices with character-trigram Dice
+similarity blended with word overlap. A match at or above
+CHOICE_MATCH_THRESHOLD, and clearly ahead of the runner-up, resolves to the
+offered choice; anything else stays free text.
+
+Either way the result carries a `choice_id` derived from the normalized text,
+which is what the scenario cache and the scenario tree key on.
+"""
+import hashlib
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CanonicalChoice:
+    choice_id: str
+    text: str  # the offered choice when matched, otherwise the player's text
+    matched: bool
+    score: float
+
+
+def normalize_choice_text(choice_text: str) -> str:
+    text = unicodedata.normalize("NFKC", choice_text).casefold()
+    text = "".join(ch if ch.isalnum() or ch.isspace() else " " for ch in text)
+    return " ".join(text.split())
+
+
+def choice_id_for(choice_text: str) -> str:
+    return hashlib.sha1(normalize_choice_text(choice_text).encode("utf-8")).hexdigest()[:16]
+
+
+def _trigrams(normalized: str) -> FrozenSet[str]:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@lru_cache(maxsize=4096)
+def _features(choice_text: str) -> Tuple[str, FrozenSet[str], FrozenSet[str]]:
+    normalized = normalize_choice_text(choice_text)
+    return normalized, _trigrams(normalized), frozenset(normalized.split())
+
+
+def _similarity(a: Tuple[str, FrozenSet[str], FrozenSet[str]], b: Tuple[str, FrozenSet[str], FrozenSet[str]]) -> float:
+    if a[0] == b[0]:
+        return 1.0
+    if not a[1] or not b[1]:
+        return 0.0
+    trigram_dice = 2 * len(a[1] & b[1]) / (len(a[1]) + len(b[1]))
+    word_overlap = len(a[2] & b[2]) / max(1, min(len(a[2]), len(b[2])))
+    return 0.7 * trigram_dice + 0.3 * word_overlap
+
+
+def canonicalize_choice(choice_text: str, offered_choices: Optional[Sequence[str]]) -> CanonicalChoice:
+    incoming = _features(choice_text)
+    best_text, best_score, runner_up_score = None, 0.0, 0.0
+    for offered in offered_choices or ():
+        score = _similarity(incoming, _features(offered))
+        if score > best_score:
+            best_text, best_score, runner_up_score = offered, score, best_score
+        elif score > runner_up_score:
+            runner_up_score = score
+
+    if (best_text is not None and best_score >= settings.CHOICE_MATCH_THRESHOLD
+            and (best_score == 1.0 or best_score - runner_up_score >= settings.CHOICE_MATCH_MIN_MARGIN)):
+        return CanonicalChoice(choice_id_for(best_text), best_text, True, best_score)
+    return CanonicalChoice(choice_id_for(choice_text), choice_text, False, best_score)
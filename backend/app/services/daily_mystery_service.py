@@ -1,23 +1,132 @@
+import asyncio
 import datetime
 import random
-from typing import Optional
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 import logging
 
+from app.core.config import settings
 from app.models.mystery_models import DailyMystery
 from app.models.style_models import ImageStyle
 from app.services import ai_services
 from app.services.ai_constants import MYSTERY_TYPES
+from app.services.image_processing import generate_and_store_image
+from app.services.mystery_cache_service import get_image_style_cached
+from app.services.mystery_search_service import search_vector_expression
+from app.services.scenario_tree_service import build_scenario_tree_after_commit, start_scenario_tree_build
+from app.services.similarity_index import (index_saved_mysteries, index_saved_mystery_after_commit,
+                                           mystery_similarity_index)
 
 logger = logging.getLogger(__name__)
 
 
 async def get_image_style_by_name(db: AsyncSession, style_name: str) -> Optional[ImageStyle]:
-    stmt = select(ImageStyle).where(ImageStyle.name == style_name)
-    result = await db.execute(stmt)
-    return result.scalars().first()
+    return await get_image_style_cached(db, style_name)
+
+
+async def generate_theme_and_style(for_date: datetime.date) -> Dict[str, str]:
+    """
+    Stage 1: pick a mystery type and let the AI choose a theme and art style for it.
+    A theme too close to a recent one is regenerated with a fresh type, up to
+    SIMILARITY_MAX_THEME_ATTEMPTS times, before the expensive content call is made.
+    The accepted theme stays reserved for `for_date` until the mystery is indexed;
+    callers release it (mystery_similarity_index.release_theme) if generation fails.
+    """
+    check_similarity = settings.SIMILARITY_CHECK_ENABLED
+    if check_similarity:
+        await mystery_similarity_index.refresh()
+    attempts = settings.SIMILARITY_MAX_THEME_ATTEMPTS if check_similarity else 1
+
+    for attempt in range(1, attempts + 1):
+        selected_mystery_type = random.choice(MYSTERY_TYPES)
+        logger.debug("Selected base mystery type: '%s' for %s", selected_mystery_type, for_date)
+
+        generated_theme_info = await ai_services.generate_theme_and_art_style_for_mystery_type(
+            mystery_type=selected_mystery_type
+        )
+        logger.debug(
+            "AI generated theme: '%s', style: '%s' for %s",
+            generated_theme_info["theme_title"], generated_theme_info["selected_art_style"], for_date)
+
+        similar = mystery_similarity_index.find_similar_theme(
+            generated_theme_info["theme_title"]) if check_similarity else None
+        if similar is None:
+            break
+        logger.info(
+            "Theme '%s' for %s is too close to '%s' (similarity %.2f); attempt %s/%s.",
+            generated_theme_info["theme_title"], for_date, similar.theme, similar.similarity, attempt, attempts)
+    else:
+        logger.warning(
+            "Keeping near-duplicate theme '%s' for %s after %s attempts.",
+            generated_theme_info["theme_title"], for_date, attempts)
+
+    if check_similarity:
+        mystery_similarity_index.reserve_theme(for_date, generated_theme_info["theme_title"])
+    return generated_theme_info
+
+
+async def prepare_base_images(for_date: datetime.date, ai_story_content: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    base_image_urls and base_image_variants for build_daily_mystery_fields.
+    Images are only generated (with their variants) when GENERATE_BASE_IMAGES is set.
+    """
+    prompts = [(i, prompt) for i, prompt in enumerate(ai_story_content.get("base_image_prompts", [])) if prompt]
+    if not settings.GENERATE_BASE_IMAGES:
+        base_image_urls_list = []
+        for i, img_prompt_text in prompts:
+            safe_prompt_snip = "".join(
+                filter(str.isalnum, img_prompt_text[:20]))
+            base_image_urls_list.append(f"https://mockurl.com/base_image_{i}_{safe_prompt_snip}.png")
+        return {"base_image_urls": base_image_urls_list, "base_image_variants": None}
+
+    stored = await asyncio.gather(*(
+        generate_and_store_image(prompt, f"base_{for_date.isoformat()}_{i}") for i, prompt in prompts))
+    return {
+        "base_image_urls": [url for url, _ in stored],
+        "base_image_variants": [variants for _, variants in stored],
+    }
+
+
+def build_daily_mystery_fields(
+    for_date: datetime.date,
+    theme_title: str,
+    image_style_obj: ImageStyle,
+    ai_story_content: Dict[str, Any],
+    base_images: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    `base_images` comes from prepare_base_images. search_vector is a SQL expression evaluated on insert.
+    A story too close to a recent one is only logged: its content call has already been paid for.
+    """
+    if settings.SIMILARITY_CHECK_ENABLED:
+        similar = mystery_similarity_index.find_similar_story(
+            ai_story_content["base_story_text"], ai_story_content["actual_solution_text"])
+        if similar is not None:
+            logger.warning(
+                "Story generated for %s is close to mystery %s ('%s', similarity %.2f).",
+                for_date, similar.key, similar.theme, similar.similarity)
+    return {
+        "date": for_date,
+        "theme": theme_title,
+        "base_story_text": ai_story_content["base_story_text"],
+        "actual_solution_text": ai_story_content["actual_solution_text"],
+        "character_dossiers": ai_story_content.get("character_dossiers"),
+        "critical_path_clues": ai_story_content.get("critical_path_clues"),
+        "image_style_id": image_style_obj.id,
+        "base_image_urls": base_images["base_image_urls"],
+        "base_image_variants": base_images["base_image_variants"],
+        "initial_choices_pool": ai_story_content["initial_choices_pool"],
+        "search_vector": search_vector_expression(
+            theme_title,
+            ai_story_content["base_story_text"],
+            ai_story_content.get("character_dossiers"),
+            ai_story_content.get("critical_path_clues"),
+        ),
+    }
 
 
 async def generate_and_save_new_daily_mystery(db: AsyncSession, for_date: datetime.date) -> DailyMystery:
@@ -25,26 +134,28 @@ async def generate_and_save_new_daily_mystery(db: AsyncSession, for_date: dateti
     Core logic to generate AI content for a new daily mystery and save it to the database.
     This function assumes a mystery for 'for_date' does NOT already exist or is intended to be overwritten.
     (The calling function should handle checks for existing mysteries or force_overwrite logic).
+    The mystery joins the similarity index once `db` commits.
     """
-    logger.info(
-        f"Initiating AI generation for daily mystery for date: {for_date}")
+    logger.info("Initiating AI generation for daily mystery for date: %s", for_date)
 
-    selected_mystery_type = random.choice(MYSTERY_TYPES)
-    logger.debug(
-        f"Selected base mystery type: '{selected_mystery_type}' for {for_date}")
+    generated_theme_info = await generate_theme_and_style(for_date)
+    try:
+        return await _save_generated_mystery(db, for_date, generated_theme_info)
+    except (Exception, asyncio.CancelledError):
+        mystery_similarity_index.release_theme(for_date)
+        raise
 
-    generated_theme_info = await ai_services.generate_theme_and_art_style_for_mystery_type(
-        mystery_type=selected_mystery_type
-    )
+
+async def _save_generated_mystery(
+    db: AsyncSession, for_date: datetime.date, generated_theme_info: Dict[str, str]
+) -> DailyMystery:
     ai_theme_title = generated_theme_info["theme_title"]
     ai_selected_art_style_name = generated_theme_info["selected_art_style"]
-    logger.debug(
-        f"AI generated theme: '{ai_theme_title}', style: '{ai_selected_art_style_name}' for {for_date}")
 
     image_style_obj = await get_image_style_by_name(db, ai_selected_art_style_name)
     if not image_style_obj:
         logger.error(
-            f"ImageStyle '{ai_selected_art_style_name}' not found. Cannot generate mystery for {for_date}.")
+            "ImageStyle '%s' not found. Cannot generate mystery for %s.", ai_selected_art_style_name, for_date)
         raise ValueError(
             f"ImageStyle '{ai_selected_art_style_name}' not found. Ensure styles are seeded.")
 
@@ -54,34 +165,148 @@ async def generate_and_save_new_daily_mystery(db: AsyncSession, for_date: dateti
         theme=ai_theme_title,
         image_style_modifier=art_style_description_for_prompt
     )
-    logger.debug(f"AI story content generated for {for_date}")
+    logger.debug("AI story content generated for %s", for_date)
+    base_images = await prepare_base_images(for_date, ai_story_content)
 
-    base_image_urls_list = []
-    for i, img_prompt_text in enumerate(ai_story_content.get("base_image_prompts", [])):
-        if img_prompt_text:
-            safe_prompt_snip = "".join(
-                filter(str.isalnum, img_prompt_text[:20]))
-            url = f"https://mockurl.com/base_image_{i}_{safe_prompt_snip}.png"
-            base_image_urls_list.append(url)
-
-    new_mystery_data_for_model = {
-        "date": for_date,
-        "theme": ai_theme_title,
-        "base_story_text": ai_story_content["base_story_text"],
-        "actual_solution_text": ai_story_content["actual_solution_text"],
-        "character_dossiers": ai_story_content.get("character_dossiers"),
-        "critical_path_clues": ai_story_content.get("critical_path_clues"),
-        "image_style_id": image_style_obj.id,
-        "base_image_urls": base_image_urls_list,
-        "initial_choices_pool": ai_story_content["initial_choices_pool"]
-    }
+    new_mystery_data_for_model = build_daily_mystery_fields(
+        for_date, ai_theme_title, image_style_obj, ai_story_content, base_images)
 
     db_mystery = DailyMystery(**new_mystery_data_for_model)
     db.add(db_mystery)
     await db.flush()  # Get ID
+    index_saved_mystery_after_commit(db, db_mystery.id, new_mystery_data_for_model)
     await db.refresh(db_mystery)
     await db.refresh(db_mystery, attribute_names=['image_style'])
+    build_scenario_tree_after_commit(db, db_mystery.id)
 
-    logger.info(
-        f"Successfully generated and saved DailyMystery ID: {db_mystery.id} for date: {for_date}")
+    logger.info("Successfully generated and saved DailyMystery ID: %s for date: %s", db_mystery.id, for_date)
     return db_mystery
+
+
+async def _generate_fields_for_date(
+    for_date: datetime.date,
+    styles_by_name: Dict[str, ImageStyle],
+    semaphore: asyncio.Semaphore,
+) -> Tuple[datetime.date, Optional[Dict[str, Any]], Optional[Exception]]:
+    """Runs both AI stages for one date. Errors are returned, not raised, so they can be reported per date."""
+    try:
+        async with semaphore:
+            generated_theme_info = await generate_theme_and_style(for_date)
+            image_style_obj = styles_by_name.get(generated_theme_info["selected_art_style"])
+            if not image_style_obj:
+                raise ValueError(
+                    f"ImageStyle '{generated_theme_info['selected_art_style']}' not found. Ensure styles are seeded.")
+            ai_story_content = await ai_services.generate_daily_mystery_content(
+                theme=generated_theme_info["theme_title"],
+                image_style_modifier=image_style_obj.dalle_prompt_modifier
+            )
+            base_images = await prepare_base_images(for_date, ai_story_content)
+        return for_date, build_daily_mystery_fields(
+            for_date, generated_theme_info["theme_title"], image_style_obj, ai_story_content, base_images), None
+    except Exception as e:
+        mystery_similarity_index.release_theme(for_date)
+        return for_date, None, e
+    except asyncio.CancelledError:
+        mystery_similarity_index.release_theme(for_date)
+        raise
+
+
+async def _bulk_insert_mysteries(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[datetime.date]:
+    """Inserts generated mysteries in one statement; dates created concurrently elsewhere are skipped."""
+    if not rows:
+        return []
+    stmt = (
+        pg_insert(DailyMystery)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["date"])
+        .returning(DailyMystery.id, DailyMystery.date)
+    )
+    try:
+        inserted = (await db.execute(stmt)).all()
+        await db.commit()
+    except (Exception, asyncio.CancelledError):
+        for row in rows:
+            mystery_similarity_index.release_theme(row["date"])
+        raise
+    rows_by_date = {row["date"]: row for row in rows}
+    index_saved_mysteries((row.id, rows_by_date[row.date]) for row in inserted)
+    for skipped_date in rows_by_date.keys() - {row.date for row in inserted}:
+        mystery_similarity_index.release_theme(skipped_date)
+    for row in inserted:
+        start_scenario_tree_build(row.id)
+    return [row.date for row in inserted]
+
+
+async def generate_daily_mysteries_for_range(
+    db: AsyncSession,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    parallelism: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generates mysteries for every date in [start_date, end_date] that does not
+    have one yet. AI stages for different dates run concurrently (bounded by
+    `parallelism`), and finished rows are inserted in batches.
+    Yields one progress event per date plus a final summary event.
+    """
+    parallelism = parallelism or settings.BULK_GENERATION_PARALLELISM
+    started = time.perf_counter()
+
+    all_dates = [start_date + datetime.timedelta(days=offset)
+                 for offset in range((end_date - start_date).days + 1)]
+    existing_dates = set((await db.execute(
+        select(DailyMystery.date).where(DailyMystery.date.between(start_date, end_date))
+    )).scalars().all())
+    styles_by_name = {
+        style.name: style for style in (await db.execute(select(ImageStyle))).scalars().all()}
+    # Release the connection while the (long) AI calls run.
+    await db.commit()
+
+    for for_date in sorted(existing_dates):
+        yield {"date": for_date.isoformat(), "status": "skipped", "detail": "Mystery already exists."}
+
+    pending_dates = [d for d in all_dates if d not in existing_dates]
+    semaphore = asyncio.Semaphore(parallelism)
+    tasks = [
+        asyncio.create_task(_generate_fields_for_date(d, styles_by_name, semaphore))
+        for d in pending_dates
+    ]
+
+    pending_rows: List[Dict[str, Any]] = []
+    counts = {"generated": 0, "failed": 0, "skipped": len(existing_dates)}
+
+    async def flush_rows() -> AsyncIterator[Dict[str, Any]]:
+        rows = list(pending_rows)
+        pending_rows.clear()
+        inserted = set(await _bulk_insert_mysteries(db, rows))
+        for row in rows:
+            if row["date"] in inserted:
+                counts["generated"] += 1
+                yield {"date": row["date"].isoformat(), "status": "generated", "theme": row["theme"]}
+            else:
+                counts["skipped"] += 1
+                yield {"date": row["date"].isoformat(), "status": "skipped",
+                       "detail": "Mystery was created concurrently."}
+
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for_date, fields, error = await finished
+            if error is not None:
+                counts["failed"] += 1
+                logger.error("Bulk generation failed for %s: %s", for_date, error)
+                yield {"date": for_date.isoformat(), "status": "failed",
+                       "detail": f"{type(error).__name__}: {error}"}
+                continue
+            pending_rows.append(fields)
+
+            if len(pending_rows) >= settings.BULK_GENERATION_INSERT_BATCH_SIZE:
+                async for event in flush_rows():
+                    yield event
+
+        async for event in flush_rows():
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield {"status": "done", **counts, "elapsed_seconds": round(time.perf_counter() - started, 2)}
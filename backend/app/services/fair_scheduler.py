@@ -0,0 +1,164 @@
+"""
+Per-client fair scheduling for AI calls.
+
+A global concurrency budget is shared round-robin across clients, each client
+may hold at most `per_client_in_flight` slots and queue at most
+`per_client_queued` more requests. Anything beyond that is rejected
+immediately with a Retry-After estimate, so one client retrying in a loop
+cannot starve everyone else.
+
+Clients pick their own session ids, so the per-client caps alone would let one
+caller multiply its share by rotating ids. Every client id from an IP
+therefore also shares `per_ip_pending` (in flight plus queued) requests; it is
+looser than the per-client caps so players behind one NAT are not throttled
+as a single client.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, NamedTuple
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ClientQueueFullError(Exception):
+    def __init__(self, client_key: str, retry_after_seconds: int):
+        super().__init__(f"Too many pending AI requests for client '{client_key}'.")
+        self.client_key = client_key
+        self.retry_after_seconds = retry_after_seconds
+
+
+class ClientKey(NamedTuple):
+    id: str  # session id if the client sent one, else its IP
+    ip: str
+
+
+class FairScheduler:
+    # Weight of the newest sample in the service-time moving average.
+    SERVICE_TIME_SMOOTHING = 0.2
+
+    def __init__(self, max_concurrency: int, per_client_in_flight: int, per_client_queued: int,
+                 per_ip_pending: int):
+        self.max_concurrency = max_concurrency
+        self.per_client_in_flight = per_client_in_flight
+        self.per_client_queued = per_client_queued
+        self.per_ip_pending = per_ip_pending
+
+        self._in_flight_total = 0
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, Deque[asyncio.Future]] = {}
+        self._rotation: Deque[str] = deque()
+        self._pending_by_ip: Dict[str, int] = {}
+        self._avg_service_seconds = 2.0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self._in_flight_total,
+            "max_concurrency": self.max_concurrency,
+            "waiting": sum(len(q) for q in self._waiting.values()),
+            "clients_waiting": len(self._rotation),
+            "ips_pending": len(self._pending_by_ip),
+        }
+
+    def _retry_after(self, client_key: str) -> int:
+        backlog = len(self._waiting.get(client_key, ())) + self._in_flight.get(client_key, 0)
+        return max(1, round(self._avg_service_seconds * backlog / max(1, self.per_client_in_flight)))
+
+    def _grant(self, client_key: str) -> None:
+        self._in_flight_total += 1
+        self._in_flight[client_key] = self._in_flight.get(client_key, 0) + 1
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiting clients in round-robin order."""
+        skipped_in_a_row = 0
+        while self._rotation and self._in_flight_total < self.max_concurrency and skipped_in_a_row < len(self._rotation):
+            client_key = self._rotation.popleft()
+            queue = self._waiting.get(client_key)
+            while queue and queue[0].done():  # cancelled while waiting
+                queue.popleft()
+            if not queue:
+                self._waiting.pop(client_key, None)
+                continue
+            if self._in_flight.get(client_key, 0) >= self.per_client_in_flight:
+                self._rotation.append(client_key)
+                skipped_in_a_row += 1
+                continue
+
+            self._grant(client_key)
+            queue.popleft().set_result(None)
+            skipped_in_a_row = 0
+            if queue:
+                self._rotation.append(client_key)
+            else:
+                self._waiting.pop(client_key, None)
+
+    def _release(self, client_key: str) -> None:
+        self._in_flight_total -= 1
+        remaining = self._in_flight.get(client_key, 1) - 1
+        if remaining:
+            self._in_flight[client_key] = remaining
+        else:
+            self._in_flight.pop(client_key, None)
+        self._dispatch()
+
+    async def _acquire(self, client_key: str) -> None:
+        queue = self._waiting.get(client_key)
+        if (not self._rotation and self._in_flight_total < self.max_concurrency
+                and self._in_flight.get(client_key, 0) < self.per_client_in_flight):
+            self._grant(client_key)
+            return
+
+        if queue is not None and len(queue) >= self.per_client_queued:
+            raise ClientQueueFullError(client_key, self._retry_after(client_key))
+        if queue is None and self.per_client_queued <= 0:
+            raise ClientQueueFullError(client_key, self._retry_after(client_key))
+
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._waiting[client_key] = deque()
+            self._rotation.append(client_key)
+        queue.append(future)
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled; give it back.
+                self._release(client_key)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, client: ClientKey) -> AsyncIterator[None]:
+        pending = self._pending_by_ip.get(client.ip, 0)
+        if pending >= self.per_ip_pending:
+            raise ClientQueueFullError(
+                f"ip:{client.ip}", max(1, round(self._avg_service_seconds * pending / self.per_ip_pending)))
+        self._pending_by_ip[client.ip] = pending + 1
+        try:
+            await self._acquire(client.id)
+            started = time.monotonic()
+            try:
+                yield
+            finally:
+                elapsed = time.monotonic() - started
+                self._avg_service_seconds += self.SERVICE_TIME_SMOOTHING * (elapsed - self._avg_service_seconds)
+                self._release(client.id)
+        finally:
+            remaining = self._pending_by_ip[client.ip] - 1
+            if remaining:
+                self._pending_by_ip[client.ip] = remaining
+            else:
+                del self._pending_by_ip[client.ip]
+
+
+next_scenario_scheduler = FairScheduler(
+    max_concurrency=settings.AI_FAIR_MAX_CONCURRENCY,
+    per_client_in_flight=settings.AI_FAIR_PER_CLIENT_IN_FLIGHT,
+    per_client_queued=settings.AI_FAIR_PER_CLIENT_QUEUED,
+    per_ip_pending=settings.AI_FAIR_PER_IP_PENDING,
+)
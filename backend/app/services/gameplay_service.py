@@ -0,0 +1,218 @@
+"""
+Turn resolution shared by the HTTP next-scenario endpoint and the WebSocket
+gameplay channel (app/api/v1/endpoints/gameplay_ws.py).
+
+A turn is resolved from the precomputed scenario tree when possible, else
+from the shared scenario cache, else by the AI under the fair scheduler.
+Errors are raised as HTTPException; the WebSocket channel forwards their
+status and detail as error messages.
+"""
+import datetime
+import hashlib
+import random
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import HTTPConnection
+import logging
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.schemas.gameplay_schemas import StoryTurn
+from app.services import ai_services
+from app.services.choice_normalizer import CanonicalChoice, canonicalize_choice
+from app.services.fair_scheduler import ClientKey, ClientQueueFullError, next_scenario_scheduler
+from app.services.image_processing import generate_and_store_image
+from app.services.mystery_cache_service import get_mystery_snapshot_by_id, scenario_key
+from app.services.scenario_tree_service import find_precomputed_scenario
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Turn:
+    daily_mystery: Dict[str, Any]  # cached snapshot, see mystery_cache_service.mystery_snapshot
+    current_round: int
+    previous_scenario_text: str
+    choice: CanonicalChoice
+
+
+def get_client_key(connection: HTTPConnection) -> ClientKey:
+    """
+    Keyed by X-Session-Id, or the session_id query parameter (browsers cannot set
+    WebSocket headers), else the IP. The IP is always kept: session ids are chosen
+    by the client, so the scheduler also caps each IP (see fair_scheduler).
+    """
+    ip = connection.client.host if connection.client else "unknown"
+    session_id = connection.headers.get("x-session-id") or connection.query_params.get("session_id")
+    if session_id:
+        return ClientKey(f"session:{session_id}", ip)
+    return ClientKey(f"ip:{ip}", ip)
+
+
+def select_initial_choices(daily_mystery_id: int, pool: List[str], client_id: Optional[str]) -> List[str]:
+    """
+    Picks the player's initial choices deterministically from (mystery id, client id),
+    so repeat loads return an identical body that HTTP caches can revalidate.
+    Clients that send no identifier all share one selection.
+    """
+    seed = hashlib.sha256(f"{daily_mystery_id}:{client_id or ''}".encode("utf-8")).digest()
+    return random.Random(seed).sample(pool, min(3, len(pool)))
+
+
+async def prepare_turn(
+    db: AsyncSession,
+    daily_mystery_id: int,
+    path_so_far: Sequence[StoryTurn],
+    current_user_choice: str,
+    last_presented_scenario_text: Optional[str],
+    offered_choices: Optional[List[str]],
+) -> Turn:
+    daily_mystery = await get_mystery_snapshot_by_id(db, daily_mystery_id)
+
+    if not daily_mystery:
+        logger.warning("DailyMystery with ID %s not found.", daily_mystery_id)
+        raise HTTPException(status_code=404, detail="Daily mystery not found.")
+
+    if not daily_mystery["image_style_modifier"]:
+        logger.error("ImageStyle missing for DailyMystery ID %s.", daily_mystery["id"])
+        raise HTTPException(
+            status_code=500, detail="Internal server error: Mystery style configuration missing.")
+
+    current_round = len(path_so_far) + 1
+
+    if current_round > settings.MAX_ROUNDS:
+        logger.warning(
+            "Attempt to generate scenario for round %s, which exceeds MAX_ROUNDS (%s).",
+            current_round, settings.MAX_ROUNDS)
+        raise HTTPException(
+            status_code=400, detail="Game has already concluded or maximum rounds exceeded.")
+
+    previous_scenario_text: str
+    if last_presented_scenario_text is not None:
+        previous_scenario_text = last_presented_scenario_text
+    elif not path_so_far:
+        previous_scenario_text = daily_mystery["base_story_text"]
+    else:
+        logger.warning(
+            "last_presented_scenario_text not provided by client and path_so_far is not empty. This might lead to inconsistent AI context.")
+        raise HTTPException(
+            status_code=400, detail="Missing context: last_presented_scenario_text is required when path_so_far is not empty.")
+
+    if offered_choices is None and not path_so_far:
+        offered_choices = daily_mystery["initial_choices_pool"]
+    choice = canonicalize_choice(current_user_choice, offered_choices)
+    if choice.matched and choice.text != current_user_choice:
+        logger.debug(
+            "Matched choice '%s' to offered '%s' (score %.2f).",
+            current_user_choice, choice.text, choice.score)
+
+    return Turn(daily_mystery, current_round, previous_scenario_text, choice)
+
+
+async def _generate_scenario(
+    turn: Turn, client_key: ClientKey, on_scenario_text: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    daily_mystery = turn.daily_mystery
+    # Only cache misses reach the AI, so only they take a fair-scheduling slot.
+    async with next_scenario_scheduler.slot(client_key):
+        return await ai_services.generate_next_scenario_content(
+            base_story_summary=daily_mystery["base_story_text"],
+            actual_solution=daily_mystery["actual_solution_text"],
+            user_choice=turn.choice.text,
+            current_scenario_text=turn.previous_scenario_text,
+            image_style_modifier=daily_mystery["image_style_modifier"],
+            current_round=turn.current_round,
+            daily_mystery_id=daily_mystery["id"],
+            mystery_date=datetime.date.fromisoformat(daily_mystery["date"]),
+            on_scenario_text=on_scenario_text,
+            # TODO: pass history_summary built from the path so far
+        )
+
+
+async def resolve_scenario(
+    db: AsyncSession,
+    turn: Turn,
+    client_key: ClientKey,
+    on_scenario_text: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Returns the raw AI-shaped response for the turn. With `on_scenario_text`, a
+    freshly generated scenario is streamed to it as it is written; tree and
+    cache hits are returned whole.
+    """
+    daily_mystery_id = turn.daily_mystery["id"]
+    try:
+        ai_response = await find_precomputed_scenario(
+            db, daily_mystery_id, turn.current_round,
+            turn.previous_scenario_text, turn.choice.choice_id)
+        if ai_response is not None:
+            return ai_response
+        # Release the connection while the AI call runs.
+        await db.commit()
+
+        # Identical (scenario, choice, round) turns share one AI response across all workers.
+        cache_key = scenario_key(
+            daily_mystery_id, turn.current_round, turn.previous_scenario_text, turn.choice.choice_id)
+        if on_scenario_text is None:
+            return await cache.get_or_set_json(
+                cache_key,
+                lambda: _generate_scenario(turn, client_key),
+                ttl_seconds=settings.CACHE_SCENARIO_TTL_SECONDS,
+            )
+        # A streamed generation cannot be shared through get_or_set_json, so it only fills the cache.
+        ai_response = await cache.get_json(cache_key)
+        if ai_response is None:
+            ai_response = await _generate_scenario(turn, client_key, on_scenario_text)
+            await cache.set_json(cache_key, ai_response, ttl_seconds=settings.CACHE_SCENARIO_TTL_SECONDS)
+        return ai_response
+
+    except ClientQueueFullError as queue_ex:
+        logger.warning("Rejecting next-scenario request: %s", queue_ex)
+        raise HTTPException(
+            status_code=429,
+            detail="Too many scenario requests in progress for this client. Please retry shortly.",
+            headers={"Retry-After": str(queue_ex.retry_after_seconds)})
+    except HTTPException:
+        raise
+    except (ValueError, ConnectionError) as ai_ex:
+        logger.error("AI service error during next scenario generation: %s", ai_ex, exc_info=True)
+        raise HTTPException(
+            status_code=503, detail=f"AI service error: {str(ai_ex)}")
+    except Exception as e:
+        logger.error("Unexpected error during AI call for next scenario: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500, detail="Unexpected error during AI processing.")
+
+
+def scenario_outcome(turn: Turn, ai_response: Dict[str, Any]) -> Dict[str, Any]:
+    """The player-facing fields of a resolved turn, with the final round enforced by round count."""
+    is_final = ai_response.get("is_final_round", False)
+    if turn.current_round == settings.MAX_ROUNDS and not is_final:
+        logger.warning("AI did not mark round %s as final. Forcing it based on round count.", settings.MAX_ROUNDS)
+        is_final = True
+    return {
+        "scenario_text": ai_response["scenario_text"],
+        "choices": ai_response["choices"],
+        "is_final_round": is_final,
+        "solution_explanation": ai_response.get("solution_explanation") if is_final else None,
+        "image_prompt": ai_response.get("image_prompt"),
+    }
+
+
+def mock_scenario_image_url(current_round: int, image_prompt: Optional[str]) -> Optional[str]:
+    if not image_prompt:
+        return None
+    safe_prompt_snip = "".join(
+        filter(str.isalnum, image_prompt[:20]))
+    return f"https://mockurl.com/scenario_{current_round}_{safe_prompt_snip}.png"
+
+
+async def produce_scenario_image(
+    daily_mystery_id: int, current_round: int, image_prompt: str
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """(URL, variants) of a scenario image; generated only when GENERATE_SCENARIO_IMAGES is set."""
+    if not settings.GENERATE_SCENARIO_IMAGES:
+        return mock_scenario_image_url(current_round, image_prompt), []
+    return await generate_and_store_image(image_prompt, f"scenario_{daily_mystery_id}_{current_round}")
@@ -0,0 +1,211 @@
+"""
+Background admin mystery generation.
+
+The admin endpoint only records a GenerationJob and returns 202; the work runs
+here in an asyncio task. Every database touch uses its own short session, so
+no connection is held across the Gemini calls, and the job row is updated at
+each stage boundary so pollers can see progress and per-stage timings.
+
+A job whose worker dies (restart, deploy, crash) stops heartbeating; once
+its heartbeat is older than GENERATION_JOB_STALE_SECONDS it is marked failed
+and a new request for the date starts a fresh job. Jobs cancelled in this
+process, including at shutdown, are marked failed right away.
+"""
+import asyncio
+import datetime
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+import logging
+
+from app.core.config import settings
+from app.core.db import AsyncSessionFactory
+from app.models.job_models import ACTIVE_JOB_STATUSES, GenerationJob
+from app.models.mystery_models import DailyMystery
+from app.services import ai_services
+from app.services.daily_mystery_service import (build_daily_mystery_fields, generate_theme_and_style,
+                                                get_image_style_by_name, prepare_base_images)
+from app.services.mystery_cache_service import invalidate_mystery
+from app.services.scenario_tree_service import build_scenario_tree_after_commit
+from app.services.similarity_index import index_saved_mysteries, mystery_similarity_index
+
+logger = logging.getLogger(__name__)
+
+# Keeps references to running jobs so they are not garbage collected mid-flight.
+_running_jobs: Dict[int, asyncio.Task] = {}
+
+
+async def fail_stale_jobs(db: AsyncSession, for_date: datetime.date) -> None:
+    """Marks active jobs for the date whose last heartbeat is older than GENERATION_JOB_STALE_SECONDS as failed."""
+    stale_before = func.now() - datetime.timedelta(seconds=settings.GENERATION_JOB_STALE_SECONDS)
+    result = await db.execute(
+        update(GenerationJob)
+        .where(
+            GenerationJob.for_date == for_date,
+            GenerationJob.status.in_(ACTIVE_JOB_STATUSES),
+            func.coalesce(GenerationJob.heartbeat_at, GenerationJob.created_at) < stale_before,
+        )
+        .values(status="failed", error="Abandoned: the job stopped making progress.", finished_at=func.now())
+        .returning(GenerationJob.id)
+    )
+    for job_id in result.scalars().all():
+        logger.warning("Marked stale generation job %s for %s as failed.", job_id, for_date)
+
+
+async def get_active_job_for_date(db: AsyncSession, for_date: datetime.date) -> Optional[GenerationJob]:
+    result = await db.execute(
+        select(GenerationJob)
+        .where(GenerationJob.for_date == for_date, GenerationJob.status.in_(ACTIVE_JOB_STATUSES))
+        .order_by(GenerationJob.id.desc())
+    )
+    return result.scalars().first()
+
+
+async def create_generation_job(
+    db: AsyncSession, for_date: datetime.date, force_regenerate: bool
+) -> Tuple[GenerationJob, bool]:
+    """
+    Returns (job, created). A job already queued or running for the same date
+    is returned instead of starting a second one; uq_generationjobs_active_for_date
+    settles concurrent requests that both miss it.
+    """
+    await fail_stale_jobs(db, for_date)
+    active_job = await get_active_job_for_date(db, for_date)
+    if active_job:
+        return active_job, False
+    job = GenerationJob(
+        status="queued", for_date=for_date, force_regenerate=force_regenerate, stage_timings={},
+        heartbeat_at=func.now())
+    try:
+        async with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        active_job = await get_active_job_for_date(db, for_date)
+        if active_job is None:
+            raise
+        return active_job, False
+    await db.refresh(job)
+    return job, True
+
+
+async def _update_job(job_id: int, **values) -> None:
+    async with AsyncSessionFactory() as db:
+        await db.execute(update(GenerationJob).where(GenerationJob.id == job_id).values(**values))
+        await db.commit()
+
+
+async def _save_mystery(for_date: datetime.date, force_regenerate: bool, fields: Dict) -> int:
+    replaced_id = None
+    async with AsyncSessionFactory() as db:
+        result = await db.execute(select(DailyMystery).where(DailyMystery.date == for_date))
+        existing_mystery = result.scalars().first()
+        if existing_mystery:
+            if not force_regenerate:
+                raise ValueError(f"A daily mystery for {for_date} already exists.")
+            replaced_id = existing_mystery.id
+            await db.delete(existing_mystery)
+            await db.flush()
+        new_mystery = DailyMystery(**fields)
+        db.add(new_mystery)
+        await db.flush()
+        build_scenario_tree_after_commit(db, new_mystery.id)
+        await db.commit()
+        new_mystery_id = new_mystery.id
+    index_saved_mysteries([(new_mystery_id, fields)])
+
+    if replaced_id is not None:
+        mystery_similarity_index.remove(replaced_id)
+        await invalidate_mystery(replaced_id, for_date)
+    return new_mystery_id
+
+
+async def run_generation_job(job_id: int) -> None:
+    async with AsyncSessionFactory() as db:
+        job = await db.get(GenerationJob, job_id)
+        if job is None or job.status != "queued":
+            logger.warning(f"Generation job {job_id} is missing or not queued; not running it.")
+            return
+        for_date, force_regenerate = job.for_date, job.force_regenerate
+        job.status = "running"
+        job.started_at = func.now()
+        job.heartbeat_at = func.now()
+        await db.commit()
+
+    timings: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def stage(name: str) -> AsyncIterator[None]:
+        await _update_job(job_id, current_stage=name, stage_timings=dict(timings), heartbeat_at=func.now())
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = round(time.perf_counter() - started, 3)
+
+    try:
+        async with stage("theme_and_style"):
+            generated_theme_info = await generate_theme_and_style(for_date)
+
+        async with stage("style_lookup"):
+            async with AsyncSessionFactory() as db:
+                image_style_obj = await get_image_style_by_name(db, generated_theme_info["selected_art_style"])
+            if not image_style_obj:
+                raise ValueError(
+                    f"ImageStyle '{generated_theme_info['selected_art_style']}' not found. Ensure styles are seeded.")
+
+        async with stage("story_content"):
+            ai_story_content = await ai_services.generate_daily_mystery_content(
+                theme=generated_theme_info["theme_title"],
+                image_style_modifier=image_style_obj.dalle_prompt_modifier
+            )
+
+        async with stage("base_images"):
+            base_images = await prepare_base_images(for_date, ai_story_content)
+
+        async with stage("save"):
+            fields = build_daily_mystery_fields(
+                for_date, generated_theme_info["theme_title"], image_style_obj, ai_story_content, base_images)
+            daily_mystery_id = await _save_mystery(for_date, force_regenerate, fields)
+
+        await _update_job(job_id, status="succeeded", current_stage=None, stage_timings=timings,
+                          daily_mystery_id=daily_mystery_id, finished_at=func.now())
+        logger.info(
+            f"Generation job {job_id} saved DailyMystery ID {daily_mystery_id} for {for_date} in {sum(timings.values()):.2f}s.")
+    except asyncio.CancelledError:
+        logger.warning("Generation job %s was cancelled.", job_id)
+        mystery_similarity_index.release_theme(for_date)
+        await _update_job(job_id, status="failed", stage_timings=timings,
+                          error="Cancelled (worker shutting down).", finished_at=func.now())
+        raise
+    except Exception as e:
+        logger.error(f"Generation job {job_id} failed: {e}", exc_info=True)
+        mystery_similarity_index.release_theme(for_date)
+        await _update_job(job_id, status="failed", stage_timings=timings,
+                          error=f"{type(e).__name__}: {e}", finished_at=func.now())
+
+
+def start_generation_job(job_id: int) -> None:
+    """Runs the job in the background. The job row must already be committed."""
+    if job_id in _running_jobs:
+        return
+
+    async def run():
+        try:
+            await run_generation_job(job_id)
+        finally:
+            _running_jobs.pop(job_id, None)
+
+    _running_jobs[job_id] = asyncio.get_running_loop().create_task(run())
+
+
+async def stop_generation_jobs(timeout_seconds: float = 10.0) -> None:
+    """Cancels this worker's running jobs at shutdown; each marks its row failed on the way out."""
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.wait(tasks, timeout=timeout_seconds)
@@ -0,0 +1,136 @@
+"""
+Post-processing of generated images into smaller, modern-format variants.
+
+Decoding, resizing and WebP/AVIF encoding are CPU-bound, so render_variants()
+runs in a process pool and the event loop only awaits it. The source image is
+sent to the worker once and each width is resized from the next larger one, so
+a variant never costs a full-size decode. Encoded variants come back as bytes
+(BytesIO.getvalue() hands over its buffer without copying) and are uploaded as
+they are.
+
+Variants are stored per image, smallest width first and WebP before AVIF at
+the same width, as {"width", "format", "url"} dicts alongside the original URL.
+"""
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+from PIL import Image
+
+from app.core.config import settings
+from app.core.tracing import current_span, traced
+from app.services.image_services import generate_image_from_prompt
+from app.services.storage_services import upload_image_to_storage
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def render_variants(
+    image_data: bytes, widths: Sequence[int], formats: Sequence[str], quality: int
+) -> List[Tuple[int, str, bytes]]:
+    """
+    Runs in a worker process. Returns (width, format, encoded bytes) for every
+    requested width no larger than the source (the source width stands in for
+    larger ones) and every format this Pillow build can write.
+    """
+    Image.init()
+    formats = [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+    variants: List[Tuple[int, str, bytes]] = []
+    with Image.open(io.BytesIO(image_data)) as source:
+        has_alpha = source.mode in ("RGBA", "LA") or "transparency" in source.info
+        current = source.convert("RGBA" if has_alpha else "RGB")
+        emitted_widths = set()
+        for width in sorted(set(widths), reverse=True):
+            if width < current.width:
+                height = max(1, round(current.height * width / current.width))
+                current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            if current.width in emitted_widths:
+                continue
+            emitted_widths.add(current.width)
+            for fmt in formats:
+                buffer = io.BytesIO()
+                current.save(buffer, format=fmt.upper(), quality=quality)
+                variants.append((current.width, fmt, buffer.getvalue()))
+    variants.sort(key=lambda variant: (variant[0], formats.index(variant[1])))
+    return variants
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not fork: forking a process that runs an event loop and worker threads is unsafe.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_image_processing() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+@traced("image.process")
+async def create_image_variants(image_data: bytes) -> List[Tuple[int, str, bytes]]:
+    variants = await asyncio.get_running_loop().run_in_executor(
+        _get_executor(), render_variants, image_data,
+        settings.IMAGE_VARIANT_WIDTHS, settings.IMAGE_VARIANT_FORMATS, settings.IMAGE_VARIANT_QUALITY)
+    current_span().set_attributes({
+        "image.source_bytes": len(image_data),
+        "image.variants": len(variants),
+        "image.variant_bytes": sum(len(data) for _, _, data in variants),
+    })
+    return variants
+
+
+async def generate_and_store_image(prompt: str, filename_prefix: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Generates one image and uploads it with its variants. Returns (original URL,
+    variants). If post-processing fails only the original is kept.
+    """
+    image_data = await generate_image_from_prompt(prompt)
+    try:
+        variants = await create_image_variants(image_data)
+    except Exception as e:
+        logger.warning("Image post-processing failed for %s, keeping the original only: %s - %s",
+                       filename_prefix, type(e).__name__, e)
+        variants = []
+
+    urls = await asyncio.gather(
+        upload_image_to_storage(image_data, filename_prefix),
+        *(upload_image_to_storage(data, f"{filename_prefix}_{width}w", extension=fmt, content_type=f"image/{fmt}")
+          for width, fmt, data in variants),
+    )
+    return urls[0], [
+        {"width": width, "format": fmt, "url": url}
+        for (width, fmt, _), url in zip(variants, urls[1:])
+    ]
+
+
+def select_variant_url(
+    original_url: str,
+    variants: Optional[List[Dict[str, Any]]],
+    accepted_formats: Sequence[str],
+    min_width: Optional[int],
+) -> str:
+    """
+    The smallest variant at least `min_width` wide (the largest one if none is),
+    in the first of `accepted_formats` available at that width. Falls back to the
+    original when no variant is in an accepted format.
+    """
+    candidates = [variant for variant in variants or () if variant["format"] in accepted_formats]
+    if not candidates:
+        return original_url
+    wide_enough = [variant for variant in candidates if min_width is not None and variant["width"] >= min_width]
+    if wide_enough:
+        width = min(variant["width"] for variant in wide_enough)
+    else:
+        width = max(variant["width"] for variant in candidates)
+    at_width = [variant for variant in candidates if variant["width"] == width]
+    return min(at_width, key=lambda variant: accepted_formats.index(variant["format"]))["url"]
@@ -1,3 +1,11 @@
+import logging
+
+from app.core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+@traced("image.generate")
 async def generate_image_from_prompt(prompt: str) -> bytes:
-    print(f"MOCK image_services: Generating image for prompt: {prompt}")
+    logger.info("MOCK image_services: Generating image for prompt: %s", prompt)
     return b"fake_image_bytes_content"
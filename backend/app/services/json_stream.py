@@ -0,0 +1,84 @@
+"""
+Incremental extraction of one string field from JSON that arrives in chunks.
+
+Gemini streams the next-scenario JSON object a few tokens at a time. To show
+the scenario while it is still being written, JsonStringFieldExtractor finds
+the "scenario_text" value in the growing text and returns each newly
+completed part of it, with escapes decoded. An escape split across chunks is
+held back until it is complete. A \\u escape that decodes to an unpaired
+surrogate is replaced with U+FFFD, since the text has to be re-encoded as
+UTF-8 to reach the client.
+"""
+import json
+import re
+from typing import Optional
+
+_HEX_DIGITS = set("0123456789abcdefABCDEF")
+_LONE_SURROGATE = re.compile(r"[\ud800-\udfff]")
+
+
+class JsonStringFieldExtractor:
+    def __init__(self, field_name: str) -> None:
+        self._key_pattern = re.compile(r'"' + re.escape(field_name) + r'"\s*:\s*"')
+        self._buffer = ""
+        self._position: Optional[int] = None  # next unread index inside the value, once found
+        self.done = False
+        self.emitted = False
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk and returns the part of the field's value completed by it (may be empty)."""
+        if self.done:
+            return ""
+        self._buffer += chunk
+        if self._position is None:
+            match = self._key_pattern.search(self._buffer)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        decoded = []
+        buffer, i = self._buffer, self._position
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                start = i
+                while i < len(buffer) and buffer[i] not in '"\\':
+                    i += 1
+                decoded.append(buffer[start:i])
+                continue
+            escape_length = self._escape_length(buffer, i)
+            if escape_length is None:
+                break  # incomplete escape; wait for the next chunk
+            decoded.append(_LONE_SURROGATE.sub("\ufffd", json.loads(f'"{buffer[i:i + escape_length]}"')))
+            i += escape_length
+        self._position = i
+
+        text = "".join(decoded)
+        if text:
+            self.emitted = True
+        return text
+
+    @staticmethod
+    def _escape_length(buffer: str, i: int) -> Optional[int]:
+        """Length of the escape sequence at buffer[i], or None if it is not complete yet."""
+        if i + 1 >= len(buffer):
+            return None
+        if buffer[i + 1] != "u":
+            return 2
+        if i + 6 > len(buffer):
+            return None
+        if not set(buffer[i + 2:i + 6]) <= _HEX_DIGITS:
+            raise ValueError("Invalid \\u escape in streamed JSON.")
+        # A high surrogate only decodes together with the low surrogate that follows it.
+        if 0xD800 <= int(buffer[i + 2:i + 6], 16) <= 0xDBFF:
+            if len(buffer) > i + 6 and buffer[i + 6] != "\\":
+                return 6
+            if i + 12 > len(buffer):
+                return None
+            if buffer[i + 6:i + 8] == "\\u":
+                return 12
+        return 6
@@ -0,0 +1,105 @@
+"""
+Cached, JSON-native snapshots of the rows the gameplay hot paths read.
+
+Endpoints work from these snapshots instead of ORM objects so a cache hit
+(local or shared tier, see app/core/cache.py) needs no database round trip.
+
+Mystery snapshots are always loaded from the primary (stick_to_primary), even
+through a read-replica session: a lagging replica could otherwise cache the
+row invalidate_mystery just dropped for the whole TTL. Misses are rare, so
+moving the rest of such a session to the primary costs little.
+"""
+import datetime
+import hashlib
+from typing import Any, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.core.cache import cache
+from app.core.config import settings
+from app.core.db import stick_to_primary
+from app.models.mystery_models import DailyMystery
+from app.models.style_models import ImageStyle
+
+
+def today_mystery_key(for_date: datetime.date) -> str:
+    return f"mystery:date:{for_date.isoformat()}"
+
+
+def mystery_key(daily_mystery_id: int) -> str:
+    return f"mystery:id:{daily_mystery_id}"
+
+
+def image_style_key(style_name: str) -> str:
+    return f"style:name:{style_name}"
+
+
+def scenario_key(daily_mystery_id: int, current_round: int, previous_scenario_text: str, choice_id: str) -> str:
+    """`choice_id` is the canonical id from choice_normalizer, not the raw choice text."""
+    digest = hashlib.sha256(
+        f"{previous_scenario_text}\x1f{choice_id}".encode("utf-8")).hexdigest()[:32]
+    return f"scenario:{daily_mystery_id}:{current_round}:{digest}"
+
+
+def mystery_snapshot(mystery: DailyMystery) -> Dict[str, Any]:
+    """Requires mystery.image_style to be loaded."""
+    return {
+        "id": mystery.id,
+        "date": mystery.date.isoformat(),
+        "theme": mystery.theme,
+        "base_story_text": mystery.base_story_text,
+        "actual_solution_text": mystery.actual_solution_text,
+        "character_dossiers": mystery.character_dossiers,
+        "base_image_urls": mystery.base_image_urls,
+        "base_image_variants": mystery.base_image_variants,
+        "initial_choices_pool": mystery.initial_choices_pool,
+        "image_style_modifier": mystery.image_style.dalle_prompt_modifier if mystery.image_style else None,
+    }
+
+
+async def get_today_mystery_snapshot(db: AsyncSession, for_date: datetime.date) -> Optional[Dict[str, Any]]:
+    async def load():
+        stick_to_primary(db)
+        result = await db.execute(
+            select(DailyMystery).options(selectinload(DailyMystery.image_style))
+            .where(DailyMystery.date == for_date))
+        mystery = result.scalars().first()
+        return mystery_snapshot(mystery) if mystery else None
+
+    return await cache.get_or_set_json(
+        today_mystery_key(for_date), load, ttl_seconds=settings.CACHE_MYSTERY_TTL_SECONDS)
+
+
+async def get_mystery_snapshot_by_id(db: AsyncSession, daily_mystery_id: int) -> Optional[Dict[str, Any]]:
+    async def load():
+        stick_to_primary(db)
+        result = await db.execute(
+            select(DailyMystery).options(selectinload(DailyMystery.image_style))
+            .where(DailyMystery.id == daily_mystery_id))
+        mystery = result.scalars().first()
+        return mystery_snapshot(mystery) if mystery else None
+
+    return await cache.get_or_set_json(
+        mystery_key(daily_mystery_id), load, ttl_seconds=settings.CACHE_MYSTERY_TTL_SECONDS)
+
+
+async def get_image_style_cached(db: AsyncSession, style_name: str) -> Optional[ImageStyle]:
+    """Returns a detached ImageStyle; fine for reading id/name/modifier, not for relationship assignment."""
+    async def load():
+        result = await db.execute(select(ImageStyle).where(ImageStyle.name == style_name))
+        style = result.scalars().first()
+        if not style:
+            return None
+        return {"id": style.id, "name": style.name, "dalle_prompt_modifier": style.dalle_prompt_modifier}
+
+    style_data = await cache.get_or_set_json(
+        image_style_key(style_name), load, ttl_seconds=settings.CACHE_STYLE_TTL_SECONDS)
+    return ImageStyle(**style_data) if style_data else None
+
+
+async def invalidate_mystery(daily_mystery_id: Optional[int], for_date: Optional[datetime.date]) -> None:
+    if daily_mystery_id is not None:
+        await cache.delete(mystery_key(daily_mystery_id))
+    if for_date is not None:
+        await cache.delete(today_mystery_key(for_date))
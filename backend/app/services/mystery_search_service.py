@@ -0,0 +1,86 @@
+"""
+Full-text search over daily mysteries.
+
+Each mystery stores a weighted tsvector (DailyMystery.search_vector), written
+alongside the row on insert and on admin edits:
+  A  theme and character names
+  B  critical path clues
+  C  character descriptions
+  D  base story text
+The migration that added the column backfills existing rows with the same
+SQL. Searches use websearch_to_tsquery syntax ("quoted phrases", -exclusions,
+or) against the GIN index and are ranked by ts_rank, paged by (rank, id).
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Text, cast, func, literal_column, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import REAL, TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.mystery_models import DailyMystery
+
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+
+def _weighted_vector(text: str, weight: str) -> ColumnElement:
+    return func.setweight(func.to_tsvector(SEARCH_CONFIG, cast(text, Text)), weight)
+
+
+def search_vector_expression(
+    theme: str,
+    base_story_text: str,
+    character_dossiers: Optional[Sequence[Dict[str, Any]]],
+    critical_path_clues: Optional[Sequence[str]],
+) -> ColumnElement:
+    """SQL expression for a mystery's search_vector; assign it to the column on insert or update."""
+    dossiers = character_dossiers or []
+    parts = [
+        (theme, "A"),
+        (" ".join(dossier.get("character_name") or "" for dossier in dossiers), "A"),
+        (" ".join(critical_path_clues or []), "B"),
+        (" ".join(dossier.get("description") or "" for dossier in dossiers), "C"),
+        (base_story_text, "D"),
+    ]
+    vector = _weighted_vector(*parts[0])
+    for text, weight in parts[1:]:
+        vector = vector.op("||")(_weighted_vector(text, weight))
+    return type_coerce(vector, TSVECTOR)
+
+
+async def search_mysteries(
+    db: AsyncSession,
+    query: str,
+    before_date,
+    limit: int,
+    after: Optional[Dict[str, Any]] = None,
+) -> List[Any]:
+    """
+    Mysteries dated before `before_date` matching `query`, best match first.
+    Rows carry id, date, theme, thumbnail_image_url and rank; `after` is the
+    {"rank", "id"} of the last row of the previous page. Fetches limit + 1 rows
+    so the caller can tell whether another page follows.
+    """
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, cast(query, Text))
+    rank = func.ts_rank(DailyMystery.search_vector, ts_query, type_=REAL)
+    stmt = (
+        select(
+            DailyMystery.id,
+            DailyMystery.date,
+            DailyMystery.theme,
+            func.coalesce(
+                DailyMystery.base_image_variants[(0, 0, "url")].as_string(),
+                DailyMystery.base_image_urls[0].as_string(),
+            ).label("thumbnail_image_url"),
+            rank.label("rank"),
+        )
+        .where(DailyMystery.search_vector.bool_op("@@")(ts_query))
+        .where(DailyMystery.date < before_date)
+        .order_by(rank.desc(), DailyMystery.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        # rank is float4; the cursor's value came from it, so comparing as float4 is exact.
+        stmt = stmt.where(tuple_(rank, DailyMystery.id) < tuple_(cast(after["rank"], REAL), after["id"]))
+    return (await db.execute(stmt)).all()
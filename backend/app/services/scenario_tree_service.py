@@ -0,0 +1,215 @@
+"""
+Offline precomputed scenario trees.
+
+A mystery is bounded (MAX_ROUNDS rounds, a few choices per scenario), so with
+SCENARIO_TREE_ENABLED the whole decision tree is generated in the background
+once a DailyMystery is committed. Nodes are generated breadth-first, one level
+at a time, with at most SCENARIO_TREE_CONCURRENCY AI calls in flight across
+all trees being built, and each level is inserted in one statement.
+
+Gameplay looks a turn up by its turn hash (round, previous scenario text,
+canonical choice id). Any path made of offered choices, or typed choices that
+choice_normalizer matches to them, is served from the tree; other free-text
+choices, and turns whose subtree failed to generate, miss and fall back to
+live generation.
+"""
+import asyncio
+import datetime
+import hashlib
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+import logging
+
+from app.core.config import settings
+from app.core.db import AsyncSessionFactory
+from app.models.mystery_models import ScenarioNode
+from app.services import ai_services
+from app.services.choice_normalizer import choice_id_for
+from app.services.mystery_cache_service import get_mystery_snapshot_by_id
+
+logger = logging.getLogger(__name__)
+
+# Shared by every tree build so bulk generation cannot multiply the AI load.
+_ai_semaphore = asyncio.Semaphore(settings.SCENARIO_TREE_CONCURRENCY)
+# Keeps references to running builds so they are not garbage collected mid-flight.
+_running_builds: Dict[int, asyncio.Task] = {}
+
+
+def turn_hash(current_round: int, previous_scenario_text: str, choice_id: str) -> str:
+    return hashlib.sha256(
+        f"{current_round}\x1f{previous_scenario_text}\x1f{choice_id}".encode("utf-8")).hexdigest()
+
+
+def _tree_depth() -> int:
+    return min(settings.SCENARIO_TREE_MAX_DEPTH or settings.MAX_ROUNDS, settings.MAX_ROUNDS)
+
+
+async def find_precomputed_scenario(
+    db: AsyncSession,
+    daily_mystery_id: int,
+    current_round: int,
+    previous_scenario_text: str,
+    choice_id: str,
+) -> Optional[Dict[str, Any]]:
+    """Returns the stored turn in the same shape as generate_next_scenario_content, or None."""
+    if not settings.SCENARIO_TREE_ENABLED:
+        return None
+    result = await db.execute(
+        select(ScenarioNode).where(
+            ScenarioNode.daily_mystery_id == daily_mystery_id,
+            ScenarioNode.turn_hash == turn_hash(current_round, previous_scenario_text, choice_id),
+        )
+    )
+    node = result.scalars().first()
+    if node is None:
+        return None
+    return {
+        "scenario_text": node.scenario_text,
+        "image_prompt": node.image_prompt,
+        "choices": node.choices,
+        "is_final_round": node.is_final_round,
+        "solution_explanation": node.solution_explanation,
+    }
+
+
+async def _generate_node(
+    snapshot: Dict[str, Any],
+    parent: Optional[Dict[str, Any]],
+    choice_text: str,
+    current_round: int,
+) -> Optional[Dict[str, Any]]:
+    previous_scenario_text = parent["scenario_text"] if parent else snapshot["base_story_text"]
+    try:
+        async with _ai_semaphore:
+            ai_response = await ai_services.generate_next_scenario_content(
+                base_story_summary=snapshot["base_story_text"],
+                actual_solution=snapshot["actual_solution_text"],
+                user_choice=choice_text,
+                current_scenario_text=previous_scenario_text,
+                image_style_modifier=snapshot["image_style_modifier"],
+                current_round=current_round,
+                daily_mystery_id=snapshot["id"],
+                mystery_date=datetime.date.fromisoformat(snapshot["date"]),
+                ledger_task_type="scenario_tree",
+            )
+    except Exception as e:
+        logger.warning(
+            f"Scenario tree: round {current_round} choice '{choice_text}' failed for mystery {snapshot['id']}, "
+            f"subtree left to live generation: {e}")
+        return None
+
+    is_final = bool(ai_response.get("is_final_round")) or current_round >= settings.MAX_ROUNDS
+    return {
+        "daily_mystery_id": snapshot["id"],
+        "parent_id": parent["id"] if parent else None,
+        "round_number": current_round,
+        "turn_hash": turn_hash(current_round, previous_scenario_text, choice_id_for(choice_text)),
+        "choice_text": choice_text,
+        "scenario_text": ai_response["scenario_text"],
+        "image_prompt": ai_response.get("image_prompt"),
+        "choices": ai_response.get("choices") or [],
+        "is_final_round": is_final,
+        "solution_explanation": ai_response.get("solution_explanation") if is_final else None,
+    }
+
+
+async def _insert_level(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Inserts one tree level and returns the stored nodes (with ids) for the next level's parents."""
+    if not rows:
+        return []
+    stmt = (
+        pg_insert(ScenarioNode)
+        .values(rows)
+        .on_conflict_do_nothing(constraint="uq_scenarionodes_daily_mystery_id_turn_hash")
+        .returning(ScenarioNode.id, ScenarioNode.turn_hash)
+    )
+    ids_by_hash = {row.turn_hash: row.id for row in (await db.execute(stmt)).all()}
+    await db.commit()
+    return [{**row, "id": ids_by_hash[row["turn_hash"]]} for row in rows if row["turn_hash"] in ids_by_hash]
+
+
+async def _existing_nodes(db: AsyncSession, daily_mystery_id: int) -> List[Dict[str, Any]]:
+    result = await db.execute(
+        select(ScenarioNode.id, ScenarioNode.parent_id, ScenarioNode.round_number, ScenarioNode.turn_hash,
+               ScenarioNode.choice_text, ScenarioNode.scenario_text, ScenarioNode.choices,
+               ScenarioNode.is_final_round)
+        .where(ScenarioNode.daily_mystery_id == daily_mystery_id)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+async def build_scenario_tree(daily_mystery_id: int) -> int:
+    """
+    Generates every missing node of the mystery's tree and returns how many were added.
+    Safe to re-run: existing nodes are kept and only missing subtrees are generated.
+    """
+    async with AsyncSessionFactory() as db:
+        snapshot = await get_mystery_snapshot_by_id(db, daily_mystery_id)
+        if not snapshot:
+            logger.warning(f"Scenario tree: mystery {daily_mystery_id} not found.")
+            return 0
+        existing = await _existing_nodes(db, daily_mystery_id)
+        await db.commit()
+
+        existing_by_round: Dict[int, List[Dict[str, Any]]] = {}
+        for node in existing:
+            existing_by_round.setdefault(node["round_number"], []).append(node)
+        known_hashes: Set[str] = {node["turn_hash"] for node in existing}
+
+        added = 0
+        parents: List[Optional[Dict[str, Any]]] = [None]
+        for current_round in range(1, _tree_depth() + 1):
+            jobs = []
+            for parent in parents:
+                if parent is not None and parent["is_final_round"]:
+                    continue
+                previous_scenario_text = parent["scenario_text"] if parent else snapshot["base_story_text"]
+                choices = parent["choices"] if parent else (snapshot["initial_choices_pool"] or [])
+                for choice_text in choices:
+                    if turn_hash(current_round, previous_scenario_text, choice_id_for(choice_text)) in known_hashes:
+                        continue
+                    jobs.append(_generate_node(snapshot, parent, choice_text, current_round))
+
+            generated = [row for row in await asyncio.gather(*jobs) if row is not None]
+            inserted = await _insert_level(db, generated)
+            added += len(inserted)
+            known_hashes.update(row["turn_hash"] for row in inserted)
+            parents = existing_by_round.get(current_round, []) + inserted
+            logger.info(
+                f"Scenario tree: mystery {daily_mystery_id} round {current_round} "
+                f"added {len(inserted)} of {len(jobs)} nodes.")
+            if not parents:
+                break
+
+    logger.info(f"Scenario tree for mystery {daily_mystery_id} complete: {added} nodes added.")
+    return added
+
+
+def start_scenario_tree_build(daily_mystery_id: int) -> None:
+    """Starts a background build unless one is already running for this mystery."""
+    if not settings.SCENARIO_TREE_ENABLED or daily_mystery_id in _running_builds:
+        return
+
+    async def run():
+        try:
+            await build_scenario_tree(daily_mystery_id)
+        except Exception as e:
+            logger.error(f"Scenario tree build failed for mystery {daily_mystery_id}: {e}", exc_info=True)
+        finally:
+            _running_builds.pop(daily_mystery_id, None)
+
+    _running_builds[daily_mystery_id] = asyncio.get_running_loop().create_task(run())
+
+
+def build_scenario_tree_after_commit(db: AsyncSession, daily_mystery_id: int) -> None:
+    """Defers the build until `db` commits, so the background session can see the new mystery."""
+    if not settings.SCENARIO_TREE_ENABLED:
+        return
+    event.listen(
+        db.sync_session, "after_commit",
+        lambda session: start_scenario_tree_build(daily_mystery_id),
+        once=True,
+    )
@@ -0,0 +1,135 @@
+import datetime
+import re
+from typing import List, Optional
+from sqlalchemy import text
+import logging
+
+from app.core.config import settings
+from app.core.db import async_engine
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_PARENT_TABLE = "usermysterysessions"
+ARCHIVE_MODES = ("detach", "compact", "drop")
+
+_PARTITION_NAME_RE = re.compile(
+    rf"^{SESSIONS_PARENT_TABLE}_y(?P<year>\d{{4}})m(?P<month>\d{{2}})$")
+
+
+def add_months(month_start: datetime.date, months: int) -> datetime.date:
+    month_index = month_start.month - 1 + months
+    return datetime.date(month_start.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name_for(month_start: datetime.date) -> str:
+    return f"{SESSIONS_PARENT_TABLE}_y{month_start:%Y}m{month_start:%m}"
+
+
+def _month_from_partition_name(name: str) -> Optional[datetime.date]:
+    match = _PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    return datetime.date(int(match["year"]), int(match["month"]), 1)
+
+
+async def list_session_partitions() -> List[str]:
+    async with async_engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "WHERE parent.relname = :parent ORDER BY child.relname"
+        ), {"parent": SESSIONS_PARENT_TABLE})
+        return list(result.scalars().all())
+
+
+async def ensure_session_partitions(
+    months_ahead: Optional[int] = None,
+    today: Optional[datetime.date] = None,
+) -> List[str]:
+    """
+    Creates monthly partitions from the current month up to `months_ahead`
+    months in the future. Idempotent; returns the names of partitions created.
+    """
+    months_ahead = settings.SESSION_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    this_month = (today or datetime.date.today()).replace(day=1)
+    existing = set(await list_session_partitions())
+
+    created = []
+    async with async_engine.begin() as conn:
+        for offset in range(months_ahead + 1):
+            month_start = add_months(this_month, offset)
+            name = partition_name_for(month_start)
+            if name in existing:
+                continue
+            month_end = add_months(month_start, 1)
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {SESSIONS_PARENT_TABLE} "
+                f"FOR VALUES FROM ('{month_start.isoformat()} 00:00:00+00') "
+                f"TO ('{month_end.isoformat()} 00:00:00+00')"
+            ))
+            created.append(name)
+
+    if created:
+        logger.info(f"Created session partitions: {created}")
+    return created
+
+
+async def archive_old_session_partitions(
+    retain_months: Optional[int] = None,
+    mode: Optional[str] = None,
+    today: Optional[datetime.date] = None,
+) -> List[str]:
+    """
+    Detaches partitions older than `retain_months` so the live table's indexes
+    and vacuum work only cover recent history.
+
+    Modes:
+      detach  - detach and move to the archive schema, data and indexes intact.
+      compact - like detach, but also drop the archived partition's indexes.
+      drop    - detach and drop the partition entirely.
+    """
+    retain_months = settings.SESSION_PARTITION_RETAIN_MONTHS if retain_months is None else retain_months
+    mode = mode or settings.SESSION_PARTITION_ARCHIVE_MODE
+    if mode not in ARCHIVE_MODES:
+        raise ValueError(f"Unknown archive mode '{mode}'. Expected one of: {ARCHIVE_MODES}")
+
+    cutoff = add_months((today or datetime.date.today()).replace(day=1), -retain_months)
+    to_archive = [
+        name for name in await list_session_partitions()
+        if (month := _month_from_partition_name(name)) is not None and month < cutoff
+    ]
+    if not to_archive:
+        return []
+
+    archive_schema = settings.SESSION_PARTITION_ARCHIVE_SCHEMA
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block, and only
+    # takes a SHARE UPDATE EXCLUSIVE lock so gameplay writes are not blocked.
+    autocommit_engine = async_engine.execution_options(isolation_level="AUTOCOMMIT")
+    async with autocommit_engine.connect() as conn:
+        if mode != "drop":
+            await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+
+        for name in to_archive:
+            await conn.execute(text(
+                f"ALTER TABLE {SESSIONS_PARENT_TABLE} DETACH PARTITION {name} CONCURRENTLY"))
+
+            if mode == "drop":
+                await conn.execute(text(f"DROP TABLE {name}"))
+                logger.info(f"Dropped session partition {name}.")
+                continue
+
+            await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+            if mode == "compact":
+                index_names = (await conn.execute(text(
+                    "SELECT idx.relname FROM pg_index "
+                    "JOIN pg_class idx ON idx.oid = pg_index.indexrelid "
+                    "JOIN pg_class tbl ON tbl.oid = pg_index.indrelid "
+                    "JOIN pg_namespace ns ON ns.oid = tbl.relnamespace "
+                    "WHERE ns.nspname = :schema AND tbl.relname = :table AND NOT pg_index.indisprimary"
+                ), {"schema": archive_schema, "table": name})).scalars().all()
+                for index_name in index_names:
+                    await conn.execute(text(f"DROP INDEX IF EXISTS {archive_schema}.{index_name}"))
+            logger.info(f"Archived session partition {name} to schema '{archive_schema}' (mode={mode}).")
+
+    return to_archive
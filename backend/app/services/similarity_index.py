@@ -0,0 +1,221 @@
+"""
+In-process near-duplicate index over recent mysteries.
+
+The daily-content prompt asks the model not to repeat itself, but only this
+index checks it. Each mystery is kept as two bottom-k MinHash sketches (the k
+smallest 64-bit shingle hashes):
+  theme  character 4-grams of the normalized theme, so "The Clockmaker's
+         Silent Alarm" and "Silent Alarm of the Clockmaker" still match
+  story  word 3-grams of base_story_text plus actual_solution_text
+Jaccard similarity is estimated from the k smallest hashes of the union of two
+sketches. A few hundred mysteries fit in memory and are compared exhaustively.
+
+Theme candidates are checked before the long content call
+(daily_mystery_service.generate_theme_and_style); a full story is only
+checked afterwards and logged. The index loads mysteries from the last
+SIMILARITY_LOOKBACK_DAYS on first use. Each check first fetches rows with
+higher ids, which picks up mysteries saved by other workers; edits and
+deletions made elsewhere only show up when the index is rebuilt, every
+SIMILARITY_FULL_RELOAD_SECONDS. Saves, edits and replacements in this
+process are applied once committed, and accepted themes are reserved under their
+date so concurrent generations in a bulk run do not pick the same theme. A
+generation that fails releases its reservation.
+"""
+import asyncio
+import datetime
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.db import AsyncSessionFactory
+from app.models.mystery_models import DailyMystery
+
+logger = logging.getLogger(__name__)
+
+THEME_SKETCH_SIZE = 64
+STORY_SKETCH_SIZE = 128
+_NON_WORD = re.compile(r"[^\w\s]+")
+_LEADING_ARTICLE = re.compile(r"^(the|a|an)\s+")
+
+
+@dataclass(frozen=True)
+class Sketch:
+    hashes: FrozenSet[int]
+    size: int  # k: at most this many hashes are kept
+
+    def similarity(self, other: "Sketch") -> float:
+        if not self.hashes or not other.hashes:
+            return 0.0
+        k = min(self.size, other.size)
+        union_bottom = sorted(self.hashes | other.hashes)[:k]
+        return sum(1 for h in union_bottom if h in self.hashes and h in other.hashes) / len(union_bottom)
+
+
+@dataclass(frozen=True)
+class SimilarMystery:
+    key: Hashable  # mystery id, or ("reserved", date) for a theme still being generated
+    theme: str
+    similarity: float
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def _sketch(shingles: Iterable[str], size: int) -> Sketch:
+    hashes = {int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles}
+    return Sketch(frozenset(sorted(hashes)[:size]), size)
+
+
+def theme_sketch(theme: str) -> Sketch:
+    text = _LEADING_ARTICLE.sub("", _normalize(theme))
+    return _sketch((text[i:i + 4] for i in range(max(1, len(text) - 3))), THEME_SKETCH_SIZE)
+
+
+def story_sketch(base_story_text: str, actual_solution_text: str) -> Sketch:
+    words = _normalize(f"{base_story_text} {actual_solution_text}").split()
+    return _sketch((" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))), STORY_SKETCH_SIZE)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    date: datetime.date
+    theme: str
+    theme_sketch: Sketch
+    story_sketch: Optional[Sketch]
+
+
+def _entry(date: datetime.date, theme: str, base_story_text: Optional[str],
+           actual_solution_text: Optional[str]) -> _Entry:
+    story = story_sketch(base_story_text, actual_solution_text or "") if base_story_text else None
+    return _Entry(date, theme, theme_sketch(theme), story)
+
+
+class MysterySimilarityIndex:
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._max_loaded_id = 0
+        self._reloaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def refresh(self) -> None:
+        """
+        Loads mysteries saved since the last refresh. The first call, and the first
+        one every SIMILARITY_FULL_RELOAD_SECONDS, rebuilds the index from all recent rows.
+        """
+        async with self._lock:
+            cutoff = datetime.date.today() - datetime.timedelta(days=settings.SIMILARITY_LOOKBACK_DAYS)
+            full_reload = (self._reloaded_at is None
+                           or time.monotonic() - self._reloaded_at >= settings.SIMILARITY_FULL_RELOAD_SECONDS)
+            after_id = 0 if full_reload else self._max_loaded_id
+            async with AsyncSessionFactory() as db:
+                rows = (await db.execute(
+                    select(DailyMystery.id, DailyMystery.date, DailyMystery.theme,
+                           DailyMystery.base_story_text, DailyMystery.actual_solution_text)
+                    .where(DailyMystery.id > after_id, DailyMystery.date >= cutoff)
+                )).all()
+            entries = await run_in_threadpool(
+                lambda: [(row.id, _entry(row.date, row.theme, row.base_story_text, row.actual_solution_text))
+                         for row in rows]) if rows else []
+            max_row_id = max((row.id for row in rows), default=after_id)
+            if full_reload:
+                # Reservations and mysteries added here after the query ran are kept.
+                kept = {key: entry for key, entry in self._entries.items()
+                        if not isinstance(key, int) or key > max_row_id}
+                self._entries = {**dict(entries), **kept}
+                self._reloaded_at = time.monotonic()
+            else:
+                self._entries.update(entries)
+            self._max_loaded_id = max(self._max_loaded_id, max_row_id)
+            if rows:
+                logger.debug("Similarity index loaded %s mysteries (%s total).", len(rows), len(self._entries))
+            for key in [key for key, entry in self._entries.items() if entry.date < cutoff]:
+                del self._entries[key]
+
+    def add(self, daily_mystery_id: int, date: datetime.date, theme: str,
+            base_story_text: str, actual_solution_text: str) -> None:
+        """Adds or replaces a saved mystery, dropping the theme reserved for its date."""
+        self._entries.pop(("reserved", date), None)
+        self._entries[daily_mystery_id] = _entry(date, theme, base_story_text, actual_solution_text)
+
+    def remove(self, daily_mystery_id: int) -> None:
+        """Drops a deleted mystery so its theme and story no longer count as taken."""
+        self._entries.pop(daily_mystery_id, None)
+
+    def reserve_theme(self, date: datetime.date, theme: str) -> None:
+        self._entries[("reserved", date)] = _entry(date, theme, None, None)
+
+    def release_theme(self, date: datetime.date) -> None:
+        """Drops the theme reserved for `date`, e.g. when its generation failed."""
+        self._entries.pop(("reserved", date), None)
+
+    def find_similar_theme(self, theme: str) -> Optional[SimilarMystery]:
+        """The most similar past theme at or above SIMILARITY_THEME_THRESHOLD, if any."""
+        candidate = theme_sketch(theme)
+        return self._most_similar(
+            ((key, entry, candidate.similarity(entry.theme_sketch))
+             for key, entry in self._entries.items()),
+            settings.SIMILARITY_THEME_THRESHOLD)
+
+    def find_similar_story(self, base_story_text: str, actual_solution_text: str) -> Optional[SimilarMystery]:
+        """The most similar past story and solution at or above SIMILARITY_STORY_THRESHOLD, if any."""
+        candidate = story_sketch(base_story_text, actual_solution_text)
+        return self._most_similar(
+            ((key, entry, candidate.similarity(entry.story_sketch))
+             for key, entry in self._entries.items()
+             if entry.story_sketch is not None),
+            settings.SIMILARITY_STORY_THRESHOLD)
+
+    @staticmethod
+    def _most_similar(scored: Iterable[Tuple[Hashable, _Entry, float]], threshold: float) -> Optional[SimilarMystery]:
+        best: Optional[SimilarMystery] = None
+        for key, entry, similarity in scored:
+            if similarity >= threshold and (best is None or similarity > best.similarity):
+                best = SimilarMystery(key, entry.theme, similarity)
+        return best
+
+
+mystery_similarity_index = MysterySimilarityIndex()
+
+
+def index_saved_mysteries(mysteries: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+    """Adds (id, build_daily_mystery_fields dict) pairs of just-saved mysteries."""
+    for daily_mystery_id, fields in mysteries:
+        mystery_similarity_index.add(
+            daily_mystery_id, fields["date"], fields["theme"],
+            fields["base_story_text"], fields["actual_solution_text"])
+
+
+def index_saved_mystery_after_commit(db: AsyncSession, daily_mystery_id: int, fields: Dict[str, Any]) -> None:
+    """
+    Indexes a mystery flushed in `db` once the transaction commits. If it rolls
+    back instead, the theme reserved for its date is released.
+    """
+    settled = False
+
+    def on_commit(session) -> None:
+        nonlocal settled
+        if not settled:
+            settled = True
+            index_saved_mysteries([(daily_mystery_id, fields)])
+
+    def on_rollback(session) -> None:
+        nonlocal settled
+        if not settled:
+            settled = True
+            mystery_similarity_index.release_theme(fields["date"])
+
+    event.listen(db.sync_session, "after_commit", on_commit, once=True)
+    event.listen(db.sync_session, "after_rollback", on_rollback, once=True)
@@ -1,7 +1,16 @@
 from uuid import uuid4
+import logging
 
+from app.core.tracing import current_span, traced
 
-async def upload_image_to_storage(image_data: bytes, filename_prefix: str) -> str:
-    filename = f"{filename_prefix}_{uuid4()}.png"
-    print(f"MOCK storage_services: Uploading image data as {filename}")
+logger = logging.getLogger(__name__)
+
+
+@traced("storage.upload")
+async def upload_image_to_storage(
+    image_data: bytes, filename_prefix: str, extension: str = "png", content_type: str = "image/png"
+) -> str:
+    filename = f"{filename_prefix}_{uuid4()}.{extension}"
+    current_span().set_attributes({"storage.bytes": len(image_data), "storage.key": filename})
+    logger.info("MOCK storage_services: Uploading image data (%s) as %s", content_type, filename)
     return f"https://s3.example.com/mock_images/{filename}"
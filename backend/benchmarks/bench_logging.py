@@ -0,0 +1,130 @@
+"""
+Micro-benchmark: event-loop-side cost of logging on a request path.
+
+Each "request" emits the same handful of records a next-scenario turn does
+(one disabled DEBUG line and a few INFO lines carrying request ids). Compares:
+
+  print           print() of f-strings to a file, the old ai_services style
+  sync-text       logging.StreamHandler on the calling thread, eager f-strings
+  queue-json      app.core.logging_config: QueueHandler + JSON formatting on the listener thread
+
+Only time spent on the calling thread is measured; that is what blocks the
+event loop. The listener's drain time is reported separately.
+--sink-latency-us makes every write block for that long, standing in for a
+stderr pipe to a slow or backed-up log collector.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_logging [--requests 20000] [--sink-latency-us 50]
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from app.core.logging_config import JsonFormatter, _ContextQueueHandler, request_id_var, session_id_var
+
+RECORDS_PER_REQUEST = 4
+
+
+class SlowSink:
+    """File wrapper whose writes block for a fixed time, like a full pipe."""
+
+    def __init__(self, raw, latency_seconds: float):
+        self.raw = raw
+        self.latency_seconds = latency_seconds
+
+    def write(self, data: str) -> int:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self.raw.write(data)
+
+    def flush(self) -> None:
+        self.raw.flush()
+
+
+def _isolated_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"bench_logging.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def run_print(requests: int, sink) -> float:
+    started = time.perf_counter()
+    with redirect_stdout(sink):
+        for i in range(requests):
+            print(f"DEBUG: Calling client.models.generate_content for model 'gemini-2.0-flash'. Temp: {0.8}")
+            for round_number in range(1, RECORDS_PER_REQUEST):
+                print(f"INFO: request {i} generated scenario for round {round_number}. Final round: {False}")
+    return time.perf_counter() - started
+
+
+def run_sync_text(requests: int, sink) -> float:
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logger = _isolated_logger("sync", handler)
+    started = time.perf_counter()
+    for i in range(requests):
+        logger.debug(f"Calling client.models.generate_content for model 'gemini-2.0-flash'. Temp: {0.8}")
+        for round_number in range(1, RECORDS_PER_REQUEST):
+            logger.info(f"request {i} generated scenario for round {round_number}. Final round: {False}")
+    return time.perf_counter() - started
+
+
+def run_queue_json(requests: int, sink) -> tuple:
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sink)
+    stream_handler.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    logger = _isolated_logger("queue", _ContextQueueHandler(log_queue))
+    listener.start()
+    started = time.perf_counter()
+    for i in range(requests):
+        request_token = request_id_var.set(f"req-{i}")
+        session_token = session_id_var.set("bench-session")
+        logger.debug("Calling client.models.generate_content for model '%s'. Temp: %s", "gemini-2.0-flash", 0.8)
+        for round_number in range(1, RECORDS_PER_REQUEST):
+            logger.info("request %s generated scenario for round %s. Final round: %s", i, round_number, False)
+        request_id_var.reset(request_token)
+        session_id_var.reset(session_token)
+    caller_seconds = time.perf_counter() - started
+    listener.stop()  # blocks until the queue is drained
+    return caller_seconds, time.perf_counter() - started
+
+
+def main(requests: int, sink_latency_us: float) -> None:
+    # Same per-record settings configure_logging() applies, for every path.
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def sink(name: str):
+            return open(os.path.join(tmp_dir, f"{name}.log"), "w", buffering=1)
+
+        results = {}
+        with sink("print") as f:
+            results["print"] = (run_print(requests, SlowSink(f, sink_latency_us / 1e6)), None)
+        with sink("sync") as f:
+            results["sync-text"] = (run_sync_text(requests, SlowSink(f, sink_latency_us / 1e6)), None)
+        with sink("queue") as f:
+            results["queue-json"] = run_queue_json(requests, SlowSink(f, sink_latency_us / 1e6))
+
+    print(f"{requests} requests x {RECORDS_PER_REQUEST} records (1 disabled DEBUG), "
+          f"sink latency {sink_latency_us}us per write", file=sys.stderr)
+    print(f"{'path':<14}{'caller us/request':>20}{'drained us/request':>20}")
+    for name, (caller_seconds, total_seconds) in results.items():
+        drained = f"{total_seconds / requests * 1e6:>20.1f}" if total_seconds is not None else f"{'-':>20}"
+        print(f"{name:<14}{caller_seconds / requests * 1e6:>20.1f}{drained}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sink-latency-us", type=float, default=0.0)
+    args = parser.parse_args()
+    main(args.requests, args.sink_latency_us)
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: per-request serialization CPU for mystery payloads.
+
+Compares the validated path FastAPI takes for a response_model (Pydantic
+validation + jsonable encoding + json.dumps) with the trusted path
+(plain dict + orjson).
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_serialization [--iterations 20000]
+"""
+import argparse
+import datetime
+import json
+import timeit
+from types import SimpleNamespace
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.schemas.mystery_schemas import DailyMystery as DailyMysterySchema, DailyMysteryDisplayForUser
+from app.schemas.serializers import trusted_daily_mystery_payload, trusted_display_payload
+
+
+def _sample_mystery() -> SimpleNamespace:
+    words = "The fog rolled over the harbour as the lighthouse keeper vanished without a trace. "
+    return SimpleNamespace(
+        id=42,
+        date=datetime.date(2025, 7, 1),
+        theme="The Lighthouse Keeper's Last Log",
+        base_story_text=words * 12,
+        actual_solution_text=words * 6,
+        character_dossiers=[
+            {
+                "character_name": f"Character {i}",
+                "description": words * 2,
+                "potential_secrets_or_motives": words * 2,
+            }
+            for i in range(5)
+        ],
+        critical_path_clues=["A wet footprint on the stairs.", "The log's missing page.", "A second lantern."],
+        image_style_id=3,
+        image_style=SimpleNamespace(
+            id=3, name="Film Noir",
+            dalle_prompt_modifier="Stark black and white, dramatic shadows, gritty classic detective feel."),
+        base_image_urls=[
+            "https://mockurl.com/base_image_0_Afoggyharbournight.png",
+            "https://mockurl.com/base_image_1_Alighthouseinterior.png",
+        ],
+        base_image_variants=None,
+        initial_choices_pool=[f"You examine clue number {i} closely." for i in range(10)],
+    )
+
+
+def main(iterations: int) -> None:
+    mystery = _sample_mystery()
+    choices = mystery.initial_choices_pool[:3]
+    display_adapter = TypeAdapter(DailyMysteryDisplayForUser)
+    admin_adapter = TypeAdapter(DailyMysterySchema)
+
+    def validated_display():
+        model = display_adapter.validate_python(DailyMysteryDisplayForUser(
+            daily_mystery_id=mystery.id,
+            theme=mystery.theme,
+            base_story_text=mystery.base_story_text,
+            base_image_urls=[str(url) for url in mystery.base_image_urls],
+            character_dossiers=mystery.character_dossiers,
+            initial_choices=choices,
+        ))
+        return json.dumps(jsonable_encoder(model)).encode("utf-8")
+
+    snapshot = vars(mystery)
+
+    def trusted_display():
+        return orjson.dumps(trusted_display_payload(snapshot, choices, list(mystery.base_image_urls)))
+
+    def validated_admin():
+        model = admin_adapter.validate_python(mystery, from_attributes=True)
+        return json.dumps(jsonable_encoder(model)).encode("utf-8")
+
+    def trusted_admin():
+        return orjson.dumps(trusted_daily_mystery_payload(mystery))
+
+    print(f"{'case':<28}{'us/request':>12}")
+    for name, fn in [
+        ("/mysteries/today validated", validated_display),
+        ("/mysteries/today trusted", trusted_display),
+        ("admin generate validated", validated_admin),
+        ("admin generate trusted", trusted_admin),
+    ]:
+        fn()  # warm up
+        seconds = min(timeit.repeat(fn, number=iterations, repeat=3))
+        print(f"{name:<28}{seconds / iterations * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args().iterations)
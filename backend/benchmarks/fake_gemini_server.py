@@ -0,0 +1,230 @@
+"""
+Local stand-in for the Gemini generateContent and streamGenerateContent endpoints.
+
+Serves canned JSON for the three prompt shapes ai_services sends (theme/style,
+daily mystery content, next scenario) with configurable latency and error
+injection. Streamed responses are sent as server-sent events, STREAM_CHUNK_CHARS
+of text at a time; the latency spec covers the time to the first chunk. Point
+the API at it with:
+
+    GEMINI_BASE_URL=http://127.0.0.1:8090
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_gemini_server --port 8090 --latency lognormal:-0.3,0.4 --error-rate 0.01
+    python -m benchmarks.fake_gemini_server --responses my_canned.json   # override any task's payload
+
+Latency specs: fixed:<s> | uniform:<lo>,<hi> | normal:<mean>,<stddev> | lognormal:<mu>,<sigma>
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from typing import Any, Callable, Dict, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.services.ai_constants import AVAILABLE_ART_STYLE_NAMES
+
+
+CANNED_RESPONSES: Dict[str, Dict[str, Any]] = {
+    "theme": {
+        "theme_title": "The Clockmaker's Silent Alarm",
+        "selected_art_style": AVAILABLE_ART_STYLE_NAMES[0],
+    },
+    "daily_content": {
+        "base_story_text": "At dawn the village clockmaker was found locked in his workshop, every clock stopped at 3:17. " * 6,
+        "actual_solution_text": "The apprentice reset the clocks to hide the real time of the argument. " * 4,
+        "initial_choices_pool": [f"You examine the workshop detail number {i}." for i in range(1, 11)],
+        "character_dossiers": [
+            {
+                "character_name": f"Suspect {i}",
+                "description": "A regular at the workshop with ink-stained fingers and a nervous habit.",
+                "potential_secrets_or_motives": "Owes the clockmaker money and was seen near the back door.",
+            }
+            for i in range(1, 5)
+        ],
+        "critical_path_clues": ["Every clock stopped at the same minute.", "The apprentice's key was freshly cut."],
+        "base_image_prompts": ["A cluttered clockmaker's workshop at dawn", "A row of stopped clocks on a wall"],
+    },
+    "next_scenario": {
+        "scenario_text": "You notice the pendulum of the tallest clock has been wrapped in cloth. " * 3,
+        "image_prompt": "A pendulum wrapped in cloth inside a tall clock",
+        "choices": [
+            "You decide to unwrap the pendulum.",
+            "You ask the apprentice about the cloth.",
+            "You examine the key ring on the bench.",
+        ],
+        "is_final_round": False,
+        "solution_explanation": None,
+    },
+    "final_scenario": {
+        "scenario_text": "The apprentice confesses: the clocks were stopped to fake the time of the quarrel. " * 3,
+        "image_prompt": "The apprentice confessing beside the stopped clocks",
+        "choices": [],
+        "is_final_round": True,
+        "solution_explanation": "The apprentice confesses: the clocks were stopped to fake the time of the quarrel.",
+    },
+}
+
+
+def parse_latency_spec(spec: str) -> Callable[[], float]:
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency spec '{spec}'.")
+
+
+def classify_prompt(prompt_text: str) -> str:
+    if "theme_title" in prompt_text:
+        return "theme"
+    if "initial_choices_pool" in prompt_text:
+        return "daily_content"
+    if "This MUST be true" in prompt_text:
+        return "final_scenario"
+    return "next_scenario"
+
+
+STREAM_CHUNK_CHARS = 40
+STREAM_CHUNK_INTERVAL_SECONDS = 0.02
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_app(
+    latency: Callable[[], float],
+    error_rate: float,
+    rate_limit_rate: float,
+    canned: Dict[str, Dict[str, Any]],
+) -> Starlette:
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    async def answer(request: Request):
+        """Returns (prompt text, response text) or an error response."""
+        stats["requests"] += 1
+        body = await request.json()
+        prompt_text = " ".join(
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        task = classify_prompt(prompt_text)
+
+        await asyncio.sleep(latency())
+
+        roll = random.random()
+        if roll < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Resource has been exhausted (fake).", "status": "RESOURCE_EXHAUSTED"}},
+                status_code=429)
+        if roll < rate_limit_rate + error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"error": {"code": 503, "message": "The model is overloaded (fake).", "status": "UNAVAILABLE"}},
+                status_code=503)
+
+        if task == "theme":
+            listed_styles = re.findall(r"^\s*-\s*(.+?)\s*$", prompt_text, flags=re.MULTILINE)
+            payload = dict(canned["theme"])
+            valid_styles = [s for s in listed_styles if s in AVAILABLE_ART_STYLE_NAMES]
+            if valid_styles:
+                payload["selected_art_style"] = random.choice(valid_styles)
+        else:
+            payload = canned[task]
+        return prompt_text, json.dumps(payload)
+
+    def response_body(request: Request, text: str, usage: Optional[Dict[str, int]]) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "index": 0,
+            }],
+            "modelVersion": request.path_params["model"],
+        }
+        if usage is not None:
+            body["candidates"][0]["finishReason"] = "STOP"
+            body["usageMetadata"] = usage
+        return body
+
+    def usage_metadata(prompt_text: str, text: str) -> Dict[str, int]:
+        return {
+            "promptTokenCount": _estimate_tokens(prompt_text),
+            "candidatesTokenCount": _estimate_tokens(text),
+            "totalTokenCount": _estimate_tokens(prompt_text) + _estimate_tokens(text),
+        }
+
+    async def generate_content(request: Request):
+        result = await answer(request)
+        if isinstance(result, JSONResponse):
+            return result
+        prompt_text, text = result
+        return JSONResponse(response_body(request, text, usage_metadata(prompt_text, text)))
+
+    async def stream_generate_content(request: Request):
+        result = await answer(request)
+        if isinstance(result, JSONResponse):
+            return result
+        prompt_text, text = result
+
+        async def events():
+            chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+            for index, chunk in enumerate(chunks):
+                if index:
+                    await asyncio.sleep(STREAM_CHUNK_INTERVAL_SECONDS)
+                usage = usage_metadata(prompt_text, text) if index == len(chunks) - 1 else None
+                yield f"data: {json.dumps(response_body(request, chunk, usage))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def get_model(request: Request):
+        # Answers the client warm-up lookup in app/core/warmup.py.
+        return JSONResponse({"name": f"models/{request.path_params['model']}"})
+
+    async def get_stats(request: Request):
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/{api_version}/models/{model}:generateContent", generate_content, methods=["POST"]),
+        Route("/{api_version}/models/{model}:streamGenerateContent", stream_generate_content, methods=["POST"]),
+        Route("/{api_version}/models/{model}", get_model, methods=["GET"]),
+        Route("/_fake/stats", get_stats, methods=["GET"]),
+    ])
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:-0.3,0.4",
+                        help="Latency distribution in seconds (see module docstring).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 503.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of calls answered with 429.")
+    parser.add_argument("--responses", default=None,
+                        help="JSON file mapping task name (theme, daily_content, next_scenario, final_scenario) to payload.")
+    args = parser.parse_args(argv)
+
+    canned = dict(CANNED_RESPONSES)
+    if args.responses:
+        with open(args.responses) as f:
+            canned.update(json.load(f))
+
+    app = build_app(parse_latency_spec(args.latency), args.error_rate, args.rate_limit_rate, canned)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
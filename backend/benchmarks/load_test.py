@@ -0,0 +1,182 @@
+"""
+Scripted load scenarios against a running API (ideally backed by a local
+Postgres and benchmarks/fake_gemini_server.py).
+
+Reports requests/second, latency percentiles, status-code counts, and the
+peak/mean DB pool and worker thread-pool occupancy sampled from
+/admin/runtime/stats during the run.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --scenario today --concurrency 50 --duration 30
+    python -m benchmarks.load_test --scenario next-scenario --concurrency 20 --duration 60
+    python -m benchmarks.load_test --scenario admin-generate --concurrency 2 --duration 60
+
+Scenarios:
+    today           GET /mysteries/today with a random X-Session-Id per request
+    next-scenario   plays full games: GET today, then POST /mysteries/next-scenario until the final round
+    admin-generate  POST /admin/daily-mysteries/generate?force_regenerate=true, then poll the job to completion
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+
+class LoadStats:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.status_counts: Counter = Counter()
+        self.runtime_samples: List[dict] = []
+
+    def record(self, label: str, status: int, seconds: float) -> None:
+        self.latencies.setdefault(label, []).append(seconds)
+        self.status_counts[f"{label} {status}"] += 1
+
+
+async def _timed(client: httpx.AsyncClient, stats: LoadStats, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        stats.record(label, 0, time.perf_counter() - started)
+        stats.status_counts[f"{label} {type(e).__name__}"] += 1
+        return None
+    stats.record(label, response.status_code, time.perf_counter() - started)
+    return response
+
+
+async def scenario_today(client: httpx.AsyncClient, stats: LoadStats) -> None:
+    await _timed(client, stats, "GET /mysteries/today", "GET", "/mysteries/today",
+                 headers={"X-Session-Id": uuid.uuid4().hex})
+
+
+async def scenario_next_scenario(client: httpx.AsyncClient, stats: LoadStats) -> None:
+    today = await _timed(client, stats, "GET /mysteries/today", "GET", "/mysteries/today",
+                         headers={"X-Session-Id": uuid.uuid4().hex})
+    if today is None or today.status_code != 200:
+        return
+    mystery = today.json()
+    scenario_text = mystery["base_story_text"]
+    choices = mystery["initial_choices"]
+    path_so_far = []
+
+    while choices:
+        choice = choices[0]
+        response = await _timed(client, stats, "POST /mysteries/next-scenario", "POST", "/mysteries/next-scenario", json={
+            "daily_mystery_id": mystery["daily_mystery_id"],
+            "path_so_far": path_so_far,
+            "current_user_choice": choice,
+            "last_presented_scenario_text": scenario_text,
+        })
+        if response is None or response.status_code != 200:
+            return
+        body = response.json()
+        path_so_far.append({"scenario_text": scenario_text, "chosen_action": choice})
+        scenario_text = body["next_scenario_text"]
+        choices = [] if body["is_final_round"] else body["next_choices"]
+
+
+async def scenario_admin_generate(client: httpx.AsyncClient, stats: LoadStats) -> None:
+    started = time.perf_counter()
+    response = await _timed(client, stats, "POST /admin/daily-mysteries/generate", "POST",
+                            "/admin/daily-mysteries/generate", params={"force_regenerate": "true"})
+    if response is None or response.status_code != 202:
+        return
+    job_id = response.json()["id"]
+    while True:
+        await asyncio.sleep(0.5)
+        job = await _timed(client, stats, "GET /admin/generation-jobs/{id}", "GET",
+                           f"/admin/generation-jobs/{job_id}")
+        if job is None or job.status_code != 200:
+            return
+        status = job.json()["status"]
+        if status in ("succeeded", "failed"):
+            stats.record(f"generation job {status}", 200, time.perf_counter() - started)
+            return
+
+
+SCENARIOS = {
+    "today": scenario_today,
+    "next-scenario": scenario_next_scenario,
+    "admin-generate": scenario_admin_generate,
+}
+
+
+async def _worker(client: httpx.AsyncClient, stats: LoadStats, scenario, deadline: float) -> None:
+    while time.perf_counter() < deadline:
+        await scenario(client, stats)
+
+
+async def _sample_runtime(client: httpx.AsyncClient, stats: LoadStats, deadline: float, interval: float) -> None:
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/admin/runtime/stats")
+            if response.status_code == 200:
+                stats.runtime_samples.append(response.json())
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def print_report(stats: LoadStats, elapsed: float) -> None:
+    print(f"\nDuration: {elapsed:.1f}s")
+    print(f"{'endpoint':<40}{'count':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, values in stats.latencies.items():
+        values = sorted(values)
+        print(f"{label:<40}{len(values):>8}{len(values) / elapsed:>9.1f}"
+              f"{_percentile(values, 50) * 1000:>10.1f}{_percentile(values, 95) * 1000:>10.1f}"
+              f"{_percentile(values, 99) * 1000:>10.1f}")
+
+    print("\nStatus codes:")
+    for key, count in sorted(stats.status_counts.items()):
+        print(f"  {key:<50}{count:>8}")
+
+    if stats.runtime_samples:
+        checked_out = [s["db_pool"].get("checkedout", 0) for s in stats.runtime_samples]
+        overflow = [s["db_pool"].get("overflow", 0) for s in stats.runtime_samples]
+        threads = [s["thread_pool"]["borrowed_tokens"] for s in stats.runtime_samples]
+        thread_total = stats.runtime_samples[-1]["thread_pool"]["total_tokens"]
+        print("\nSaturation (sampled from /admin/runtime/stats):")
+        print(f"  DB connections checked out  peak {max(checked_out)}  mean {statistics.mean(checked_out):.1f}")
+        print(f"  DB pool overflow            peak {max(overflow)}")
+        print(f"  Worker threads busy         peak {max(threads)}/{thread_total}  mean {statistics.mean(threads):.1f}")
+    else:
+        print("\nNo runtime samples collected (is /admin/runtime/stats reachable?).")
+
+
+async def run(base_url: str, scenario_name: str, concurrency: int, duration: float, sample_interval: float) -> None:
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(
+            _sample_runtime(client, stats, deadline, sample_interval),
+            *(_worker(client, stats, SCENARIOS[scenario_name], deadline) for _ in range(concurrency)),
+        )
+        elapsed = time.perf_counter() - started
+    print_report(stats, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="today")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run.")
+    parser.add_argument("--sample-interval", type=float, default=0.5,
+                        help="Seconds between /admin/runtime/stats samples.")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.scenario, args.concurrency, args.duration, args.sample_interval))
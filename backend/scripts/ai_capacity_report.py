@@ -0,0 +1,253 @@
+"""
+Daily AI usage and capacity report from the AI call ledger (aicallledgerentries).
+
+Prints, for the last --days days (dates in the database session's time zone):
+  calls by task     calls, failures, tokens, cost and p50/p95 latency per day and task type
+  calls per mystery average and maximum ledger calls per mystery per day
+  cost per game     gameplay (next/final scenario) calls and cost per completed session
+  projection        daily requests/tokens and peak-minute load at --dau, against the given quotas
+
+Replayed responses (outcome "replay") never reach the provider, so they are
+left out of costs and of the quota projection. Costs use list prices per
+million tokens; cached prompt tokens are billed at --price-cached.
+
+Usage (from the backend directory):
+    python -m scripts.ai_capacity_report --days 7 --dau 5000 --quota-rpm 2000 --quota-tpm 4000000
+"""
+import argparse
+import asyncio
+import datetime
+from collections import defaultdict
+from typing import Dict, Optional
+
+from sqlalchemy import Date, DateTime, and_, case, cast, func, literal
+from sqlalchemy.future import select
+
+from app.core.db import AsyncSessionFactory, async_engine
+from app.models.ai_ledger_models import AICallLedgerEntry
+from app.models.mystery_models import UserMysterySession
+
+GAMEPLAY_TASK_TYPES = ("next_scenario", "final_scenario")
+
+Ledger = AICallLedgerEntry
+
+
+def _cost_expression(price_input: float, price_output: float, price_cached: float):
+    prompt_tokens = func.coalesce(Ledger.prompt_tokens, 0)
+    cached_tokens = func.coalesce(Ledger.cached_tokens, 0)
+    output_tokens = func.coalesce(Ledger.output_tokens, 0)
+    return ((prompt_tokens - cached_tokens) * price_input
+            + cached_tokens * price_cached
+            + output_tokens * price_output) / 1_000_000.0
+
+
+def _on_or_after(column, since: datetime.date):
+    """
+    `column` from the start of `since` in the session time zone. Compares the raw
+    timestamp, unlike cast(column, Date) >= since, so the BRIN index on
+    created_at can be used; the date cast is only for grouping.
+    """
+    return column >= cast(literal(since, Date), DateTime(timezone=True))
+
+
+def _pct(part: float, whole: float) -> str:
+    return f"{part / whole * 100:.1f}%" if whole else "-"
+
+
+async def report_calls_by_task(db, since: datetime.date, cost) -> None:
+    day = cast(Ledger.created_at, Date)
+    provider_call = Ledger.outcome != "replay"
+    provider_latency = case((provider_call, Ledger.latency_ms))
+    rows = (await db.execute(
+        select(
+            day.label("day"),
+            Ledger.task_type,
+            func.count().label("calls"),
+            func.count().filter(Ledger.outcome.notin_(("ok", "replay"))).label("failures"),
+            func.count().filter(Ledger.is_retry).label("retries"),
+            func.coalesce(func.sum(Ledger.prompt_tokens), 0).label("prompt_tokens"),
+            func.coalesce(func.sum(Ledger.output_tokens), 0).label("output_tokens"),
+            func.coalesce(func.sum(cost).filter(provider_call), 0).label("cost"),
+            # percentile_cont skips NULLs, so replays drop out of the latency figures.
+            func.percentile_cont(0.5).within_group(provider_latency).label("p50"),
+            func.percentile_cont(0.95).within_group(provider_latency).label("p95"),
+        )
+        .where(_on_or_after(Ledger.created_at, since))
+        .group_by(day, Ledger.task_type)
+        .order_by(day, Ledger.task_type)
+    )).all()
+
+    print("\n== Calls by task ==")
+    print(f"{'day':<12}{'task':<18}{'calls':>8}{'failed':>9}{'retries':>9}"
+          f"{'prompt tok':>12}{'output tok':>12}{'cost $':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for row in rows:
+        p50 = f"{row.p50:.0f}" if row.p50 is not None else "-"
+        p95 = f"{row.p95:.0f}" if row.p95 is not None else "-"
+        print(f"{row.day.isoformat():<12}{row.task_type:<18}{row.calls:>8}{_pct(row.failures, row.calls):>9}"
+              f"{row.retries:>9}{row.prompt_tokens:>12}{row.output_tokens:>12}{row.cost:>10.4f}{p50:>9}{p95:>9}")
+
+
+async def report_calls_per_mystery(db, since: datetime.date) -> None:
+    day = cast(Ledger.created_at, Date)
+    per_mystery = (
+        select(day.label("day"), Ledger.daily_mystery_id, func.count().label("calls"))
+        .where(_on_or_after(Ledger.created_at, since), Ledger.daily_mystery_id.is_not(None))
+        .group_by(day, Ledger.daily_mystery_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(
+            per_mystery.c.day,
+            func.count().label("mysteries"),
+            func.avg(per_mystery.c.calls).label("avg_calls"),
+            func.max(per_mystery.c.calls).label("max_calls"),
+        )
+        .group_by(per_mystery.c.day)
+        .order_by(per_mystery.c.day)
+    )).all()
+
+    print("\n== Calls per mystery ==")
+    print(f"{'day':<12}{'mysteries':>10}{'avg calls':>11}{'max calls':>11}")
+    for row in rows:
+        print(f"{row.day.isoformat():<12}{row.mysteries:>10}{float(row.avg_calls):>11.1f}{row.max_calls:>11}")
+
+
+async def report_cost_per_game(db, since: datetime.date, cost) -> None:
+    day = cast(Ledger.created_at, Date)
+    gameplay_rows = (await db.execute(
+        select(
+            day.label("day"),
+            func.count().label("calls"),
+            func.coalesce(func.sum(cost), 0).label("cost"),
+        )
+        .where(_on_or_after(Ledger.created_at, since), Ledger.task_type.in_(GAMEPLAY_TASK_TYPES),
+               Ledger.outcome != "replay")
+        .group_by(day)
+    )).all()
+    end_day = cast(UserMysterySession.end_time, Date)
+    game_rows = (await db.execute(
+        select(end_day.label("day"), func.count().label("games"))
+        .where(_on_or_after(UserMysterySession.end_time, since))
+        .group_by(end_day)
+    )).all()
+
+    by_day: Dict[datetime.date, Dict[str, float]] = defaultdict(lambda: {"calls": 0, "cost": 0.0, "games": 0})
+    for row in gameplay_rows:
+        by_day[row.day]["calls"] = row.calls
+        by_day[row.day]["cost"] = float(row.cost)
+    for row in game_rows:
+        by_day[row.day]["games"] = row.games
+
+    print("\n== Cost per completed game (gameplay calls only) ==")
+    print(f"{'day':<12}{'games':>8}{'calls':>8}{'calls/game':>12}{'cost $':>10}{'$/game':>10}")
+    for day_value in sorted(by_day):
+        values = by_day[day_value]
+        calls_per_game = f"{values['calls'] / values['games']:.1f}" if values["games"] else "-"
+        cost_per_game = f"{values['cost'] / values['games']:.5f}" if values["games"] else "-"
+        print(f"{day_value.isoformat():<12}{values['games']:>8}{values['calls']:>8}{calls_per_game:>12}"
+              f"{values['cost']:>10.4f}{cost_per_game:>10}")
+
+
+async def report_projection(
+    db, since: datetime.date, dau: int, games_per_user: float, peak_minute_share: Optional[float],
+    quota_rpm: Optional[int], quota_tpm: Optional[int], quota_rpd: Optional[int],
+) -> None:
+    day = cast(Ledger.created_at, Date)
+    tokens = func.coalesce(Ledger.prompt_tokens, 0) + func.coalesce(Ledger.output_tokens, 0)
+    is_gameplay = Ledger.task_type.in_(GAMEPLAY_TASK_TYPES)
+    provider_calls = and_(_on_or_after(Ledger.created_at, since), Ledger.outcome != "replay")
+
+    totals = (await db.execute(
+        select(
+            func.count(func.distinct(day)).label("days"),
+            func.count().filter(is_gameplay).label("gameplay_calls"),
+            func.coalesce(func.sum(tokens).filter(is_gameplay), 0).label("gameplay_tokens"),
+            func.count().filter(~is_gameplay).label("fixed_calls"),
+            func.coalesce(func.sum(tokens).filter(~is_gameplay), 0).label("fixed_tokens"),
+        )
+        .where(provider_calls)
+    )).one()
+    completed_games = (await db.execute(
+        select(func.count())
+        .where(_on_or_after(UserMysterySession.end_time, since))
+    )).scalar_one()
+
+    print(f"\n== Projection at {dau} DAU x {games_per_user} games/user ==")
+    if not totals.days or not completed_games:
+        print("Not enough data: need provider calls and completed games in the window.")
+        return
+
+    if peak_minute_share is None:
+        # Busiest minute's share of its day's calls, taken from the busiest day in the window.
+        minute = func.date_trunc("minute", Ledger.created_at)
+        minute_rows = (await db.execute(
+            select(cast(minute, Date).label("day"), func.count().label("calls"))
+            .where(provider_calls)
+            .group_by(minute)
+        )).all()
+        day_totals: Dict[datetime.date, int] = defaultdict(int)
+        day_peaks: Dict[datetime.date, int] = defaultdict(int)
+        for row in minute_rows:
+            day_totals[row.day] += row.calls
+            day_peaks[row.day] = max(day_peaks[row.day], row.calls)
+        busiest_day = max(day_totals, key=day_totals.get)
+        peak_minute_share = day_peaks[busiest_day] / day_totals[busiest_day]
+        print(f"Peak-minute share {peak_minute_share:.4f} observed on {busiest_day.isoformat()} "
+              f"({day_totals[busiest_day]} calls); override with --peak-minute-share.")
+
+    calls_per_game = totals.gameplay_calls / completed_games
+    tokens_per_game = totals.gameplay_tokens / completed_games
+    fixed_calls_per_day = totals.fixed_calls / totals.days
+    fixed_tokens_per_day = totals.fixed_tokens / totals.days
+    games_per_day = dau * games_per_user
+
+    projected_rpd = fixed_calls_per_day + games_per_day * calls_per_game
+    projected_tpd = fixed_tokens_per_day + games_per_day * tokens_per_game
+    projected_rpm = projected_rpd * peak_minute_share
+    projected_tpm = projected_tpd * peak_minute_share
+
+    print(f"Observed: {calls_per_game:.2f} calls and {tokens_per_game:.0f} tokens per completed game; "
+          f"{fixed_calls_per_day:.1f} non-gameplay calls/day over {totals.days} days.")
+    print(f"{'limit':<8}{'projected':>14}{'quota':>14}{'headroom':>14}{'used':>9}")
+    for name, projected, quota in (
+        ("RPD", projected_rpd, quota_rpd),
+        ("RPM", projected_rpm, quota_rpm),
+        ("TPM", projected_tpm, quota_tpm),
+    ):
+        if quota:
+            print(f"{name:<8}{projected:>14.0f}{quota:>14}{quota - projected:>14.0f}{_pct(projected, quota):>9}")
+        else:
+            print(f"{name:<8}{projected:>14.0f}{'-':>14}{'-':>14}{'-':>9}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    since = datetime.date.today() - datetime.timedelta(days=args.days - 1)
+    cost = _cost_expression(args.price_input, args.price_output, args.price_cached)
+    print(f"AI capacity report for {since.isoformat()} .. {datetime.date.today().isoformat()}")
+    async with AsyncSessionFactory() as db:
+        await report_calls_by_task(db, since, cost)
+        await report_calls_per_mystery(db, since)
+        await report_cost_per_game(db, since, cost)
+        if args.dau:
+            await report_projection(
+                db, since, args.dau, args.games_per_user, args.peak_minute_share,
+                args.quota_rpm, args.quota_tpm, args.quota_rpd)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7, help="Days to report on, including today.")
+    parser.add_argument("--dau", type=int, default=None, help="Daily active users to project quota use for.")
+    parser.add_argument("--games-per-user", type=float, default=1.0,
+                        help="Completed games per active user per day.")
+    parser.add_argument("--peak-minute-share", type=float, default=None,
+                        help="Share of a day's calls in its busiest minute (default: observed).")
+    parser.add_argument("--quota-rpm", type=int, default=None, help="Provider requests-per-minute quota.")
+    parser.add_argument("--quota-tpm", type=int, default=None, help="Provider tokens-per-minute quota.")
+    parser.add_argument("--quota-rpd", type=int, default=None, help="Provider requests-per-day quota.")
+    parser.add_argument("--price-input", type=float, default=0.10, help="USD per million prompt tokens.")
+    parser.add_argument("--price-output", type=float, default=0.40, help="USD per million output tokens.")
+    parser.add_argument("--price-cached", type=float, default=0.025,
+                        help="USD per million cached prompt tokens.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,31 @@
+"""
+Rebuilds per-user statistics from historical sessions and awards earned badges.
+
+Usage (from the backend directory):
+    python -m scripts.backfill_badges --batch-size 500
+"""
+import argparse
+import asyncio
+import logging
+
+from app.core.db import AsyncSessionFactory, async_engine
+from app.services.badge_service import backfill_user_stats_and_badges
+
+
+async def main(batch_size: int, after_user_id: int) -> None:
+    async with AsyncSessionFactory() as db:
+        processed = await backfill_user_stats_and_badges(
+            db, batch_size=batch_size, after_user_id=after_user_id)
+    await async_engine.dispose()
+    print(f"Backfill complete. Users processed: {processed}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Users per batch (defaults to BADGE_BACKFILL_BATCH_SIZE).")
+    parser.add_argument("--after-user-id", type=int, default=0,
+                        help="Resume after this user ID.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.batch_size, args.after_user_id))
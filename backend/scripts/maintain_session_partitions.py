@@ -0,0 +1,37 @@
+"""
+Creates upcoming monthly session partitions and archives old ones.
+Intended to run daily from cron or a scheduler.
+
+Usage (from the backend directory):
+    python -m scripts.maintain_session_partitions [--months-ahead 3] [--retain-months 12] [--mode detach]
+"""
+import argparse
+import asyncio
+import logging
+
+from app.core.db import async_engine
+from app.services.session_partition_service import (
+    ARCHIVE_MODES, archive_old_session_partitions, ensure_session_partitions)
+
+
+async def main(months_ahead, retain_months, mode, skip_archive: bool) -> None:
+    created = await ensure_session_partitions(months_ahead=months_ahead)
+    archived = [] if skip_archive else await archive_old_session_partitions(
+        retain_months=retain_months, mode=mode)
+    await async_engine.dispose()
+    print(f"Partitions created: {created or 'none'}. Partitions archived: {archived or 'none'}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--months-ahead", type=int, default=None,
+                        help="Defaults to SESSION_PARTITION_MONTHS_AHEAD.")
+    parser.add_argument("--retain-months", type=int, default=None,
+                        help="Defaults to SESSION_PARTITION_RETAIN_MONTHS.")
+    parser.add_argument("--mode", choices=ARCHIVE_MODES, default=None,
+                        help="Defaults to SESSION_PARTITION_ARCHIVE_MODE.")
+    parser.add_argument("--skip-archive", action="store_true",
+                        help="Only create upcoming partitions.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.months_ahead, args.retain_months, args.mode, args.skip_archive))
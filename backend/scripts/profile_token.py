@@ -0,0 +1,24 @@
+"""
+Mints a token that profiles one request to the given API path (see app/core/profiling.py).
+Requires the same PROFILING_SECRET as the server.
+
+Usage (from the backend directory):
+    python -m scripts.profile_token /api/v1/gameplay/next-scenario --ttl 300
+Then send the request with the printed X-Profile-Token header; the response's
+X-Profile-Id names the profile under GET /api/v1/admin/profiles/{profile_id}.
+"""
+import argparse
+import sys
+
+from app.core.config import settings
+from app.core.profiling import make_profile_token
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Exact request path, without the query string.")
+    parser.add_argument("--ttl", type=int, default=300, help="Seconds the token stays valid.")
+    args = parser.parse_args()
+    if not settings.PROFILING_SECRET:
+        sys.exit("PROFILING_SECRET is not set.")
+    print(f"X-Profile-Token: {make_profile_token(args.path, args.ttl)}")